@@ -1,8 +1,24 @@
-
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
+from typing import Optional
+import os
+import time
 import uvicorn
 
+from scaling import expanded_page, parse_density, parse_size, scale_formulations
+from serializers import FastJSONResponse, decode_page_cursor, dumps, encode_page_cursor
+from snapshot import KEY_WIDTH, SNAPSHOT_PATH, Snapshot, SnapshotFile
+from suggest_index import SUGGEST_DEFAULT_LIMIT, SUGGEST_MAX_LIMIT, SuggestIndex
+
+# Database-free API: formulations are served from a snapshot built from the CSVs (or mapped from SNAPSHOT_PATH)
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+SNAPSHOT_FORMULATIONS_CSV = os.getenv("SNAPSHOT_FORMULATIONS_CSV", os.path.join(DATA_DIR, 'sekabiaoOG.csv'))
+SNAPSHOT_RGB_CSV = os.getenv("SNAPSHOT_RGB_CSV", os.path.join(DATA_DIR, 'colorOG.csv'))
+
+SEARCH_DEFAULT_PAGE_SIZE = int(os.getenv("SEARCH_DEFAULT_PAGE_SIZE", "50"))
+SEARCH_MAX_PAGE_SIZE = int(os.getenv("SEARCH_MAX_PAGE_SIZE", "200"))
+
 app = FastAPI()
 
 # Allow CORS for local frontend dev
@@ -14,103 +30,88 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Example data (replace with your DB logic)
-DATA = [
-    {
-        "color_code": "0011P",
-        "colorant_type": "IYAGA COLOR PASTE",
-        "color_series": "12 Color",
-        "color_card": "KIPAU COLOR CHART",
-        "paint_type": "IYG PAE(Weather Guard)",
-        "base_paint": "BASE A",
-        "packaging_spec": "1KG",
-        "colorant_details": [
-            {
-                "colorant_name": "IYG YL OXD 2042",
-                "weight_g": "0.5628000",
-                "volume_ml": "0.3179661"
-            },
-            {
-                "colorant_name": "IYG GRN G Y2154",
-                "weight_g": "0.9380000",
-                "volume_ml": "0.4509615"
-            }
-        ],
-        "color_rgb": {
-            "rgb": {
-                "r": 253,
-                "g": 242,
-                "b": 231
-            },
-            "hex": "#fdf2e7"
-        }
-    },
-    {
-        "color_code": "0011P",
-        "colorant_type": "IYAGA COLOR PASTE",
-        "color_series": "12 Color",
-        "color_card": "KIPAU COLOR CHART",
-        "paint_type": "IYG VM WHITE",
-        "base_paint": "BASE A",
-        "packaging_spec": "1KG",
-        "colorant_details": [
-            {
-                "colorant_name": "IYG YL OXD 2042",
-                "weight_g": "0.5628000",
-                "volume_ml": "0.3179661"
-            },
-            {
-                "colorant_name": "IYG GRN G Y2154",
-                "weight_g": "0.9380000",
-                "volume_ml": "0.4509615"
-            }
-        ],
-        "color_rgb": {
-            "rgb": {
-                "r": 253,
-                "g": 242,
-                "b": 231
-            },
-            "hex": "#fdf2e7"
-        }
-    },
-    {
-        "color_code": "0011P",
-        "colorant_type": "IYAGA COLOR PASTE",
-        "color_series": "12 Color",
-        "color_card": "KIPAU COLOR CHART",
-        "paint_type": "IYG VS CLASSIC & NORMAL",
-        "base_paint": "BASE A",
-        "packaging_spec": "1KG",
-        "colorant_details": [
-            {
-                "colorant_name": "IYG YL OXD 2042",
-                "weight_g": "0.6000000",
-                "volume_ml": "0.3389831"
-            },
-            {
-                "colorant_name": "IYG GRN G Y2154",
-                "weight_g": "1.0000000",
-                "volume_ml": "0.4807692"
-            }
-        ],
-        "color_rgb": {
-            "rgb": {
-                "r": 253,
-                "g": 242,
-                "b": 231
-            },
-            "hex": "#fdf2e7"
-        }
-    }
-]
+snapshot: Optional[Snapshot] = None
+# With SNAPSHOT_PATH set, every worker maps the same snapshot file instead of holding its own copy
+snapshot_file: Optional[SnapshotFile] = None
+
+# Typeahead index over the snapshot's codes; rebuilt when a replaced snapshot file is mapped
+suggestions = SuggestIndex()
+suggestions_source: Optional[Snapshot] = None
+
+def current_snapshot() -> Snapshot:
+    return snapshot_file.get() if snapshot_file is not None else snapshot
+
+@app.on_event("startup")
+async def load_snapshot():
+    global snapshot, snapshot_file
+    started = time.perf_counter()
+    if SNAPSHOT_PATH:
+        if not os.path.exists(SNAPSHOT_PATH):
+            # First worker up builds the file; a concurrent build by another worker is an atomic rename too
+            Snapshot.from_csv(SNAPSHOT_FORMULATIONS_CSV, SNAPSHOT_RGB_CSV).write(SNAPSHOT_PATH)
+        snapshot_file = SnapshotFile(SNAPSHOT_PATH)
+        stats = snapshot_file.get().stats()
+    else:
+        snapshot = Snapshot.from_csv(SNAPSHOT_FORMULATIONS_CSV, SNAPSHOT_RGB_CSV)
+        stats = snapshot.stats()
+    print(f"Snapshot loaded: {stats['formulations']} formulations, {stats['colorant_details']} colorant details, "
+          f"{stats['strings']} strings in {time.perf_counter() - started:.2f}s")
 
 @app.get("/api/formulation/{color_code}")
-def get_formulation(color_code: str):
-    results = [item for item in DATA if item["color_code"].lower() == color_code.lower()]
+def get_formulation(color_code: str, size: Optional[str] = None, density: Optional[str] = None):
+    results = current_snapshot().lookup(color_code)
     if not results:
-        raise HTTPException(status_code=404, detail="No formulations found")
-    return results
+        raise HTTPException(status_code=404, detail=f"No formulation found for color code: {color_code}")
+    if size is not None:
+        try:
+            fill_size = parse_size(size)
+            fill_density = parse_density(density) if density is not None else None
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        stored = sorted({result["packaging_spec"] for result in results})
+        results = scale_formulations(results, fill_size, fill_density)
+        if not results:
+            raise HTTPException(
+                status_code=422,
+                detail=f"Cannot scale {color_code} to {fill_size.label}: stored packaging is "
+                       f"{', '.join(stored)}; pass density to convert between mass and volume"
+            )
+    return Response(content=dumps(results), media_type="application/json")
+
+@app.get("/api/search")
+def search_formulations(
+    q: str,
+    limit: int = Query(SEARCH_DEFAULT_PAGE_SIZE, ge=1),
+    cursor: Optional[str] = None,
+):
+    """Case-insensitive substring search on color code, paginated like the database-backed API."""
+    limit = min(limit, SEARCH_MAX_PAGE_SIZE)
+    start, skip = None, 0
+    if cursor:
+        try:
+            start, skip = decode_page_cursor(cursor, KEY_WIDTH)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    snapshot = current_snapshot()
+    # Collapsed sizes count against the limit; limit + 2 rows always cover a full page plus one
+    indexes = snapshot.search(q, limit + 2, start)
+    results, position = expanded_page(indexes, snapshot.formulations, snapshot.key, limit, start, skip)
+    if not results and not cursor:
+        raise HTTPException(status_code=404, detail=f"No formulations found matching: {q}")
+
+    next_cursor = encode_page_cursor(*position) if position else None
+    return FastJSONResponse({"results": results, "next_cursor": next_cursor})
+
+@app.get("/api/suggest")
+def suggest_color_codes(prefix: str = Query(..., min_length=1), limit: int = Query(SUGGEST_DEFAULT_LIMIT, ge=1)):
+    """Distinct color codes (with card and hex) starting with `prefix`, like the database-backed API."""
+    global suggestions_source
+    snapshot = current_snapshot()
+    if suggestions_source is not snapshot:
+        suggestions.build(snapshot.code_cards())
+        suggestions_source = snapshot
+    return FastJSONResponse(suggestions.suggest(prefix, min(limit, SUGGEST_MAX_LIMIT)))
 
 @app.get("/")
 async def read_root():
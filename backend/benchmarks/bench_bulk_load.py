@@ -0,0 +1,82 @@
+"""
+Benchmark the COPY-based bulk loader on the real CSV and on scaled synthetic copies.
+
+Each scale factor replicates sekabiaoOG.csv N times (prefixing the color codes of every
+replica so keys stay unique), loads it into a throwaway `bench_bulk_load` schema and
+reports rows per second for the parse, COPY and merge stages.
+
+Usage (from backend/):
+    BENCH_DATABASE_URL=postgresql+asyncpg://... python benchmarks/bench_bulk_load.py --scales 1,10
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+
+import pandas as pd
+from dotenv import load_dotenv
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+sys.path.insert(0, os.path.realpath(os.path.join(os.path.dirname(__file__), '..')))
+load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
+if os.getenv("BENCH_DATABASE_URL"):
+    os.environ["DATABASE_URL"] = os.environ["BENCH_DATABASE_URL"]
+
+from database import Base
+from bulk_loader import DEFAULT_CSV_PATH, bulk_load, read_csv
+
+SCHEMA = "bench_bulk_load"
+
+
+def scaled_csv(scale: int, directory: str) -> str:
+    """Write `scale` copies of sekabiaoOG.csv with unique color codes and return the path."""
+    df = read_csv(DEFAULT_CSV_PATH)
+    replicas = [df] + [df.assign(H=f"S{replica}-" + df['H']) for replica in range(1, scale)]
+    path = os.path.join(directory, f"sekabiao_x{scale}.csv")
+    pd.concat(replicas, ignore_index=True).to_csv(path, index=False)
+    return path
+
+
+async def main(scales):
+    engine = create_async_engine(
+        os.environ["DATABASE_URL"],
+        connect_args={"server_settings": {"search_path": f"{SCHEMA},public"}},
+    )
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with engine.begin() as conn:
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        await conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {SCHEMA}"))
+        await conn.run_sync(Base.metadata.create_all)
+
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            for scale in scales:
+                path = scaled_csv(scale, directory)
+                async with engine.begin() as conn:
+                    await conn.execute(text("TRUNCATE TABLE colorant_details, formulations CASCADE"))
+                async with session_factory() as session:
+                    stats = await bulk_load(session, path)
+                results.append((scale, stats))
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+        await engine.dispose()
+
+    print()
+    print(f"{'scale':>5} {'csv rows':>10} {'formulations':>13} {'details':>9} "
+          f"{'parse s':>8} {'copy s':>8} {'merge s':>8} {'total s':>8} {'rows/s':>9}")
+    for scale, stats in results:
+        print(f"{scale:>5} {stats['csv_rows']:>10} {stats['formulations']:>13} {stats['colorant_details']:>9} "
+              f"{stats['parse_seconds']:>8} {stats['copy_seconds']:>8} {stats['merge_seconds']:>8} "
+              f"{stats['total_seconds']:>8} {stats['rows_per_second']:>9}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", default="1,10", help="Comma-separated replication factors of the CSV")
+    args = parser.parse_args()
+    asyncio.run(main([int(scale) for scale in args.scales.split(",")]))
@@ -0,0 +1,214 @@
+"""
+Benchmark /api/search's substring filter as the formulation read model grows.
+
+Times the endpoint's page query (main.search_page_query over formulation_read_model) with
+the original full-scan `color_code ILIKE '%q%'` and with the `lower(color_code) LIKE '%q%'`
+filter that idx_read_model_color_code_trgm serves, at several table sizes. Prints p50/p95
+latency plus the indexes each plan used, and records them in bench_search_results.json.
+
+Runs inside a throwaway `bench_search` schema of the database given by BENCH_DATABASE_URL
+(required): every table is created, filled and queried schema-qualified through a schema
+translate map, so the application tables in `public` are never touched.
+
+Usage (from backend/):
+    BENCH_DATABASE_URL=postgresql+asyncpg://... python benchmarks/bench_search.py --sizes 5728,100000,1000000
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+from dotenv import load_dotenv
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+sys.path.insert(0, os.path.realpath(os.path.join(os.path.dirname(__file__), '..')))
+load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
+if not os.getenv("BENCH_DATABASE_URL"):
+    sys.exit("Set BENCH_DATABASE_URL to the database to benchmark in; it gets a throwaway bench_search schema.")
+os.environ["DATABASE_URL"] = os.environ["BENCH_DATABASE_URL"]
+
+from color_codes import normalize_color_code
+from database import Base
+from main import SEARCH_DEFAULT_PAGE_SIZE, color_code_contains, read_model, search_page_query
+from models import FormulationReadModel
+
+SCHEMA = "bench_search"
+CSV_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'sekabiaoOG.csv')
+# Tracked, unlike load_test.py's results/ directory: the recorded numbers are part of the repo
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(__file__), 'bench_search_results.json')
+
+
+def synthetic_formulations(base: pd.DataFrame, size: int):
+    """Yield `size` read model rows by replicating the real rows with prefixed color codes."""
+    records = base[['A', 'B', 'C', 'D', 'E', 'G', 'H', 'I', 'J', 'K']].fillna('').astype(str).apply(lambda col: col.str.strip())
+    # One row per formulation key, first occurrence wins like the loaders
+    records = records.drop_duplicates(subset=['C', 'D', 'E', 'G', 'H']).values.tolist()
+    for i in range(size):
+        (colorant_type, color_series, color_card, paint_type, base_paint, packaging_spec, color_code,
+         colorant, weight, volume) = records[i % len(records)]
+        replica = i // len(records)
+        color_code = color_code if replica == 0 else f"S{replica}-{color_code}"
+        yield {
+            "color_code": color_code,
+            "color_card": color_card,
+            "paint_type": paint_type,
+            "base_paint": base_paint,
+            "packaging_spec": packaging_spec,
+            "colorant_type": colorant_type,
+            "color_series": color_series,
+            "color_code_norm": normalize_color_code(color_code),
+            "colorants": [[colorant, weight or None, volume or None]] if colorant else [],
+        }
+
+
+def probe_terms(base: pd.DataFrame, count: int, seed: int = 42):
+    """Pick realistic search terms: 3-5 character substrings of real color codes."""
+    rng = random.Random(seed)
+    codes = base['H'].astype(str).str.strip().tolist()
+    terms = []
+    while len(terms) < count:
+        code = rng.choice(codes)
+        if len(code) < 3:
+            continue
+        length = rng.randint(3, min(5, len(code)))
+        start = rng.randint(0, len(code) - length)
+        terms.append(code[start:start + length])
+    return terms
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _explain(conn, cursor, statement, parameters, context, executemany):
+    # Statements executed with the `explain` option return their plan instead of rows
+    if context is not None and context.execution_options.get("explain"):
+        statement = "EXPLAIN (FORMAT JSON) " + statement
+    return statement, parameters
+
+
+def plan_indexes(plan) -> list:
+    """Names of the indexes used anywhere in an EXPLAIN (FORMAT JSON) plan."""
+    if isinstance(plan, list):
+        return sorted({name for node in plan for name in plan_indexes(node)})
+    names = {plan["Index Name"]} if "Index Name" in plan else set()
+    for child in plan.get("Plan", {}), *plan.get("Plans", ()):
+        if child:
+            names.update(plan_indexes(child))
+    return sorted(names)
+
+
+async def fill_table(conn, base: pd.DataFrame, size: int, chunk_size: int = 10000):
+    await conn.execute(text(f"TRUNCATE TABLE {SCHEMA}.formulation_read_model"))
+    chunk = []
+    for record in synthetic_formulations(base, size):
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            await conn.execute(read_model.insert(), chunk)
+            chunk = []
+    if chunk:
+        await conn.execute(read_model.insert(), chunk)
+    await conn.execute(text(f"ANALYZE {SCHEMA}.formulation_read_model"))
+
+
+async def time_queries(conn, build_filter, terms):
+    latencies = []
+    for term in terms:
+        query = search_page_query(build_filter(term), SEARCH_DEFAULT_PAGE_SIZE)
+        started = time.perf_counter()
+        result = await conn.execute(query)
+        result.all()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+async def explain_indexes(conn, build_filter, term):
+    query = search_page_query(build_filter(term), SEARCH_DEFAULT_PAGE_SIZE).execution_options(explain=True)
+    plan = (await conn.execute(query)).scalar()
+    return plan_indexes(json.loads(plan) if isinstance(plan, str) else plan)
+
+
+async def main(sizes, probes, output):
+    # Unqualified tables in the models resolve to SCHEMA, for DDL and queries alike
+    engine = create_async_engine(
+        os.environ["BENCH_DATABASE_URL"], execution_options={"schema_translate_map": {None: SCHEMA}}
+    )
+    event.listen(engine.sync_engine, "before_cursor_execute", _explain, retval=True)
+    base = pd.read_csv(CSV_PATH)
+    terms = probe_terms(base, probes)
+
+    # The original filter, and color_code_contains() as /api/search builds it (idx_read_model_color_code_trgm)
+    strategies = {
+        "ilike": lambda term: read_model.c.color_code.ilike(f"%{term}%"),
+        "lower like": lambda term: color_code_contains(read_model.c.color_code, term, "postgresql"),
+    }
+
+    async with engine.begin() as conn:
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        await conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {SCHEMA}"))
+        await conn.run_sync(Base.metadata.create_all, tables=[FormulationReadModel.__table__])
+        server_version = (await conn.execute(text("SHOW server_version"))).scalar()
+        # None when the extension is missing: the "trgm" strategy then runs without its index
+        trgm_version = (await conn.execute(text("SELECT extversion FROM pg_extension WHERE extname = 'pg_trgm'"))).scalar()
+
+    runs = []
+    print(f"{'rows':>10}  {'strategy':<20} {'p50 ms':>9} {'p95 ms':>9} {'mean ms':>9}  indexes")
+    try:
+        for size in sizes:
+            async with engine.begin() as conn:
+                await fill_table(conn, base, size)
+            async with engine.connect() as conn:
+                for name, build_filter in strategies.items():
+                    await time_queries(conn, build_filter, terms[:10])  # warm the buffer cache
+                    latencies = await time_queries(conn, build_filter, terms)
+                    indexes = await explain_indexes(conn, build_filter, terms[0])
+                    run = {
+                        "rows": size,
+                        "strategy": name,
+                        "p50_ms": round(percentile(latencies, 50), 3),
+                        "p95_ms": round(percentile(latencies, 95), 3),
+                        "mean_ms": round(statistics.mean(latencies), 3),
+                        "indexes": indexes,
+                    }
+                    runs.append(run)
+                    print(f"{size:>10}  {name:<20} {run['p50_ms']:>9.2f} {run['p95_ms']:>9.2f} {run['mean_ms']:>9.2f}  "
+                          f"{', '.join(indexes) or 'none'}")
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+        await engine.dispose()
+
+    if output:
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, "w") as f:
+            json.dump({
+                "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "postgres": server_version,
+                "pg_trgm": trgm_version,
+                "host": f"{platform.machine()}, {os.cpu_count()} CPU",
+                "probes": probes,
+                "page_size": SEARCH_DEFAULT_PAGE_SIZE,
+                "runs": runs,
+            }, f, indent=2)
+            f.write("\n")
+        print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="5728,100000,1000000",
+                        help="Comma-separated formulation counts to benchmark")
+    parser.add_argument("--probes", type=int, default=200, help="Number of search terms per strategy")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="JSON results file ('' to skip)")
+    args = parser.parse_args()
+    asyncio.run(main([int(size) for size in args.sizes.split(",")], args.probes, args.output))
@@ -0,0 +1,178 @@
+"""
+Check and benchmark the direct serialization path against the Pydantic one.
+
+Builds transient ORM objects from sekabiaoOG.csv and the matching formulation_read_model
+rows (no database needed), asserts that serializers.read_model_row_to_dict + dumps produces
+byte-for-byte the same JSON as building FormulationResponse models from the ORM objects and
+rendering them with FastAPI's JSONResponse, then times both. Exits non-zero if they differ.
+
+Usage (from backend/):
+    python benchmarks/bench_serialization.py --rows 200 --iterations 50
+"""
+import argparse
+import os
+import sys
+import time
+from decimal import Decimal
+
+import pandas as pd
+sys.path.insert(0, os.path.realpath(os.path.join(os.path.dirname(__file__), '..')))
+# Only the models are needed; the engine is never connected
+os.environ.setdefault("DATABASE_URL", "postgresql+asyncpg://localhost/unused")
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from bulk_loader import AMOUNT_QUANTUM, DEFAULT_CSV_PATH, build_records, read_csv
+from main import ColorantDetailResponse, FormulationResponse, RgbValueResponse, SearchResponse
+from models import ColorantDetail, ColorRgbValue, Formulation, FormulationReadModel
+from serializers import dumps, read_model_row_to_dict
+
+
+def stored_amount(value):
+    """The Decimal that NUMERIC(12, 7) hands back for a CSV amount."""
+    return None if pd.isna(value) else Decimal(str(value)).quantize(AMOUNT_QUANTUM)
+
+
+def sample_rows(count: int):
+    """Transient (Formulation, ColorRgbValue or None) pairs resembling a query result."""
+    formulations, details = build_records(read_csv(DEFAULT_CSV_PATH))
+    formulations = formulations.head(count)
+    details_by_key = {}
+    for record in details.to_dict('records'):
+        key = tuple(record[field] for field in ('color_code', 'color_card', 'paint_type', 'base_paint', 'packaging_spec'))
+        details_by_key.setdefault(key, []).append(record)
+
+    rows = []
+    for i, record in enumerate(formulations.to_dict('records')):
+        key = tuple(record[field] for field in ('color_code', 'color_card', 'paint_type', 'base_paint', 'packaging_spec'))
+        formulation = Formulation(**{field: value for field, value in record.items() if field != 'recipe_hash'})
+        formulation.colorant_details = [
+            ColorantDetail(
+                colorant_name=detail['colorant_name'],
+                weight_g=stored_amount(detail['weight_g']),
+                volume_ml=stored_amount(detail['volume_ml']),
+            ) for detail in details_by_key.get(key, [])
+        ]
+        # Leave every fourth formulation without RGB values, as the outer join can
+        rgb = None if i % 4 == 3 else ColorRgbValue(
+            color_code=record['color_code'], color_card=record['color_card'],
+            red=(i * 7) % 256, green=(i * 13) % 256, blue=(i * 29) % 256,
+        )
+        rows.append((formulation, rgb))
+    return rows
+
+
+def pydantic_body(rows, next_cursor=None, envelope=False) -> bytes:
+    """The previous path: Pydantic models per row, then FastAPI's generic encoder."""
+    response_data = []
+    for formulation, rgb in rows:
+        rgb_value = None
+        if rgb:
+            rgb_value = RgbValueResponse(
+                rgb={"r": rgb.red, "g": rgb.green, "b": rgb.blue},
+                hex=RgbValueResponse.rgb_to_hex(rgb.red, rgb.green, rgb.blue)
+            )
+        response_data.append(FormulationResponse(
+            color_code=formulation.color_code,
+            colorant_type=formulation.colorant_type,
+            color_series=formulation.color_series,
+            color_card=formulation.color_card,
+            paint_type=formulation.paint_type,
+            base_paint=formulation.base_paint,
+            packaging_spec=formulation.packaging_spec,
+            colorant_details=[
+                ColorantDetailResponse(
+                    colorant_name=detail.colorant_name,
+                    weight_g=detail.weight_g,
+                    volume_ml=detail.volume_ml
+                ) for detail in formulation.colorant_details
+            ],
+            color_rgb=rgb_value
+        ))
+    if envelope:
+        content = SearchResponse(results=response_data, next_cursor=next_cursor)
+    else:
+        content = response_data
+    return JSONResponse(content=jsonable_encoder(content)).body
+
+
+def to_read_model_row(formulation, rgb) -> FormulationReadModel:
+    """The formulation_read_model row that refresh_read_model() builds for this formulation."""
+    return FormulationReadModel(
+        color_code=formulation.color_code,
+        color_card=formulation.color_card,
+        paint_type=formulation.paint_type,
+        base_paint=formulation.base_paint,
+        packaging_spec=formulation.packaging_spec,
+        colorant_type=formulation.colorant_type,
+        color_series=formulation.color_series,
+        colorants=[
+            [detail.colorant_name,
+             None if detail.weight_g is None else str(detail.weight_g),
+             None if detail.volume_ml is None else str(detail.volume_ml)]
+            for detail in formulation.colorant_details
+        ],
+        red=rgb.red if rgb else None,
+        green=rgb.green if rgb else None,
+        blue=rgb.blue if rgb else None,
+        hex=f"#{rgb.red:02x}{rgb.green:02x}{rgb.blue:02x}" if rgb else None,
+    )
+
+
+def direct_body(read_rows, next_cursor=None, envelope=False) -> bytes:
+    response_data = [read_model_row_to_dict(row) for row in read_rows]
+    if envelope:
+        return dumps({"results": response_data, "next_cursor": next_cursor})
+    return dumps(response_data)
+
+
+def check_compatibility(rows) -> bool:
+    cases = [
+        ("formulation list", {}),
+        ("search page", {"envelope": True, "next_cursor": "WyIwMDExUCJd"}),
+        ("last search page", {"envelope": True}),
+    ]
+    compatible = True
+    for name, kwargs in cases:
+        expected = pydantic_body(rows, **kwargs)
+        actual = direct_body([to_read_model_row(*row) for row in rows], **kwargs)
+        if expected != actual:
+            compatible = False
+            mismatch = next((i for i, (a, b) in enumerate(zip(expected, actual)) if a != b), min(len(expected), len(actual)))
+            print(f"MISMATCH in {name} at byte {mismatch}:")
+            print(f"  pydantic: {expected[max(0, mismatch - 60):mismatch + 60]!r}")
+            print(f"  direct:   {actual[max(0, mismatch - 60):mismatch + 60]!r}")
+        else:
+            print(f"OK {name}: {len(actual)} bytes identical")
+    return compatible
+
+
+def time_path(serialize, rows, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        serialize(rows)
+    return (time.perf_counter() - started) / iterations * 1000
+
+
+def main(row_count: int, iterations: int) -> int:
+    rows = sample_rows(row_count)
+    if not check_compatibility(rows):
+        return 1
+
+    for size in sorted({1, 10, 50, row_count}):
+        subset = rows[:size]
+        read_rows = [to_read_model_row(*row) for row in subset]
+        pydantic_ms = time_path(pydantic_body, subset, iterations)
+        direct_ms = time_path(direct_body, read_rows, iterations)
+        print(f"{size:>5} rows: pydantic {pydantic_ms:8.3f} ms  direct {direct_ms:8.3f} ms  "
+              f"speedup {pydantic_ms / direct_ms:5.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200, help="Largest result size to serialize")
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+    sys.exit(main(args.rows, args.iterations))
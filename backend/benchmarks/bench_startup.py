@@ -0,0 +1,82 @@
+"""
+Measure time-to-first-request of the API for each schema management mode.
+
+Starts `uvicorn main:app` in a subprocess, polls until the first formulation lookup
+succeeds and reports the elapsed time from process start. The "alembic" mode expects the
+database to be at the migration head (`alembic upgrade head` or `alembic stamp head`).
+
+Usage (from backend/):
+    BENCH_DATABASE_URL=postgresql+asyncpg://... python benchmarks/bench_startup.py --modes create_all,alembic --workers 4
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+from dotenv import load_dotenv
+
+BACKEND_DIR = os.path.realpath(os.path.join(os.path.dirname(__file__), '..'))
+load_dotenv(os.path.join(BACKEND_DIR, '.env'))
+
+
+def time_to_first_request(mode: str, workers: int, port: int, color_code: str, timeout: float) -> float:
+    env = dict(os.environ, SCHEMA_MANAGEMENT=mode)
+    if os.getenv("BENCH_DATABASE_URL"):
+        env["DATABASE_URL"] = os.environ["BENCH_DATABASE_URL"]
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(workers),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=5.0) as client:
+            while time.perf_counter() - started < timeout:
+                if server.poll() is not None:
+                    raise RuntimeError(f"Server exited during startup in {mode} mode:\n{server.stderr.read()}")
+                try:
+                    if client.get(f"/api/formulation/{color_code}").status_code == 200:
+                        return time.perf_counter() - started
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.01)
+        raise RuntimeError(f"No successful request within {timeout}s in {mode} mode")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time-to-first-request per schema management mode")
+    parser.add_argument("--modes", default="create_all,alembic")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--color-code", default="0011P")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    results = {}
+    for mode in args.modes.split(","):
+        timings = [
+            time_to_first_request(mode, args.workers, args.port, args.color_code, args.timeout)
+            for _ in range(args.runs)
+        ]
+        results[mode] = {
+            "runs": args.runs,
+            "workers": args.workers,
+            "median_seconds": round(statistics.median(timings), 3),
+            "min_seconds": round(min(timings), 3),
+            "max_seconds": round(max(timings), 3),
+        }
+        print(f"{mode}: median {results[mode]['median_seconds']}s "
+              f"(min {results[mode]['min_seconds']}s, max {results[mode]['max_seconds']}s)")
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Generate synthetic sekabiaoOG.csv / colorOG.csv pairs at benchmark scale.
+
+The real data is kept as-is and topped up with copies of randomly drawn color groups (all
+rows of one color code in one color card), so the paint type mix, rows per color code and
+colorant combinations follow the production distribution. Each copy gets a new color code of
+the same shape (digit runs renumbered, e.g. "MEADOW PHLOX 2326T" -> "MEADOW PHLOX 8803T"),
+its colorant amounts scaled by a random factor (volume scaled with weight, so densities stay
+real) and, if the original color has one, an RGB value jittered around the original.
+
+Usage (from backend/):
+    python benchmarks/generate_dataset.py --sizes 10k,100k,1m
+Writes benchmarks/data/sekabiao_<size>.csv and benchmarks/data/color_<size>.csv.
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.realpath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bulk_loader import COLORANT_SLOTS, DEFAULT_CSV_PATH, read_csv
+from rgb_cleaning import DEFAULT_RGB_CSV_PATH, RGB_FIELDS, clean_rgb_rows
+DEFAULT_OUTPUT_DIR = os.path.join(os.path.dirname(__file__), 'data')
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+DIGIT_RUN = re.compile(r'\d+')
+AMOUNT_SIGMA = 0.15  # log-normal spread of the per-colorant amount factor
+RGB_JITTER = 12
+
+
+def parse_size(size: str) -> int:
+    size = size.strip().lower()
+    if size in SIZES:
+        return SIZES[size]
+    return int(size.replace("_", ""))
+
+
+def dataset_paths(size: str, output_dir: str = DEFAULT_OUTPUT_DIR):
+    """(formulation CSV, RGB CSV) paths for a size label such as "100k"."""
+    label = size.strip().lower()
+    return (
+        os.path.join(output_dir, f"sekabiao_{label}.csv"),
+        os.path.join(output_dir, f"color_{label}.csv"),
+    )
+
+
+def read_rgb_csv(path: str = DEFAULT_RGB_CSV_PATH) -> pd.DataFrame:
+    rgb = pd.DataFrame(clean_rgb_rows(path), columns=RGB_FIELDS)
+    return rgb.rename(columns={'color_code': 'code', 'color_card': 'card'})[['card', 'code', 'red', 'green', 'blue']]
+
+
+def new_code(code: str, rng: np.random.Generator, taken: set, card: str) -> str:
+    """Renumber the digit runs of `code`, widening them until the code is unused in `card`."""
+    extra = 0
+    while True:
+        candidate = DIGIT_RUN.sub(
+            lambda m: ''.join(map(str, rng.integers(0, 10, len(m.group()) + extra))), code
+        )
+        if candidate == code or not DIGIT_RUN.search(code):
+            candidate = f"{code} {''.join(map(str, rng.integers(0, 10, 3 + extra)))}"
+        if (card, candidate) not in taken:
+            taken.add((card, candidate))
+            return candidate
+        extra += 1
+
+
+def scale_amounts(rows: pd.DataFrame, rng: np.random.Generator) -> None:
+    for _, weight_col, volume_col in COLORANT_SLOTS:
+        weight = pd.to_numeric(rows[weight_col], errors='coerce')
+        volume = pd.to_numeric(rows[volume_col], errors='coerce')
+        factor = rng.lognormal(0.0, AMOUNT_SIGMA, len(rows))
+        has_amount = weight.notna() & (weight != 0)
+        rows[weight_col] = weight.where(~has_amount, (weight * factor).round(4))
+        rows[volume_col] = volume.where(~(has_amount & volume.notna()), (volume * factor).round(11))
+
+
+def generate(target_rows: int, seed: int = 42):
+    """Return (formulation rows, RGB rows) with roughly `target_rows` formulation rows."""
+    rng = np.random.default_rng(seed)
+    base = read_csv(DEFAULT_CSV_PATH)
+    rgb = read_rgb_csv()
+    rgb_by_color = {
+        (card, code): (r, g, b)
+        for card, code, r, g, b in rgb[['card', 'code', 'red', 'green', 'blue']].itertuples(index=False)
+    }
+
+    groups = list(base.groupby(['C', 'H'], sort=False).indices.items())
+    sizes = np.array([len(indices) for _, indices in groups])
+    taken = set(base[['C', 'H']].itertuples(index=False, name=None)) | set(rgb_by_color)
+
+    missing = target_rows - len(base)
+    if missing <= 0:
+        return base.head(target_rows), rgb
+
+    # Draw whole color groups until the row budget is met
+    draws = rng.integers(0, len(groups), int(missing / sizes.mean() * 1.1) + 1)
+    draws = draws[:np.searchsorted(np.cumsum(sizes[draws]), missing) + 1]
+
+    row_indices, codes, rgb_rows = [], [], []
+    for draw in draws:
+        (card, code), indices = groups[draw]
+        synthetic = new_code(code, rng, taken, card)
+        row_indices.append(indices)
+        codes.append(np.full(len(indices), synthetic, dtype=object))
+        original_rgb = rgb_by_color.get((card, code))
+        if original_rgb is not None:
+            r, g, b = np.clip(np.array(original_rgb) + rng.integers(-RGB_JITTER, RGB_JITTER + 1, 3), 0, 255)
+            rgb_rows.append((card, synthetic, int(r), int(g), int(b)))
+
+    synthetic_rows = base.iloc[np.concatenate(row_indices)].reset_index(drop=True)
+    synthetic_rows['H'] = np.concatenate(codes)
+    scale_amounts(synthetic_rows, rng)
+
+    formulations = pd.concat([base, synthetic_rows], ignore_index=True)
+    colors = pd.concat(
+        [rgb, pd.DataFrame(rgb_rows, columns=['card', 'code', 'red', 'green', 'blue'])], ignore_index=True
+    )
+    return formulations, colors
+
+
+def write_dataset(size: str, output_dir: str = DEFAULT_OUTPUT_DIR, seed: int = 42):
+    started = time.perf_counter()
+    formulations, colors = generate(parse_size(size), seed)
+    formulation_path, rgb_path = dataset_paths(size, output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    formulations.to_csv(formulation_path, index=False)
+    colors.rename(columns={'code': 'color_code', 'card': 'color_card'})[RGB_FIELDS].to_csv(rgb_path, index=False)
+    print(f"{size}: {len(formulations)} formulation rows, {len(colors)} RGB values "
+          f"-> {formulation_path} ({time.perf_counter() - started:.1f}s)")
+    return formulation_path, rgb_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate scaled formulation and RGB CSVs for benchmarks")
+    parser.add_argument("--sizes", default="10k,100k,1m", help="Comma-separated sizes (10k, 100k, 1m or a row count)")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    for size in args.sizes.split(","):
+        write_dataset(size, args.output_dir, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Load a generated benchmark dataset into the database the API will be run against.
+
+Empties the formulation, colorant, RGB and read-model tables, then loads the CSVs from
+generate_dataset.py with the production loaders (bulk_loader + load_rgb_data), generating
+them first if they do not exist. Only runs against BENCH_DATABASE_URL so a production
+DATABASE_URL from .env can never be wiped by accident.
+
+Usage (from backend/):
+    BENCH_DATABASE_URL=postgresql+asyncpg://... python benchmarks/load_dataset.py --size 100k
+    BENCH_DATABASE_URL=... uvicorn main:app    # then run benchmarks/load_test.py
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.realpath(os.path.join(os.path.dirname(__file__), '..')))
+load_dotenv(os.path.join(os.path.dirname(__file__), '..', '.env'))
+if not os.getenv("BENCH_DATABASE_URL"):
+    sys.exit("Set BENCH_DATABASE_URL to the database the benchmark data should be loaded into.")
+os.environ["DATABASE_URL"] = os.environ["BENCH_DATABASE_URL"]
+
+from database import async_session, init_db
+from bulk_loader import bulk_load
+from load_rgb_data import load_rgb_values
+from generate_dataset import DEFAULT_OUTPUT_DIR, dataset_paths, write_dataset
+
+
+async def main(size: str, output_dir: str, seed: int):
+    formulation_path, rgb_path = dataset_paths(size, output_dir)
+    if not (os.path.exists(formulation_path) and os.path.exists(rgb_path)):
+        write_dataset(size, output_dir, seed)
+
+    await init_db()
+    async with async_session() as session:
+        await session.execute(text(
+            "TRUNCATE TABLE formulation_read_model, colorant_details, formulations, color_rgb_values"
+        ))
+        await session.commit()
+
+    started = time.perf_counter()
+    async with async_session() as session:
+        stats = await bulk_load(session, formulation_path)
+    formulation_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    await load_rgb_values(rgb_path)
+    rgb_seconds = time.perf_counter() - started
+
+    summary = {
+        "size": size,
+        "formulations": stats["formulations"],
+        "colorant_details": stats["colorant_details"],
+        "formulation_load_seconds": round(formulation_seconds, 3),
+        "rgb_load_seconds": round(rgb_seconds, 3),
+    }
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load a synthetic benchmark dataset")
+    parser.add_argument("--size", default="10k", help="10k, 100k, 1m or a row count")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    asyncio.run(main(args.size, args.output_dir, args.seed))
@@ -0,0 +1,169 @@
+"""
+Async HTTP load driver for the formulation endpoints.
+
+Runs a fixed number of requests per scenario at a fixed concurrency against a running
+API and reports throughput and latency percentiles. Color codes come from the dataset
+CSV that was loaded, so lookups hit real rows; search terms are substrings of them.
+Results are written as JSON so runs can be compared before and after a change.
+
+Usage (from backend/, with the API serving the loaded benchmark database):
+    python benchmarks/load_test.py --dataset benchmarks/data/sekabiao_100k.csv --label before
+    python benchmarks/load_test.py --dataset ... --label after --compare benchmarks/results/<before>.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+import httpx
+import pandas as pd
+
+sys.path.insert(0, os.path.realpath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bulk_loader import DEFAULT_CSV_PATH
+
+DEFAULT_RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+
+def percentile(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def build_scenarios(dataset: str, requests: int, seed: int):
+    """Request paths per scenario, drawn from the color codes in the dataset."""
+    rng = random.Random(seed)
+    codes = pd.read_csv(dataset, usecols=['H'], dtype=str)['H'].dropna().str.strip().unique().tolist()
+
+    def search_term():
+        code = rng.choice(codes)
+        length = rng.randint(2, min(5, len(code))) if len(code) >= 2 else len(code)
+        start = rng.randint(0, len(code) - length)
+        return code[start:start + length]
+
+    return {
+        "get_formulation": [f"/api/formulation/{quote(rng.choice(codes), safe='')}" for _ in range(requests)],
+        "search_formulations": [f"/api/search?q={quote(search_term())}" for _ in range(requests)],
+    }
+
+
+async def run_scenario(client: httpx.AsyncClient, paths, concurrency: int) -> dict:
+    latencies, statuses = [], Counter()
+    errors = 0
+    queue = iter(paths)
+
+    async def worker():
+        nonlocal errors
+        for path in queue:
+            started = time.perf_counter()
+            try:
+                response = await client.get(path)
+                statuses[response.status_code] += 1
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(paths),
+        "errors": errors,
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+            "p50": round(percentile(latencies, 0.50), 3),
+            "p95": round(percentile(latencies, 0.95), 3),
+            "p99": round(percentile(latencies, 0.99), 3),
+            "max": round(latencies[-1], 3) if latencies else 0.0,
+        },
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_comparison(current: dict, baseline: dict) -> None:
+    print(f"\nCompared with {baseline.get('label')} ({baseline.get('git_commit')}):")
+    for name, result in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        parts = []
+        for key in ("p50", "p95", "p99"):
+            old, new = before["latency_ms"][key], result["latency_ms"][key]
+            change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+            parts.append(f"{key} {old} -> {new} ms ({change})")
+        print(f"  {name}: {before['throughput_rps']} -> {result['throughput_rps']} req/s; " + ", ".join(parts))
+
+
+async def main(args):
+    scenarios = build_scenarios(args.dataset, args.requests, args.seed)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = {}
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+        for name, paths in scenarios.items():
+            # Warm up connections, caches and the server's prepared statements first
+            await run_scenario(client, paths[:args.warmup], args.concurrency)
+            results[name] = await run_scenario(client, paths, args.concurrency)
+            latency = results[name]["latency_ms"]
+            print(f"{name}: {results[name]['throughput_rps']} req/s, p50 {latency['p50']} ms, "
+                  f"p95 {latency['p95']} ms, p99 {latency['p99']} ms, errors {results[name]['errors']}")
+
+    report = {
+        "label": args.label,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "base_url": args.base_url,
+        "dataset": os.path.basename(args.dataset),
+        "concurrency": args.concurrency,
+        "seed": args.seed,
+        "scenarios": results,
+    }
+    output = args.output or os.path.join(
+        DEFAULT_RESULTS_DIR, f"load_{args.label}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(report, json.load(f))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test get_formulation and search_formulations")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--dataset", default=DEFAULT_CSV_PATH, help="Formulation CSV the database was loaded from")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--output", help="Result JSON path (default: benchmarks/results/load_<label>_<time>.json)")
+    parser.add_argument("--compare", help="Earlier result JSON to print the change against")
+    asyncio.run(main(parser.parse_args()))
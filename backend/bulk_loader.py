@@ -0,0 +1,282 @@
+import argparse
+import asyncio
+import hashlib
+import os
+import time
+from decimal import Decimal
+from typing import Tuple
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from cache import invalidate_caches
+# Parsing lives in ingest.py; the column layout and read_csv stay importable from here
+from ingest import (
+    AMOUNT_QUANTUM, ATTRIBUTE_FIELDS, COLORANT_FIELDS, COLORANT_SLOTS, FORMULATION_ATTRIBUTE_COLUMNS,
+    FORMULATION_FIELDS, FORMULATION_KEY_COLUMNS, GROUP_SEPARATOR, KEY_FIELDS, amount_texts, combine_batches,
+    parse_records, read_csv, read_records,
+)
+from read_model import refresh_read_model
+from scaling import size_or_none
+from snapshot import export_snapshot
+
+DEFAULT_CSV_PATH = os.path.join(os.path.dirname(__file__), 'data', 'sekabiaoOG.csv')
+# Formulation columns written to the database: the parsed fields plus the collapsed sizes
+STORED_FORMULATION_FIELDS = FORMULATION_FIELDS + ['scaled_specs']
+SCALED_SPEC_SEPARATOR = ','
+
+def stored_units(amounts: pd.Series) -> list:
+    """Amounts as the integer count of 1e-7 units the database stores (None when blank)."""
+    return [int(text.replace('.', '')) if text else None for text in amount_texts(amounts)]
+
+def collapse_scaled_sizes(formulations: pd.DataFrame, details: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Keep one canonical recipe per color code, card, paint type and base. A formulation is
+    dropped when the same color has a smaller packaging of the same dimension (KG or L) with
+    the same attributes and colorants, and every amount as stored (NUMERIC(12, 7)) is exactly
+    the smaller recipe's amount times the size ratio, so nothing is lost by computing it.
+
+    The dropped packaging specs are kept on the canonical row as `scaled_specs` (comma-separated,
+    smallest first; None when nothing collapsed), so lookups can still list those sizes and
+    filters on them still match. They are part of the canonical row's recipe_hash.
+    """
+    formulations = formulations.assign(scaled_specs=None)
+    sizes = {spec: size_or_none(spec) for spec in formulations['packaging_spec'].unique()}
+    sized = formulations.assign(
+        _dimension=formulations['packaging_spec'].map(lambda spec: sizes[spec] and sizes[spec].dimension),
+        _units=formulations['packaging_spec'].map(lambda spec: sizes[spec] and sizes[spec].units),
+    )
+    group = ['color_code', 'color_card', 'paint_type', 'base_paint', '_dimension']
+    sized = sized[sized['_dimension'].notna() & sized.duplicated(group, keep=False)]
+    if sized.empty:
+        return formulations, details
+
+    # The smallest size of each group is canonical; every other size is a candidate for dropping
+    canonical = sized.sort_values('_units', kind='stable').drop_duplicates(group, keep='first')
+    candidates = sized.drop(canonical.index)
+    canonical_details = details.merge(canonical[KEY_FIELDS + ['_dimension', '_units']], on=KEY_FIELDS)
+    candidate_details = details.merge(candidates[KEY_FIELDS + ['_dimension', '_units']], on=KEY_FIELDS)
+
+    pairs = candidate_details.merge(
+        canonical_details.drop(columns='packaging_spec'), on=group + ['colorant_name'], how='left',
+        suffixes=('', '_canonical'),
+    )
+
+    def matches(column: str) -> pd.Series:
+        # amount / size == canonical amount / canonical size, cross-multiplied in exact integers
+        amounts, canonical_amounts = stored_units(pairs[column]), stored_units(pairs[f'{column}_canonical'])
+        return pd.Series([
+            amount is None if canonical_amount is None
+            else amount is not None and canonical_units == canonical_units  # NaN: no canonical colorant
+            and amount * int(canonical_units) == canonical_amount * int(units)
+            for amount, canonical_amount, units, canonical_units in zip(
+                amounts, canonical_amounts, pairs['_units'], pairs['_units_canonical'])
+        ], index=pairs.index, dtype=bool)
+
+    pairs['_match'] = pairs['_units_canonical'].notna() & matches('weight_g') & matches('volume_ml')
+    matched = pairs.groupby(KEY_FIELDS)['_match'].agg(['all', 'size'])
+
+    candidates = candidates.join(matched, on=KEY_FIELDS).merge(
+        canonical[group + ATTRIBUTE_FIELDS].join(canonical_details.groupby(group).size().rename('_canonical_size'), on=group),
+        on=group, how='left', suffixes=('', '_canonical'),
+    )
+    same_attributes = (candidates[ATTRIBUTE_FIELDS].values == candidates[[f'{field}_canonical' for field in ATTRIBUTE_FIELDS]].values).all(axis=1)
+    # Candidates without colorants have no rows in `matched`; they only collapse onto another empty recipe
+    empty = candidates['size'].isna() & candidates['_canonical_size'].isna()
+    collapsible = same_attributes & (
+        empty | ((candidates['all'] == True) & (candidates['size'] == candidates['_canonical_size']))
+    )
+    dropped = candidates.loc[collapsible, KEY_FIELDS]
+    if dropped.empty:
+        return formulations, details
+
+    print(f"Collapsed {len(dropped)} formulations that only scale a smaller packaging size")
+    specs = (
+        candidates.loc[collapsible, group + ['packaging_spec', '_units']]
+        .sort_values('_units', kind='stable')
+        .groupby(group, sort=False)['packaging_spec'].agg(SCALED_SPEC_SEPARATOR.join).rename('scaled_specs')
+    )
+    specs = canonical[KEY_FIELDS + ['_dimension']].join(specs, on=group, how='inner')
+    canonical_rows = pd.MultiIndex.from_frame(formulations[KEY_FIELDS]).get_indexer(pd.MultiIndex.from_frame(specs[KEY_FIELDS]))
+    formulations.iloc[canonical_rows, formulations.columns.get_loc('scaled_specs')] = specs['scaled_specs'].to_numpy()
+    if 'recipe_hash' in formulations:
+        # A size collapsing in or out of a canonical recipe must count as a change for the delta loader
+        rows = formulations.iloc[canonical_rows]
+        formulations.iloc[canonical_rows, formulations.columns.get_loc('recipe_hash')] = [
+            hashlib.md5(f"{recipe_hash}{GROUP_SEPARATOR}{scaled_specs}".encode()).hexdigest()
+            for recipe_hash, scaled_specs in zip(rows['recipe_hash'], rows['scaled_specs'])
+        ]
+
+    keep = ~pd.MultiIndex.from_frame(formulations[KEY_FIELDS]).isin(pd.MultiIndex.from_frame(dropped))
+    keep_details = ~pd.MultiIndex.from_frame(details[KEY_FIELDS]).isin(pd.MultiIndex.from_frame(dropped))
+    return formulations[keep], details[keep_details]
+
+def build_records(df: pd.DataFrame, with_hashes: bool = True) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Formulations and colorant_details frames of an in-memory A-Y frame (see ingest.parse_records).
+    Packaging sizes that only scale another stored size are dropped (see collapse_scaled_sizes).
+    Pass with_hashes=False to skip the recipe_hash column when nothing will be written.
+    """
+    return collapse_scaled_sizes(*combine_batches([parse_records(df, with_hashes)]))
+
+def load_records(csv_path: str, with_hashes: bool = True) -> Tuple[pd.DataFrame, pd.DataFrame, int]:
+    """build_records() of a CSV file, parsed in parallel chunks; also returns the CSV row count."""
+    formulations, details, rows = read_records(csv_path, with_hashes)
+    return (*collapse_scaled_sizes(formulations, details), rows)
+
+def formulation_tuples(formulations: pd.DataFrame):
+    return list(formulations[STORED_FORMULATION_FIELDS].itertuples(index=False, name=None))
+
+def _to_decimal(value):
+    # Round-trip through str so the database sees the CSV value, not the binary float expansion
+    return None if pd.isna(value) else Decimal(str(value))
+
+def colorant_tuples(details: pd.DataFrame):
+    keys = details[KEY_FIELDS + ['colorant_name']].itertuples(index=False, name=None)
+    weights = map(_to_decimal, details['weight_g'].tolist())
+    volumes = map(_to_decimal, details['volume_ml'].tolist())
+    return [key + (weight, volume) for key, weight, volume in zip(keys, weights, volumes)]
+
+async def copy_to_staging(session: AsyncSession, formulations: pd.DataFrame, details: pd.DataFrame):
+    """Create session-local staging tables and stream both record sets into them with COPY."""
+    await session.execute(text("""
+    CREATE TEMP TABLE staging_formulations (
+        color_code VARCHAR(50),
+        color_card VARCHAR(100),
+        paint_type VARCHAR(100),
+        base_paint VARCHAR(100),
+        packaging_spec VARCHAR(100),
+        colorant_type VARCHAR(100),
+        color_series VARCHAR(100),
+        recipe_hash VARCHAR(32),
+        scaled_specs VARCHAR(200)
+    ) ON COMMIT DROP
+    """))
+    await session.execute(text("""
+    CREATE TEMP TABLE staging_colorant_details (
+        seq SERIAL,
+        color_code VARCHAR(50),
+        color_card VARCHAR(100),
+        paint_type VARCHAR(100),
+        base_paint VARCHAR(100),
+        packaging_spec VARCHAR(100),
+        colorant_name VARCHAR(100),
+        weight_g NUMERIC(12, 7),
+        volume_ml NUMERIC(12, 7)
+    ) ON COMMIT DROP
+    """))
+
+    # COPY needs the asyncpg connection underneath the SQLAlchemy session
+    connection = await session.connection()
+    raw_connection = await connection.get_raw_connection()
+    driver_connection = raw_connection.driver_connection
+
+    await driver_connection.copy_records_to_table(
+        'staging_formulations', records=formulation_tuples(formulations), columns=STORED_FORMULATION_FIELDS
+    )
+    await driver_connection.copy_records_to_table(
+        'staging_colorant_details', records=colorant_tuples(details), columns=COLORANT_FIELDS
+    )
+
+async def merge_staging(session: AsyncSession, prune: bool = False) -> None:
+    """Merge the staging tables into formulations/colorant_details with set-based statements."""
+    key_list = ", ".join(KEY_FIELDS)
+    key_match = " AND ".join(f"t.{field} = s.{field}" for field in KEY_FIELDS)
+
+    if prune:
+        # Formulations missing from the input go away; colorant_details follow via ON DELETE CASCADE
+        await session.execute(text(f"""
+        DELETE FROM formulations t
+        WHERE NOT EXISTS (SELECT 1 FROM staging_formulations s WHERE {key_match})
+        """))
+
+    await session.execute(text(f"""
+    INSERT INTO formulations ({", ".join(STORED_FORMULATION_FIELDS)})
+    SELECT {", ".join(STORED_FORMULATION_FIELDS)} FROM staging_formulations
+    ON CONFLICT ({key_list}) DO UPDATE
+    SET colorant_type = EXCLUDED.colorant_type,
+        color_series = EXCLUDED.color_series,
+        recipe_hash = EXCLUDED.recipe_hash,
+        scaled_specs = EXCLUDED.scaled_specs,
+        updated_at = now()
+    WHERE formulations.recipe_hash IS DISTINCT FROM EXCLUDED.recipe_hash
+    """))
+
+    # New colorant names get their colorants row before details reference them
+    await session.execute(text("""
+    INSERT INTO colorants (name)
+    SELECT DISTINCT colorant_name FROM staging_colorant_details
+    ON CONFLICT (name) DO NOTHING
+    """))
+
+    # colorant_details has no natural unique key, so each staged formulation's recipe is replaced.
+    # Staged rows carry the natural key; the integer ids are resolved here, once per load.
+    await session.execute(text(f"""
+    DELETE FROM colorant_details cd
+    USING formulations t, staging_formulations s
+    WHERE cd.formulation_id = t.id AND {key_match}
+    """))
+    await session.execute(text(f"""
+    INSERT INTO colorant_details (formulation_id, colorant_id, weight_g, volume_ml)
+    SELECT t.id, c.id, s.weight_g, s.volume_ml
+    FROM staging_colorant_details s
+    JOIN formulations t ON {key_match}
+    JOIN colorants c ON c.name = s.colorant_name
+    ORDER BY s.seq
+    """))
+
+async def bulk_load(session: AsyncSession, csv_path: str = DEFAULT_CSV_PATH, prune: bool = False) -> dict:
+    """
+    Load a sekabiaoOG-style CSV with COPY into staging tables and a set-based merge.
+    Commits the session and returns timing statistics.
+    """
+    started = time.perf_counter()
+    formulations, details, csv_rows = load_records(csv_path)
+    parsed = time.perf_counter()
+
+    try:
+        await copy_to_staging(session, formulations, details)
+        copied = time.perf_counter()
+        await merge_staging(session, prune=prune)
+        await refresh_read_model(session)
+        await session.commit()
+    except Exception as e:
+        await session.rollback()
+        print(f"Error during bulk load: {str(e)}")
+        raise
+    finished = time.perf_counter()
+
+    invalidate_caches()
+    await export_snapshot(session)
+
+    total_rows = len(formulations) + len(details)
+    stats = {
+        "csv_rows": csv_rows,
+        "formulations": len(formulations),
+        "colorant_details": len(details),
+        "parse_seconds": round(parsed - started, 3),
+        "copy_seconds": round(copied - parsed, 3),
+        "merge_seconds": round(finished - copied, 3),
+        "total_seconds": round(finished - started, 3),
+        "rows_per_second": round(total_rows / (finished - started)) if finished > started else None,
+    }
+    print(f"Bulk loaded {stats['formulations']} formulations and {stats['colorant_details']} colorant details "
+          f"from {stats['csv_rows']} CSV rows in {stats['total_seconds']}s "
+          f"(parse {stats['parse_seconds']}s, copy {stats['copy_seconds']}s, merge {stats['merge_seconds']}s) "
+          f"- {stats['rows_per_second']} rows/s")
+    return stats
+
+async def main():
+    from database import async_session
+
+    parser = argparse.ArgumentParser(description="Bulk load formulations from a sekabiaoOG-style CSV")
+    parser.add_argument("csv_path", nargs="?", default=DEFAULT_CSV_PATH)
+    parser.add_argument("--prune", action="store_true", help="Delete formulations that are not in the CSV")
+    args = parser.parse_args()
+
+    async with async_session() as session:
+        await bulk_load(session, args.csv_path, prune=args.prune)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,116 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, List, Optional
+
+
+class ResponseCache:
+    """
+    Bounded in-process LRU cache for serialized response bodies.
+
+    Entries expire after `ttl_seconds` and the least recently used entries are
+    evicted once either `max_entries` or `max_bytes` is exceeded.
+    """
+
+    def __init__(self, max_entries: int = 2048, max_bytes: int = 16 * 1024 * 1024, ttl_seconds: float = 300.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, body)
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, body = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return body
+
+    def set(self, key: str, body: bytes) -> None:
+        if len(body) > self.max_bytes:
+            return  # Never let one oversized response flush the whole cache
+
+        if key in self._entries:
+            self._remove(key)
+
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, body)
+        self._bytes += len(body)
+
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def contains(self, key: str) -> bool:
+        """Whether `key` has an unexpired entry; unlike get() this neither counts nor refreshes it."""
+        entry = self._entries.get(key)
+        return entry is not None and entry[0] > time.monotonic()
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Optional[bytes]]]) -> Optional[bytes]:
+        """Return the cached body for `key`, calling `loader` on a miss. `None` results are not cached."""
+        body = self.get(key)
+        if body is not None:
+            return body
+
+        body = await loader()
+        if body is not None:
+            self.set(key, body)
+        return body
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def _remove(self, key: str) -> None:
+        _, body = self._entries.pop(key)
+        self._bytes -= len(body)
+
+
+# Cache for /api/formulation/{color_code}, keyed by color code
+formulation_cache = ResponseCache(
+    max_entries=int(os.getenv("FORMULATION_CACHE_MAX_ENTRIES", "2048")),
+    max_bytes=int(os.getenv("FORMULATION_CACHE_MAX_BYTES", str(16 * 1024 * 1024))),
+    ttl_seconds=float(os.getenv("FORMULATION_CACHE_TTL_SECONDS", "300")),
+)
+
+_invalidation_hooks: List[Callable[[], None]] = [formulation_cache.clear]
+
+
+def register_invalidation_hook(hook: Callable[[], None]) -> None:
+    """Register a callback that drops derived in-memory state when the dataset is reloaded."""
+    _invalidation_hooks.append(hook)
+
+
+def invalidate_caches() -> None:
+    """
+    Drop every in-process cache derived from the formulation/RGB tables.
+
+    Only the calling process is affected. A loader calling this after a reload clears nothing
+    in the API workers, which run in other processes: they drop their caches when their
+    dataset_version poller sees the version the load bumped (refresh_read_model() bumps it in
+    the load's transaction). With DATASET_VERSION_POLL_SECONDS=0 their response cache only
+    expires through its TTL, and the color and suggest indexes keep their data until restart.
+    """
+    for hook in _invalidation_hooks:
+        hook()
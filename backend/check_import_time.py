@@ -0,0 +1,81 @@
+"""
+Import-time budget check for the serving path and the CLI scripts.
+
+Imports each module in a fresh interpreter with `python -X importtime` and no DATABASE_URL
+(importing must not need a database), then fails if the median cumulative import time is
+over budget or if a module that must stay off that path (pandas, alembic, the asyncpg
+driver for model-only imports) was pulled in.
+
+Usage (from backend/):
+    python check_import_time.py            # exit code 1 on a regression
+    IMPORT_BUDGET_SCALE=2 python check_import_time.py   # slower machines / CI runners
+"""
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+# module -> (budget in ms, modules that must not be imported)
+BUDGETS = {
+    "main": (1200, ["pandas", "alembic"]),
+    "models": (500, ["pandas", "alembic", "asyncpg", "numpy", "fastapi"]),
+    "check_color": (500, ["pandas", "alembic", "asyncpg", "numpy", "fastapi"]),
+    "list_colors": (500, ["pandas", "alembic", "asyncpg", "numpy", "fastapi"]),
+    "verify_rgb_data": (500, ["pandas", "alembic", "asyncpg", "numpy", "fastapi"]),
+}
+RUNS = int(os.getenv("IMPORT_BUDGET_RUNS", "5"))
+SCALE = float(os.getenv("IMPORT_BUDGET_SCALE", "1"))
+
+LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def measure(module: str):
+    """(cumulative ms of `module`, set of all imported module names) for one cold import."""
+    env = {key: value for key, value in os.environ.items() if key != "DATABASE_URL"}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr.splitlines()[-1]}")
+
+    cumulative_ms, imported = None, set()
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if not match:
+            continue
+        name = match.group(4)
+        imported.add(name.split(".")[0])
+        if name == module and match.group(3) == " ":  # top-level entry
+            cumulative_ms = int(match.group(2)) / 1000
+    return cumulative_ms, imported
+
+
+def main() -> int:
+    failures = []
+    for module, (budget_ms, forbidden) in BUDGETS.items():
+        budget_ms *= SCALE
+        try:
+            runs = [measure(module) for _ in range(RUNS)]
+        except RuntimeError as e:
+            failures.append(str(e))
+            print(f"FAIL {module}: {e}")
+            continue
+        median_ms = statistics.median(ms for ms, _ in runs)
+        pulled_in = sorted(set(forbidden) & runs[0][1])
+        ok = median_ms <= budget_ms and not pulled_in
+        print(f"{'ok  ' if ok else 'FAIL'} {module}: {median_ms:.0f}ms (budget {budget_ms:.0f}ms)"
+              + (f", imports {', '.join(pulled_in)}" if pulled_in else ""))
+        if not ok:
+            failures.append(module)
+
+    if failures:
+        print(f"Import-time check failed for: {', '.join(failures)}")
+        return 1
+    print("Import-time budget OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
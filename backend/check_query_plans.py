@@ -0,0 +1,318 @@
+"""
+Query plan regression check for the API and loader queries.
+
+Loads a generated benchmark dataset (benchmarks/generate_dataset.py) into the database given by
+PLAN_CHECK_DATABASE_URL, then re-runs the loaders and calls every API endpoint in-process while
+an engine hook runs EXPLAIN (FORMAT JSON) on each statement just before it executes, so
+statements on the loaders' temp staging tables are explained while those tables exist.
+
+Every explained statement must match an expectation in CHECKS (by its SQL), which lists the
+indexes its plan must use, the tables it must not scan sequentially and ceilings on the
+estimated rows and total cost. A plan that breaks its expectation, a statement no expectation
+matches and an expectation no statement matched all fail the check, so a changed index, query
+or new query can't quietly turn a lookup into a sequential scan.
+
+Usage (from backend/):
+    PLAN_CHECK_DATABASE_URL=postgresql+asyncpg://... python check_query_plans.py            # exit code 1 on a regression
+    PLAN_CHECK_DATABASE_URL=... python check_query_plans.py --skip-load   # reuse the data of a previous run
+    PLAN_CHECK_DATABASE_URL=... python check_query_plans.py --verbose     # print every plan summary
+    PLAN_CHECK_DATABASE_URL=... python check_query_plans.py --dump plans.json   # full plans, for new expectations
+The database's formulation, colorant, RGB and read-model tables are emptied and reloaded.
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import tempfile
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks"))
+load_dotenv()
+if not os.getenv("PLAN_CHECK_DATABASE_URL"):
+    sys.exit("Set PLAN_CHECK_DATABASE_URL to a scratch database; its formulation tables are reloaded.")
+os.environ["DATABASE_URL"] = os.environ["PLAN_CHECK_DATABASE_URL"]
+os.environ["DATASET_VERSION_POLL_SECONDS"] = "0"
+
+from sqlalchemy import event, text
+
+from bulk_loader import bulk_load, read_csv
+from database import Base, async_session, get_engine, init_db
+from delta_loader import delta_load
+from generate_dataset import DEFAULT_OUTPUT_DIR, dataset_paths, write_dataset
+from load_rgb_data import load_rgb_values
+import models  # noqa: F401  (registers the tables init_db creates)
+
+
+class PlanCheck(NamedTuple):
+    name: str
+    pattern: str  # regex searched in the statement with whitespace collapsed
+    uses: Tuple[str, ...] = ()  # indexes the plan must use
+    no_seq_scan: Tuple[str, ...] = ()  # tables the plan must not scan sequentially
+    max_rows: Optional[float] = None  # ceiling on the top node's row estimate
+    max_cost: Optional[float] = None  # ceiling on the top node's total cost
+
+
+# Ceilings are estimates for the 100k dataset with headroom; API lookups must stay index probes
+# whatever the data size, loader statements may scan their staging tables but not the big ones.
+CHECKS: List[PlanCheck] = [
+    # API (main.py)
+    PlanCheck("formulation lookup", r"FROM formulation_read_model WHERE formulation_read_model\.color_code_norm = ",
+              uses=("idx_read_model_color_code_norm",), no_seq_scan=("formulation_read_model",),
+              max_rows=100, max_cost=100),
+    PlanCheck("batch lookup", r"FROM formulation_read_model WHERE formulation_read_model\.color_code_norm IN ",
+              uses=("idx_read_model_color_code_norm",), no_seq_scan=("formulation_read_model",),
+              max_rows=500, max_cost=500),
+    PlanCheck("search", r"FROM formulation_read_model WHERE lower\(formulation_read_model\.color_code\) LIKE ",
+              uses=("idx_read_model_color_code_trgm",), no_seq_scan=("formulation_read_model",)),
+    PlanCheck("nearest color formulations",
+              r"FROM formulation_read_model WHERE \(formulation_read_model\.color_code, formulation_read_model\.color_card\) IN ",
+              uses=("formulation_read_model_pkey",), no_seq_scan=("formulation_read_model",),
+              max_rows=500, max_cost=500),
+    PlanCheck("colorant by name", r"^SELECT colorants\.id FROM colorants WHERE colorants\.name = ", max_rows=1, max_cost=10),
+    PlanCheck("colorant usage page",
+              r"FROM colorant_details JOIN formulations ON formulations\.id = colorant_details\.formulation_id WHERE colorant_details\.colorant_id = ",
+              uses=("idx_colorant_details_colorant_weight",), no_seq_scan=("colorant_details", "formulations"),
+              max_cost=1000),
+    PlanCheck("colorant usage count", r"^SELECT count\(\*\) AS count_1 FROM colorant_details WHERE colorant_details\.colorant_id = ",
+              uses=("idx_colorant_details_colorant_weight",), no_seq_scan=("colorant_details",)),
+    PlanCheck("dataset version", r"^SELECT version, updated_at FROM dataset_version WHERE id = 1$", max_cost=10),
+    # Startup indexes read their whole table once per worker
+    PlanCheck("color index load", r"^SELECT color_rgb_values\.color_code, .* FROM color_rgb_values$"),
+    PlanCheck("suggest index load", r"^SELECT DISTINCT color_code, color_card, hex FROM formulation_read_model$"),
+    # Loaders (bulk_loader.py, delta_loader.py, load_rgb_data.py, read_model.py)
+    PlanCheck("stored recipe hashes", r"^SELECT color_code, color_card, paint_type, base_paint, packaging_spec, recipe_hash FROM formulations$"),
+    PlanCheck("upsert formulations", r"^INSERT INTO formulations \(.*\) SELECT .* FROM staging_formulations ON CONFLICT"),
+    PlanCheck("upsert colorants", r"^INSERT INTO colorants \(name\) SELECT DISTINCT colorant_name FROM staging_colorant_details"),
+    PlanCheck("delete replaced colorant details", r"^DELETE FROM colorant_details cd USING formulations t, staging_formulations s ",
+              uses=("idx_colorant_details_formulation_id",), no_seq_scan=("colorant_details",)),
+    PlanCheck("insert colorant details", r"^INSERT INTO colorant_details \(.*\) SELECT .* FROM staging_colorant_details s JOIN formulations t ",
+              no_seq_scan=("formulations",)),
+    PlanCheck("delete removed formulations", r"^DELETE FROM formulations t USING staging_deleted_formulations s ",
+              no_seq_scan=("formulations",)),
+    PlanCheck("bump dataset version", r"^INSERT INTO dataset_version ", max_cost=10),
+    PlanCheck("read model full delete", r"^DELETE FROM formulation_read_model$"),
+    PlanCheck("read model full rebuild", r"^INSERT INTO formulation_read_model \(.*\) SELECT .* LEFT JOIN color_rgb_values rgb ON [^()]*$",
+              uses=("idx_colorant_details_formulation_id",), no_seq_scan=("colorant_details",)),
+    PlanCheck("read model partial delete", r"^DELETE FROM formulation_read_model t USING staging_(deleted_)?formulations k ",
+              uses=("formulation_read_model_pkey",), no_seq_scan=("formulation_read_model",)),
+    PlanCheck("read model partial rebuild",
+              r"^INSERT INTO formulation_read_model \(.*\) SELECT .* WHERE EXISTS \(SELECT 1 FROM staging_(deleted_)?formulations k ",
+              no_seq_scan=("formulations", "colorant_details", "color_rgb_values")),
+    PlanCheck("merge RGB values", r"^INSERT INTO color_rgb_values \(.*\) SELECT .* FROM temp_rgb_values ON CONFLICT"),
+    PlanCheck("RGB load count", r"^SELECT COUNT\(\*\) FROM color_rgb_values$"),
+]
+
+# Connection setup and catalog queries issued by SQLAlchemy/asyncpg, not by our code
+IGNORED = re.compile(r"^(select pg_catalog\.version\(\)|select current_schema\(\)|show |SELECT pg_catalog\.pg_class\.relname)")
+EXPLAINABLE = re.compile(r"^\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b", re.IGNORECASE)
+
+
+class Plan(NamedTuple):
+    statement: str
+    plan: dict
+
+    @property
+    def nodes(self) -> List[dict]:
+        nodes, stack = [], [self.plan]
+        while stack:
+            node = stack.pop()
+            nodes.append(node)
+            stack.extend(node.get("Plans", []))
+        return nodes
+
+    def summary(self) -> str:
+        scans = sorted({
+            f"{node['Node Type']} {node.get('Index Name') or node.get('Relation Name')}"
+            for node in self.nodes if "Relation Name" in node or "Index Name" in node
+        })
+        return f"rows={self.plan['Plan Rows']} cost={self.plan['Total Cost']} [{'; '.join(scans)}]"
+
+
+def collapse(statement: str) -> str:
+    return " ".join(statement.split())
+
+
+def capture_plans(engine, plans: List[Plan]):
+    """Engine hook running EXPLAIN on each statement on the same connection, before it executes."""
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not EXPLAINABLE.match(statement) or IGNORED.match(statement):
+            return
+        if executemany:
+            parameters = parameters[0]
+        explain_cursor = conn.connection.dbapi_connection.cursor()
+        explain_cursor.execute(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+        plan = explain_cursor.fetchone()[0]
+        explain_cursor.close()
+        plans.append(Plan(collapse(statement), (json.loads(plan) if isinstance(plan, str) else plan)[0]["Plan"]))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    return lambda: event.remove(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+
+def check_plan(check: PlanCheck, plan: Plan, indexes: Dict[str, bool]) -> List[str]:
+    problems = []
+    nodes = plan.nodes
+    used = {node.get("Index Name") for node in nodes}
+    for index in check.uses:
+        if index not in used:
+            problems.append(f"does not use {index}" + ("" if index in indexes else " (no such index)"))
+    for node in nodes:
+        if node["Node Type"] == "Seq Scan" and node.get("Relation Name") in check.no_seq_scan:
+            problems.append(f"sequential scan on {node['Relation Name']}")
+    if check.max_rows is not None and plan.plan["Plan Rows"] > check.max_rows:
+        problems.append(f"estimates {plan.plan['Plan Rows']} rows (ceiling {check.max_rows})")
+    if check.max_cost is not None and plan.plan["Total Cost"] > check.max_cost:
+        problems.append(f"costs {plan.plan['Total Cost']} (ceiling {check.max_cost})")
+    return problems
+
+
+def write_delta_csv(csv_path: str, directory: str) -> str:
+    """A copy of the dataset with some formulations dropped and some recipes changed."""
+    df = read_csv(csv_path)
+    changed = df.index[::97]
+    df.loc[changed, "J"] = df.loc[changed, "J"] * 2
+    df = df.drop(df.index[::89])
+    path = os.path.join(directory, "delta.csv")
+    df.to_csv(path, index=False)
+    return path
+
+
+async def load_dataset(formulation_path: str, rgb_path: str) -> None:
+    await init_db()
+    async with async_session() as session:
+        await session.execute(text(
+            "TRUNCATE TABLE formulation_read_model, colorant_details, formulations, colorants, color_rgb_values"
+        ))
+        await session.commit()
+    async with async_session() as session:
+        await bulk_load(session, formulation_path)
+    await load_rgb_values(rgb_path)
+
+
+async def prepare(formulation_path: str, rgb_path: str, skip_load: bool) -> None:
+    if not skip_load:
+        await load_dataset(formulation_path, rgb_path)
+    async with get_engine().connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("ANALYZE"))
+    # Pooled asyncpg connections belong to this event loop; the API runs in another one
+    await get_engine().dispose()
+
+
+async def application_indexes() -> Dict[str, bool]:
+    """Index name -> whether it is unique, for the application's tables."""
+    async with async_session() as session:
+        result = await session.execute(text("""
+        SELECT i.relname, x.indisunique
+        FROM pg_index x
+        JOIN pg_class i ON i.oid = x.indexrelid
+        JOIN pg_class t ON t.oid = x.indrelid
+        WHERE t.relname = ANY(:tables) AND t.relnamespace = 'public'::regnamespace
+        """), {"tables": [table.name for table in Base.metadata.sorted_tables]})
+        return dict(result.all())
+
+
+async def run_loaders(formulation_path: str, rgb_path: str, delta_path: str) -> None:
+    async with async_session() as session:
+        await bulk_load(session, formulation_path)
+    async with async_session() as session:
+        await delta_load(session, delta_path)
+    await load_rgb_values(rgb_path)
+
+
+def run_endpoints(client) -> None:
+    requests = [
+        ("GET", "/api/formulation/0011P", None),
+        ("GET", "/api/formulation/no-such-code", None),
+        ("GET", "/api/formulation/0011P?size=5KG", None),
+        ("GET", "/api/search?q=blue&limit=5", None),
+        ("GET", "/api/suggest?prefix=bl", None),
+        ("GET", "/api/colors/nearest?r=120&g=80&b=60&k=5", None),
+        ("GET", "/api/colors/nearest?r=120&g=80&b=60&k=5&card=KIPAU%20COLOR%20CHART", None),
+        ("GET", "/api/colorants/IYG%20GRN%20G%20Y2154/formulations?limit=20", None),
+        ("GET", "/api/colorants/IYG%20GRN%20G%20Y2154/formulations?min_weight=0.5&max_weight=3&limit=20", None),
+        ("GET", "/api/colorants/IYG%20GRN%20G%20Y2154/formulations?count_only=true", None),
+        ("GET", "/api/colorants/IYG%20GRN%20G%20Y2154/formulations?count_only=true&min_weight=10", None),
+        ("POST", "/api/formulations/batch", {"color_codes": ["0011P", "0012P", "blue bird 20d45"]}),
+        ("POST", "/api/formulations/batch", {"color_codes": ["0011P"], "paint_type": "IYG VS CLASSIC & NORMAL"}),
+    ]
+    for method, url, body in requests:
+        response = client.request(method, url, json=body)
+        if response.status_code >= 500:
+            raise RuntimeError(f"{method} {url} failed with {response.status_code}: {response.text}")
+        if "limit=" in url and response.status_code == 200 and response.json()["next_cursor"]:
+            client.get(f"{url}&cursor={response.json()['next_cursor']}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Check the query plans of the API and loader queries")
+    parser.add_argument("--size", default="100k", help="Dataset size label for generate_dataset.py")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-load", action="store_true", help="Reuse the data loaded by a previous run")
+    parser.add_argument("--verbose", action="store_true")
+    parser.add_argument("--dump", help="Write every statement and its plan to this JSON file")
+    args = parser.parse_args()
+
+    formulation_path, rgb_path = dataset_paths(args.size, args.output_dir)
+    if not (os.path.exists(formulation_path) and os.path.exists(rgb_path)):
+        write_dataset(args.size, args.output_dir, args.seed)
+
+    asyncio.run(prepare(formulation_path, rgb_path, args.skip_load))
+
+    from fastapi.testclient import TestClient
+    import main as api
+
+    plans: List[Plan] = []
+    remove_hook = capture_plans(get_engine(), plans)
+    with tempfile.TemporaryDirectory() as directory, TestClient(api.app) as client:
+        delta_path = write_delta_csv(formulation_path, directory)
+        client.portal.call(run_loaders, formulation_path, rgb_path, delta_path)
+        run_endpoints(client)
+        remove_hook()
+        indexes = client.portal.call(application_indexes)
+    if args.dump:
+        with open(args.dump, "w") as f:
+            json.dump([plan._asdict() for plan in plans], f, indent=1)
+
+    failures = []
+    matched = {check.name: 0 for check in CHECKS}
+    for plan in plans:
+        check = next((check for check in CHECKS if re.search(check.pattern, plan.statement)), None)
+        if check is None:
+            failures.append(f"no expectation for: {plan.statement[:200]}")
+            print(f"FAIL unchecked statement: {plan.statement[:200]}\n     {plan.summary()}")
+            continue
+        matched[check.name] += 1
+        problems = check_plan(check, plan, indexes)
+        if problems:
+            failures.append(check.name)
+        if problems or args.verbose:
+            print(f"{'FAIL' if problems else 'ok  '} {check.name}: {plan.summary()}"
+                  + "".join(f"\n     {problem}" for problem in problems))
+    for name, count in matched.items():
+        if not count:
+            failures.append(name)
+            print(f"FAIL {name}: no statement matched this expectation")
+
+    # Not a failure: unique indexes enforce constraints, others may serve ad-hoc queries
+    used = {node.get("Index Name") for plan in plans for node in plan.nodes}
+    for index, unique in sorted(indexes.items()):
+        if index not in used and not unique:
+            print(f"note {index} is not used by any checked statement")
+
+    print(f"Explained {len(plans)} statements against {len(CHECKS)} expectations.")
+    if failures:
+        print(f"Query plan check failed: {len(failures)} problem(s)")
+        return 1
+    print("Query plans OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
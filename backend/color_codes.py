@@ -0,0 +1,32 @@
+"""
+Normalized color code lookup key.
+
+Users type codes in any case, with stray spaces or separators and with or without leading
+zeros ("0011p", " 11P", "blue-bird 20d45"). Lookups compare a normalized key instead of the
+raw code: ASCII letters lowercased, whitespace and separators (- _ . / ') removed and leading
+zeros dropped from every run of digits. The key is computed in Python for request input and
+in SQL for formulation_read_model.color_code_norm, so the two must stay equivalent; both
+stick to ASCII rules because lower() and \\s on other characters depend on the database locale.
+"""
+import re
+import string
+
+ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+SEPARATORS = re.compile(r"[\s\-_./']+", re.ASCII)
+LEADING_ZEROS = re.compile(r"(^|[^0-9])0+(?=[0-9])")
+
+
+def fold_color_code(color_code: str) -> str:
+    """Lowercased with separators removed but digits untouched; a prefix of it is still a prefix."""
+    return SEPARATORS.sub("", color_code.translate(ASCII_LOWER))
+
+
+def normalize_color_code(color_code: str) -> str:
+    return LEADING_ZEROS.sub(r"\1", fold_color_code(color_code))
+
+
+def normalize_color_code_sql(column: str) -> str:
+    """PostgreSQL expression computing normalize_color_code() of `column`."""
+    lowered = f"translate({column}, '{string.ascii_uppercase}', '{string.ascii_lowercase}')"
+    without_separators = f"regexp_replace({lowered}, '[\\s\\-_./'']+', '', 'g')"
+    return f"regexp_replace({without_separators}, '(^|[^0-9])0+(?=[0-9])', '\\1', 'g')"
@@ -0,0 +1,220 @@
+import numpy as np
+from typing import List, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from cache import register_invalidation_hook
+from models import ColorRgbValue
+
+# Lab space is bucketed into cubic cells of this edge length (in ΔE76 units). A query gathers
+# the cells around the target, ranks them by exact ΔE2000 and then widens the cube until no
+# color outside it can be closer than the k-th match (see min_delta_e76), so the result is the
+# exact top k while the cost still depends on local color density rather than on the table size.
+CELL_SIZE = 6.0
+GRID_OFFSET = 22  # Shifts a/b (roughly -128..128) to non-negative cell coordinates
+GRID_DIM = 64
+MIN_CANDIDATES = 256
+
+# Lower bound of ΔE2000 in terms of ΔE76 for a pair whose mean chroma is at most C:
+#   ΔL'² + ΔC'² + ΔH'² is the squared distance in L'a'b, at least ΔE76² since a' = (1 + G) a;
+#   each term is divided by S_L <= 1.75 (L in 0..100), S_H <= 1 + 0.015 * 1.58 * C' or
+#   S_C = 1 + 0.045 * C', with C' <= 1.5 C;
+#   the rotation term R_T * ΔC * ΔH, |R_T| <= sqrt(3), removes at most sqrt(3)/2 of the sum.
+# So ΔE2000 >= ROTATION_FACTOR * ΔE76 / max(S_L_MAX, 1 + S_C_SLOPE * C).
+S_L_MAX = 1.75
+S_C_SLOPE = 0.045 * 1.5
+ROTATION_FACTOR = float(np.sqrt(1 - np.sqrt(3) / 2))
+
+
+def min_delta_e76(target_chroma: float, delta_e: float) -> float:
+    """
+    ΔE76 distance beyond which no color can be within `delta_e` (ΔE2000) of a target with this
+    chroma; inf when no distance is far enough. A color at ΔE76 distance D has chroma at most
+    target_chroma + D, so the pair's mean chroma is at most target_chroma + D / 2.
+    """
+    # Solve ROTATION_FACTOR * D > delta_e * S for both branches of S = max(S_L_MAX, 1 + S_C_SLOPE * C)
+    lightness_bound = delta_e * S_L_MAX / ROTATION_FACTOR
+    denominator = ROTATION_FACTOR - delta_e * S_C_SLOPE / 2
+    if denominator <= 0:
+        return float("inf")
+    chroma_bound = delta_e * (1 + S_C_SLOPE * target_chroma) / denominator
+    return max(lightness_bound, chroma_bound)
+
+def srgb_to_lab(rgb: np.ndarray) -> np.ndarray:
+    """Convert an (N, 3) array of 8-bit sRGB values to CIELAB (D65 white point)."""
+    c = np.asarray(rgb, dtype=np.float64) / 255.0
+    linear = np.where(c > 0.04045, ((c + 0.055) / 1.055) ** 2.4, c / 12.92)
+
+    xyz = linear @ np.array([
+        [0.4124564, 0.2126729, 0.0193339],
+        [0.3575761, 0.7151522, 0.1191920],
+        [0.1804375, 0.0721750, 0.9503041],
+    ])
+    xyz /= np.array([0.95047, 1.0, 1.08883])
+
+    f = np.where(xyz > 216 / 24389, np.cbrt(xyz), (24389 / 27 * xyz + 16) / 116)
+    return np.stack([
+        116 * f[:, 1] - 16,
+        500 * (f[:, 0] - f[:, 1]),
+        200 * (f[:, 1] - f[:, 2]),
+    ], axis=1)
+
+def delta_e_2000(reference: np.ndarray, samples: np.ndarray) -> np.ndarray:
+    """CIEDE2000 colour difference between one Lab colour and an (N, 3) array of Lab colours."""
+    L1, a1, b1 = reference
+    L2, a2, b2 = samples[:, 0], samples[:, 1], samples[:, 2]
+
+    C1 = np.hypot(a1, b1)
+    C2 = np.hypot(a2, b2)
+    C_bar7 = ((C1 + C2) / 2) ** 7
+    G = 0.5 * (1 - np.sqrt(C_bar7 / (C_bar7 + 25.0 ** 7)))
+
+    a1p = (1 + G) * a1
+    a2p = (1 + G) * a2
+    C1p = np.hypot(a1p, b1)
+    C2p = np.hypot(a2p, b2)
+    h1p = np.degrees(np.arctan2(b1, a1p)) % 360
+    h2p = np.degrees(np.arctan2(b2, a2p)) % 360
+
+    dLp = L2 - L1
+    dCp = C2p - C1p
+    dhp = h2p - h1p
+    dhp = np.where(dhp > 180, dhp - 360, dhp)
+    dhp = np.where(dhp < -180, dhp + 360, dhp)
+    dhp = np.where(C1p * C2p == 0, 0.0, dhp)
+    dHp = 2 * np.sqrt(C1p * C2p) * np.sin(np.radians(dhp / 2))
+
+    Lp_bar = (L1 + L2) / 2
+    Cp_bar = (C1p + C2p) / 2
+    hp_sum = h1p + h2p
+    hp_bar = np.where(np.abs(h1p - h2p) > 180,
+                      np.where(hp_sum < 360, hp_sum + 360, hp_sum - 360),
+                      hp_sum) / 2
+    hp_bar = np.where(C1p * C2p == 0, hp_sum, hp_bar)
+
+    T = (1 - 0.17 * np.cos(np.radians(hp_bar - 30))
+         + 0.24 * np.cos(np.radians(2 * hp_bar))
+         + 0.32 * np.cos(np.radians(3 * hp_bar + 6))
+         - 0.20 * np.cos(np.radians(4 * hp_bar - 63)))
+    d_theta = 30 * np.exp(-(((hp_bar - 275) / 25) ** 2))
+    Cp_bar7 = Cp_bar ** 7
+    R_C = 2 * np.sqrt(Cp_bar7 / (Cp_bar7 + 25.0 ** 7))
+    S_L = 1 + (0.015 * (Lp_bar - 50) ** 2) / np.sqrt(20 + (Lp_bar - 50) ** 2)
+    S_C = 1 + 0.045 * Cp_bar
+    S_H = 1 + 0.015 * Cp_bar * T
+    R_T = -np.sin(np.radians(2 * d_theta)) * R_C
+
+    return np.sqrt(
+        (dLp / S_L) ** 2
+        + (dCp / S_C) ** 2
+        + (dHp / S_H) ** 2
+        + R_T * (dCp / S_C) * (dHp / S_H)
+    )
+
+class ColorIndex:
+    """
+    In-memory CIELAB index over the color_rgb_values table.
+    Built once and reused for every nearest-color query until the dataset is reloaded.
+    """
+
+    def __init__(self):
+        self.codes: List[str] = []
+        self.cards: List[str] = []
+        self.card_ids = {}
+        self.card_index = np.empty(0, dtype=np.int32)
+        self.rgb = np.empty((0, 3), dtype=np.uint8)
+        self.lab = np.empty((0, 3), dtype=np.float64)
+        self.order = np.empty(0, dtype=np.int64)
+        self.sorted_cells = np.empty(0, dtype=np.int64)
+        self.loaded = False
+
+    @staticmethod
+    def _cell_coords(lab: np.ndarray) -> np.ndarray:
+        coords = np.floor(lab / CELL_SIZE).astype(np.int64)
+        coords[:, 1:] += GRID_OFFSET
+        return np.clip(coords, 0, GRID_DIM - 1)
+
+    @staticmethod
+    def _cell_ids(coords: np.ndarray) -> np.ndarray:
+        return (coords[:, 0] * GRID_DIM + coords[:, 1]) * GRID_DIM + coords[:, 2]
+
+    def build(self, rows: List[Tuple[str, str, int, int, int]]) -> None:
+        self.codes = [row[0] for row in rows]
+        self.cards = [row[1] for row in rows]
+        self.card_ids = {card: i for i, card in enumerate(sorted(set(self.cards)))}
+        self.card_index = np.array([self.card_ids[card] for card in self.cards], dtype=np.int32)
+        self.rgb = np.array([row[2:5] for row in rows], dtype=np.uint8).reshape(-1, 3)
+        self.lab = srgb_to_lab(self.rgb)
+        cells = self._cell_ids(self._cell_coords(self.lab))
+        self.order = np.argsort(cells, kind="stable")
+        self.sorted_cells = cells[self.order]
+        self.loaded = True
+
+    def _gather(self, target: np.ndarray, radius: int) -> np.ndarray:
+        """Row indices of every color in the cube of cells within `radius` of the target's cell."""
+        center = self._cell_coords(target[np.newaxis, :])[0]
+        steps = np.arange(-radius, radius + 1)
+        offsets = np.stack(np.meshgrid(steps, steps, steps, indexing="ij"), axis=-1).reshape(-1, 3)
+        coords = center + offsets
+        coords = coords[((coords >= 0) & (coords < GRID_DIM)).all(axis=1)]
+        cells = self._cell_ids(coords)
+        starts = np.searchsorted(self.sorted_cells, cells, side="left")
+        ends = np.searchsorted(self.sorted_cells, cells, side="right")
+        nonempty = ends > starts
+        if not nonempty.any():
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([self.order[a:b] for a, b in zip(starts[nonempty], ends[nonempty])])
+
+    async def load(self, session: AsyncSession) -> None:
+        result = await session.execute(
+            select(ColorRgbValue.color_code, ColorRgbValue.color_card,
+                   ColorRgbValue.red, ColorRgbValue.green, ColorRgbValue.blue)
+        )
+        self.build([tuple(row) for row in result.all()])
+        print(f"Color index built with {len(self.codes)} colors.")
+
+    def invalidate(self) -> None:
+        self.loaded = False
+
+    def nearest(self, rgb: Tuple[int, int, int], k: int, card: Optional[str] = None) -> List[Tuple[int, float]]:
+        """Return up to `k` (row index, ΔE2000) pairs closest to `rgb`, optionally limited to one color card."""
+        card_id = None
+        if card is not None:
+            card_id = self.card_ids.get(card)
+            if card_id is None:
+                return []
+        if len(self.codes) == 0:
+            return []
+
+        target = srgb_to_lab(np.array([rgb]))[0]
+        target_chroma = float(np.hypot(target[1], target[2]))
+        wanted = max(MIN_CANDIDATES, k * 16)
+        radius = 1
+        while True:
+            # Visiting this many cells costs more than scanning every color (or the cube covers the grid)
+            everything = (2 * radius + 1) ** 3 >= len(self.codes) or radius >= GRID_DIM
+            candidates = np.arange(len(self.codes)) if everything else self._gather(target, radius)
+            if card_id is not None:
+                candidates = candidates[self.card_index[candidates] == card_id]
+            if not everything and len(candidates) < max(wanted, k):
+                radius *= 2
+                continue
+            if len(candidates) == 0:
+                return []
+
+            distances = delta_e_2000(target, self.lab[candidates])
+            top_k = min(k, len(candidates))
+            top = np.argpartition(distances, top_k - 1)[:top_k]
+            top = top[np.argsort(distances[top])]
+            if everything:
+                break
+            # Colors outside the cube are more than radius * CELL_SIZE away in ΔE76; done when
+            # that is beyond the distance at which they could still beat the k-th match
+            required = min_delta_e76(target_chroma, float(distances[top[-1]]))
+            if radius * CELL_SIZE >= required:
+                break
+            radius = GRID_DIM if np.isinf(required) else max(radius + 1, int(np.ceil(required / CELL_SIZE)))
+        return [(int(candidates[i]), float(distances[i])) for i in top]
+
+color_index = ColorIndex()
+register_invalidation_hook(color_index.invalidate)
@@ -0,0 +1,186 @@
+"""
+Dataset version and HTTP conditional caching.
+
+Formulation data only changes when a loader runs, and every load bumps the single-row
+dataset_version table in its own transaction. Each worker keeps the current version in memory
+(polled every DATASET_VERSION_POLL_SECONDS) and derives the read endpoints' validators from it:
+a strong ETag of the version plus the response format (so a deploy that changes the JSON also
+changes the ETag) and a Last-Modified of the load time. Revalidations that match are answered
+with a 304 once the endpoint has produced its 200, or before it runs when the 200 is already
+known: on paths where every valid request has a representation, or when the app can tell from
+memory that the requested one exists. A version change seen by the poller also drops this worker's
+in-process caches, which are otherwise only invalidated in the loader's process.
+"""
+import asyncio
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from cache import invalidate_caches
+
+DATASET_VERSION_POLL_SECONDS = float(os.getenv("DATASET_VERSION_POLL_SECONDS", "5"))
+# Browsers revalidate every time (a cheap 304); a CDN may serve a response for s-maxage seconds
+# and keep serving it while it revalidates in the background
+HTTP_CACHE_CONTROL = os.getenv(
+    "HTTP_CACHE_CONTROL", "public, max-age=0, s-maxage=60, stale-while-revalidate=300"
+)
+# Part of every ETag: bump RESPONSE_FORMAT_VERSION when a response body changes shape; BUILD_ID
+# (or Render's commit) additionally separates deploys
+RESPONSE_FORMAT_VERSION = 2  # 2: scaled_from on every formulation; collapsed sizes listed
+BUILD_ID = os.getenv("BUILD_ID") or os.getenv("RENDER_GIT_COMMIT", "")[:12]
+ETAG_SUFFIX = f"{RESPONSE_FORMAT_VERSION}" + (f"-{BUILD_ID}" if BUILD_ID else "")
+
+
+async def bump_dataset_version(session: AsyncSession) -> None:
+    """Increment the dataset version inside the caller's transaction (PostgreSQL only)."""
+    await session.execute(text("""
+    INSERT INTO dataset_version (id, version, updated_at) VALUES (1, 1, now())
+    ON CONFLICT (id) DO UPDATE SET version = dataset_version.version + 1, updated_at = now()
+    """))
+
+
+class DatasetVersionState:
+    """This worker's view of the dataset version and the HTTP validators derived from it."""
+
+    def __init__(self):
+        self.version: Optional[int] = None
+        self.etag: Optional[bytes] = None
+        self.last_modified: Optional[datetime] = None  # whole seconds, as sent in Last-Modified
+        self.last_modified_header: Optional[bytes] = None
+
+    async def refresh(self, session: AsyncSession) -> bool:
+        """Read the version; returns whether it changed since the last refresh."""
+        row = (await session.execute(text("SELECT version, updated_at FROM dataset_version WHERE id = 1"))).first()
+        # No row yet: nothing has been loaded since the table was created
+        version, updated_at = row if row is not None else (0, None)
+        if version == self.version:
+            return False
+        self.version = version
+        self.etag = f'"{version}.{ETAG_SUFFIX}"'.encode()
+        if updated_at is None:
+            self.last_modified = self.last_modified_header = None
+        else:
+            self.last_modified = updated_at.astimezone(timezone.utc).replace(microsecond=0)
+            self.last_modified_header = format_datetime(self.last_modified, usegmt=True).encode()
+        return True
+
+    async def poll(self, session_factory, interval: float = DATASET_VERSION_POLL_SECONDS) -> None:
+        """Background task: refresh every `interval` seconds and drop local caches on a change."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                async with session_factory() as session:
+                    previous = self.version
+                    if await self.refresh(session):
+                        print(f"Dataset version changed from {previous} to {self.version}.")
+                        invalidate_caches()
+            except Exception as e:
+                # Keep serving the last known version; the next poll retries
+                print(f"Dataset version poll failed: {str(e)}")
+
+    def headers(self) -> list:
+        headers = [(b"etag", self.etag), (b"cache-control", HTTP_CACHE_CONTROL.encode())]
+        if self.last_modified_header is not None:
+            headers.append((b"last-modified", self.last_modified_header))
+        return headers
+
+    def not_modified(self, if_none_match: Optional[str], if_modified_since: Optional[str]) -> bool:
+        """Whether a request with these validators can be answered with a 304."""
+        if if_none_match is not None:
+            # Weak comparison, as RFC 9110 prescribes for If-None-Match; If-Modified-Since is then ignored.
+            # "*" is not matched: only the endpoint knows whether the resource exists.
+            etag = self.etag.decode()
+            tags = [tag.strip() for tag in if_none_match.split(",")]
+            return any(tag.removeprefix("W/") == etag for tag in tags)
+        if if_modified_since is not None and self.last_modified is not None:
+            try:
+                since = parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+            if since.tzinfo is None:
+                return False
+            return self.last_modified <= since
+        return False
+
+
+dataset_version = DatasetVersionState()
+
+
+class ConditionalGetMiddleware:
+    """
+    Plain ASGI middleware adding ETag, Last-Modified and Cache-Control to successful GET/HEAD
+    responses under `path_prefixes`. A matching conditional request gets a 304 in place of the
+    endpoint's 200, so a missing resource is still a 404. The 304 is sent before the endpoint and
+    its database session run for GETs under `early_prefixes` (paths that answer every valid
+    request with a representation) and for those `known(path, query)` vouches for: it returns
+    True only when in-memory state of the current dataset version proves a 200.
+    """
+
+    def __init__(
+        self, app, state: DatasetVersionState, path_prefixes: Iterable[str], early_prefixes: Iterable[str] = (),
+        known: Optional[Callable[[str, Dict[str, List[str]]], bool]] = None,
+    ):
+        self.app = app
+        self.state = state
+        self.path_prefixes: Tuple[str, ...] = tuple(path_prefixes)
+        self.early_prefixes: Tuple[str, ...] = tuple(early_prefixes)
+        self.known = known
+
+    def answers_early(self, scope, path: str) -> bool:
+        if scope["method"] != "GET":  # HEAD is not routed for these endpoints
+            return False
+        if path.startswith(self.early_prefixes):
+            return True
+        if self.known is None:
+            return False
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True)
+        return self.known(path, query)
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "")
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in ("GET", "HEAD")
+            or not path.startswith(self.path_prefixes + self.early_prefixes)
+            or self.state.etag is None
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        # Validators of the version this request starts under, even if a poll lands mid-request
+        headers = self.state.headers()
+        request_headers = dict(scope["headers"])
+        if_none_match = request_headers.get(b"if-none-match")
+        if_modified_since = request_headers.get(b"if-modified-since")
+        not_modified = self.state.not_modified(
+            if_none_match.decode("latin-1") if if_none_match is not None else None,
+            if_modified_since.decode("latin-1") if if_modified_since is not None else None,
+        )
+        if not_modified and self.answers_early(scope, path):
+            await send({"type": "http.response.start", "status": 304, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        replaced = False
+
+        async def send_with_validators(message):
+            nonlocal replaced
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                if not_modified:
+                    # The representation exists and is unchanged: drop the body, keep the validators
+                    replaced = True
+                    message = {"type": "http.response.start", "status": 304, "headers": headers}
+                else:
+                    message = {**message, "headers": list(message.get("headers", [])) + headers}
+            elif message["type"] == "http.response.body" and replaced:
+                if message.get("more_body", False):
+                    return
+                message = {"type": "http.response.body", "body": b""}
+            await send(message)
+
+        await self.app(scope, receive, send_with_validators)
@@ -0,0 +1,123 @@
+import argparse
+import asyncio
+import time
+
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bulk_loader import DEFAULT_CSV_PATH, KEY_FIELDS, copy_to_staging, load_records, merge_staging
+from cache import invalidate_caches
+from read_model import refresh_read_model
+from snapshot import export_snapshot
+
+async def fetch_stored_hashes(session: AsyncSession) -> pd.DataFrame:
+    result = await session.execute(text(f"SELECT {', '.join(KEY_FIELDS)}, recipe_hash FROM formulations"))
+    return pd.DataFrame(result.all(), columns=KEY_FIELDS + ['recipe_hash'])
+
+def diff_formulations(incoming: pd.DataFrame, stored: pd.DataFrame):
+    """Split formulations into (inserted, updated, deleted keys, unchanged count) by comparing recipe hashes."""
+    merged = incoming.merge(
+        stored, on=KEY_FIELDS, how='outer', suffixes=('', '_stored'), indicator=True
+    )
+    inserted = merged[merged['_merge'] == 'left_only']
+    both = merged[merged['_merge'] == 'both']
+    changed = both['recipe_hash'] != both['recipe_hash_stored']
+    updated = both[changed]
+    deleted = merged.loc[merged['_merge'] == 'right_only', KEY_FIELDS]
+    return (
+        inserted[incoming.columns],
+        updated[incoming.columns],
+        deleted,
+        int((~changed).sum()),
+    )
+
+async def delete_formulations(session: AsyncSession, keys: pd.DataFrame) -> None:
+    await session.execute(text("""
+    CREATE TEMP TABLE staging_deleted_formulations (
+        color_code VARCHAR(50),
+        color_card VARCHAR(100),
+        paint_type VARCHAR(100),
+        base_paint VARCHAR(100),
+        packaging_spec VARCHAR(100)
+    ) ON COMMIT DROP
+    """))
+    connection = await session.connection()
+    raw_connection = await connection.get_raw_connection()
+    await raw_connection.driver_connection.copy_records_to_table(
+        'staging_deleted_formulations',
+        records=list(keys.itertuples(index=False, name=None)),
+        columns=KEY_FIELDS,
+    )
+
+    # colorant_details rows follow via ON DELETE CASCADE
+    key_match = " AND ".join(f"t.{field} = s.{field}" for field in KEY_FIELDS)
+    await session.execute(text(f"""
+    DELETE FROM formulations t
+    USING staging_deleted_formulations s
+    WHERE {key_match}
+    """))
+
+async def delta_load(session: AsyncSession, csv_path: str = DEFAULT_CSV_PATH, dry_run: bool = False) -> dict:
+    """
+    Reload formulations incrementally: only formulations whose recipe hash changed are written,
+    so unchanged rows keep their updated_at and readers are never blocked by a TRUNCATE.
+    Commits the session and returns the diff summary.
+    """
+    started = time.perf_counter()
+    formulations, details, _ = load_records(csv_path)
+    stored = await fetch_stored_hashes(session)
+    inserted, updated, deleted, unchanged = diff_formulations(formulations, stored)
+
+    summary = {
+        "inserted": len(inserted),
+        "updated": len(updated),
+        "deleted": len(deleted),
+        "unchanged": unchanged,
+    }
+    print(f"Formulation diff: {summary['inserted']} inserted, {summary['updated']} updated, "
+          f"{summary['deleted']} deleted, {summary['unchanged']} unchanged")
+
+    if dry_run or not (len(inserted) or len(updated) or len(deleted)):
+        await session.rollback()
+        summary["seconds"] = round(time.perf_counter() - started, 3)
+        return summary
+
+    changed = pd.concat([inserted, updated], ignore_index=True)
+    changed_keys = changed[KEY_FIELDS]
+    changed_details = details.merge(changed_keys, on=KEY_FIELDS, how='inner')
+
+    try:
+        key_tables = ['staging_formulations']
+        if len(deleted):
+            await delete_formulations(session, deleted)
+            key_tables.append('staging_deleted_formulations')
+        await copy_to_staging(session, changed, changed_details)
+        await merge_staging(session)
+        # Only the touched formulations are rebuilt in the read model
+        await refresh_read_model(session, key_tables)
+        await session.commit()
+    except Exception as e:
+        await session.rollback()
+        print(f"Error during delta load: {str(e)}")
+        raise
+
+    invalidate_caches()
+    await export_snapshot(session)
+    summary["seconds"] = round(time.perf_counter() - started, 3)
+    print(f"Delta load applied in {summary['seconds']}s")
+    return summary
+
+async def main():
+    from database import async_session
+
+    parser = argparse.ArgumentParser(description="Apply only the changed formulations from a sekabiaoOG-style CSV")
+    parser.add_argument("csv_path", nargs="?", default=DEFAULT_CSV_PATH)
+    parser.add_argument("--dry-run", action="store_true", help="Print the diff summary without writing")
+    args = parser.parse_args()
+
+    async with async_session() as session:
+        await delta_load(session, args.csv_path, dry_run=args.dry_run)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,261 @@
+"""
+Parsing stage for sekabiaoOG-style CSVs, shared by the bulk and delta loaders.
+
+Large files are split into byte ranges on line boundaries and each range is parsed,
+normalized and validated in a worker process with column operations only: text columns
+stripped, the five I-W colorant triplets melted to one row per colorant, amounts coerced to
+numbers, empty colorants dropped and recipe hashes computed. Workers return RecordBatch
+objects in file order; combine_batches() then applies the file-wide rule that the first row
+of a repeated formulation key wins. Small files (or ones with quoted fields, which may hide
+line breaks) are parsed in-process as a single batch.
+"""
+import hashlib
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal, ROUND_HALF_UP
+from itertools import repeat
+from typing import Iterator, List, NamedTuple, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Column letters of sekabiaoOG.csv
+FORMULATION_KEY_COLUMNS = {
+    'H': 'color_code',
+    'C': 'color_card',
+    'D': 'paint_type',
+    'E': 'base_paint',
+    'G': 'packaging_spec',
+}
+FORMULATION_ATTRIBUTE_COLUMNS = {
+    'A': 'colorant_type',
+    'B': 'color_series',
+}
+# Up to 5 colorants per row as (name, weight_g, volume_ml) triplets
+COLORANT_SLOTS = [
+    ('I', 'J', 'K'),
+    ('L', 'M', 'N'),
+    ('O', 'P', 'Q'),
+    ('R', 'S', 'T'),
+    ('U', 'V', 'W'),
+]
+TEXT_COLUMNS = list(FORMULATION_KEY_COLUMNS) + list(FORMULATION_ATTRIBUTE_COLUMNS) + [slot[0] for slot in COLORANT_SLOTS]
+
+KEY_FIELDS = list(FORMULATION_KEY_COLUMNS.values())
+ATTRIBUTE_FIELDS = list(FORMULATION_ATTRIBUTE_COLUMNS.values())
+FORMULATION_FIELDS = KEY_FIELDS + ATTRIBUTE_FIELDS + ['recipe_hash']
+COLORANT_FIELDS = KEY_FIELDS + ['colorant_name', 'weight_g', 'volume_ml']
+
+# Separators for the recipe hash payload (ASCII unit/record/group separators).
+# The same payload is built in SQL by the add_recipe_hash migration, so keep them in sync.
+UNIT_SEPARATOR = chr(31)
+RECORD_SEPARATOR = chr(30)
+GROUP_SEPARATOR = chr(29)
+AMOUNT_QUANTUM = Decimal('0.0000001')  # NUMERIC(12, 7)
+
+# Worker processes and bytes of CSV per batch; files under one batch are parsed in-process
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "0")) or os.cpu_count() or 1
+INGEST_CHUNK_BYTES = int(os.getenv("INGEST_CHUNK_BYTES", str(16 * 1024 * 1024)))
+
+
+class RecordBatch(NamedTuple):
+    """Parsed rows of one chunk. `_row` columns number the chunk's CSV rows from 0."""
+    formulations: pd.DataFrame  # KEY_FIELDS + ATTRIBUTE_FIELDS [+ recipe_hash] + _row, first row per key
+    details: pd.DataFrame  # COLORANT_FIELDS + _row, in (row, slot) order
+    rows: int  # CSV rows in the chunk, including rejected ones
+    rejected_rows: int  # rows with a blank key field
+    invalid_amounts: int  # non-blank amount cells that are not numbers (loaded as blank)
+
+
+def read_csv(csv_path_or_buffer) -> pd.DataFrame:
+    # Text columns stay strings so codes like '0011' keep their leading zeros
+    return pd.read_csv(csv_path_or_buffer, dtype={column: str for column in TEXT_COLUMNS})
+
+
+def _format_amount(value) -> str:
+    # Matches PostgreSQL's text form of the stored NUMERIC(12, 7) value
+    if pd.isna(value):
+        return ''
+    return format(Decimal(str(value)).quantize(AMOUNT_QUANTUM, rounding=ROUND_HALF_UP), 'f')
+
+
+def amount_texts(amounts: pd.Series) -> pd.Series:
+    """
+    _format_amount() of every value, vectorized. Rounding the float scaled to 1e-7 units
+    agrees with rounding its decimal text unless the scaled value is within float error of
+    a .5 tie (or too large to be stored); those few go through _format_amount().
+    """
+    values = amounts.to_numpy(dtype=np.float64)
+    blank = np.isnan(values)
+    scaled = np.abs(np.where(blank, 0.0, values)) * 10 ** 7
+    fraction = scaled - np.floor(scaled)
+    exact = ~blank & np.isfinite(scaled) & (scaled < 10 ** 12) & (np.abs(fraction - 0.5) > 1e-3)
+
+    units = pd.Series(np.floor(np.where(exact, scaled, 0.0) + 0.5).astype(np.int64), index=amounts.index)
+    texts = (
+        pd.Series(np.where(np.signbit(values), '-', ''), index=amounts.index)
+        + (units // 10 ** 7).astype(str) + '.' + (units % 10 ** 7).astype(str).str.zfill(7)
+    )
+    texts[blank] = ''
+    fallback = ~exact & ~blank
+    if fallback.any():
+        texts[fallback] = amounts[fallback].map(_format_amount)
+    return texts
+
+
+def recipe_hashes(formulations: pd.DataFrame, details: pd.DataFrame) -> pd.Series:
+    """
+    MD5 of each formulation's key, attributes and colorant recipe (sorted by colorant name).
+    Stored in formulations.recipe_hash so reloads can tell which formulations changed.
+    """
+    entries = details[KEY_FIELDS + ['colorant_name']].copy()
+    entries['_entry'] = (
+        entries['colorant_name']
+        + RECORD_SEPARATOR + amount_texts(details['weight_g'])
+        + RECORD_SEPARATOR + amount_texts(details['volume_ml'])
+    )
+    entries = entries.sort_values(KEY_FIELDS + ['colorant_name'], kind='stable')
+
+    # Join each formulation's entries by rank (a row has at most five colorants) instead of per group
+    groups = entries.groupby(KEY_FIELDS, sort=False)
+    group_ids = groups.ngroup().to_numpy()
+    ranks = groups.cumcount().to_numpy()
+    entry_texts = entries['_entry'].to_numpy(dtype=object)
+    recipes = np.full(groups.ngroups, '', dtype=object)
+    for rank in range(int(ranks.max()) + 1 if len(ranks) else 0):
+        selected = ranks == rank
+        separator = GROUP_SEPARATOR if rank else ''
+        recipes[group_ids[selected]] = recipes[group_ids[selected]] + separator + entry_texts[selected]
+    recipes = pd.Series(recipes, index=pd.MultiIndex.from_frame(entries.loc[ranks == 0, KEY_FIELDS]), name='_recipe')
+
+    merged = formulations[KEY_FIELDS + ATTRIBUTE_FIELDS].join(recipes, on=KEY_FIELDS)
+    merged['_recipe'] = merged['_recipe'].fillna('')
+    payloads = merged[KEY_FIELDS[0]].str.cat(merged[KEY_FIELDS[1:] + ATTRIBUTE_FIELDS + ['_recipe']], sep=UNIT_SEPARATOR)
+    return pd.Series(
+        [hashlib.md5(payload.encode('utf-8')).hexdigest() for payload in payloads], index=formulations.index
+    )
+
+
+def parse_records(df: pd.DataFrame, with_hashes: bool = True) -> RecordBatch:
+    """
+    Turn rows in the A-Y column layout into a formulations frame and a colorant_details frame.
+    When a formulation key repeats, the first row's attributes and recipe win; a colorant
+    repeated within that row is kept once. Rows with a blank key field are rejected.
+    """
+    df = df.reset_index(drop=True)
+    text_columns = list(FORMULATION_KEY_COLUMNS) + list(FORMULATION_ATTRIBUTE_COLUMNS)
+    base = df[text_columns].apply(lambda column: column.str.strip())
+    base = base.rename(columns={**FORMULATION_KEY_COLUMNS, **FORMULATION_ATTRIBUTE_COLUMNS})
+
+    blank_key = (base[KEY_FIELDS].isna() | (base[KEY_FIELDS] == '')).any(axis=1)
+    base[ATTRIBUTE_FIELDS] = base[ATTRIBUTE_FIELDS].fillna('')  # NOT NULL columns
+    formulations = base[~blank_key].drop_duplicates(subset=KEY_FIELDS, keep='first')
+    first_rows = df.loc[formulations.index]
+    formulations = formulations[KEY_FIELDS + ATTRIBUTE_FIELDS].assign(_row=formulations.index)
+
+    # Wide-to-long: one frame per colorant slot, stacked in (row, slot) order
+    slots = []
+    invalid_amounts = 0
+    for slot, (name_col, weight_col, volume_col) in enumerate(COLORANT_SLOTS):
+        slot_frame = base.loc[first_rows.index, KEY_FIELDS].copy()
+        slot_frame['colorant_name'] = first_rows[name_col]
+        for field, column in (('weight_g', weight_col), ('volume_ml', volume_col)):
+            amounts = pd.to_numeric(first_rows[column], errors='coerce')
+            invalid_amounts += int((amounts.isna() & first_rows[column].notna()).sum())
+            slot_frame[field] = amounts
+        slot_frame['_row'] = first_rows.index
+        slot_frame['_slot'] = slot
+        slots.append(slot_frame)
+    details = pd.concat(slots, ignore_index=True)
+
+    names = details['colorant_name'].where(details['colorant_name'].notna(), '').astype(str).str.strip()
+    details['colorant_name'] = names
+    details = details[(names != '') & (names != '0')]
+    details = details[~((details['weight_g'] == 0) & (details['volume_ml'] == 0))]
+    details = details.sort_values(['_row', '_slot'], kind='stable')
+    details = details.drop_duplicates(subset=KEY_FIELDS + ['colorant_name'], keep='first')[COLORANT_FIELDS + ['_row']]
+
+    if with_hashes:
+        formulations = formulations.assign(recipe_hash=recipe_hashes(formulations, details))
+    return RecordBatch(formulations, details, len(df), int(blank_key.sum()), invalid_amounts)
+
+
+def combine_batches(batches: List[RecordBatch]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Concatenate batches in file order and keep the first occurrence of each formulation key
+    across all of them, with that row's colorants. Helper columns are dropped.
+    """
+    offset = 0
+    formulations, details = [], []
+    for batch in batches:
+        formulations.append(batch.formulations.assign(_row=batch.formulations['_row'] + offset))
+        details.append(batch.details.assign(_row=batch.details['_row'] + offset))
+        offset += batch.rows
+    formulations = pd.concat(formulations, ignore_index=True)
+    details = pd.concat(details, ignore_index=True)
+
+    if len(batches) > 1:
+        formulations = formulations.drop_duplicates(subset=KEY_FIELDS, keep='first').reset_index(drop=True)
+        details = details[details['_row'].isin(formulations['_row'])].reset_index(drop=True)
+
+    rejected = sum(batch.rejected_rows for batch in batches)
+    invalid = sum(batch.invalid_amounts for batch in batches)
+    if rejected or invalid:
+        print(f"Skipped {rejected} rows with a blank key field; {invalid} amounts were not numbers and load as blank")
+    return formulations.drop(columns='_row'), details.drop(columns='_row')
+
+
+def _parse_range(csv_path: str, header: bytes, start: int, end: int, with_hashes: bool) -> RecordBatch:
+    with open(csv_path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return parse_records(read_csv(io.BytesIO(header + data)), with_hashes)
+
+
+def chunk_ranges(csv_path: str, chunk_bytes: int = INGEST_CHUNK_BYTES) -> Tuple[bytes, List[Tuple[int, int]]]:
+    """(header line, [(start, end), ...]) byte ranges of about `chunk_bytes` ending on line breaks."""
+    size = os.path.getsize(csv_path)
+    ranges = []
+    with open(csv_path, 'rb') as f:
+        header = f.readline()
+        start = f.tell()
+        while start < size:
+            f.seek(min(start + chunk_bytes, size))
+            f.readline()  # finish the line the boundary falls in
+            end = min(f.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return header, ranges
+
+
+def _has_quotes(csv_path: str) -> bool:
+    with open(csv_path, 'rb') as f:
+        while block := f.read(16 * 1024 * 1024):
+            if b'"' in block:
+                return True
+    return False
+
+
+def iter_record_batches(
+    csv_path: str, with_hashes: bool = True, workers: int = INGEST_WORKERS, chunk_bytes: int = INGEST_CHUNK_BYTES,
+) -> Iterator[RecordBatch]:
+    """Parse `csv_path` in a process pool, yielding one RecordBatch per chunk in file order."""
+    header, ranges = chunk_ranges(csv_path, chunk_bytes)
+    if len(ranges) <= 1 or workers <= 1 or _has_quotes(csv_path):
+        yield parse_records(read_csv(csv_path), with_hashes)
+        return
+
+    # Spawned, not forked: the loaders call this from an event loop with open connections
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges)), mp_context=context) as pool:
+        starts, ends = zip(*ranges)
+        yield from pool.map(_parse_range, repeat(csv_path), repeat(header), starts, ends, repeat(with_hashes))
+
+
+def read_records(csv_path: str, with_hashes: bool = True, workers: int = INGEST_WORKERS) -> Tuple[pd.DataFrame, pd.DataFrame, int]:
+    """(formulations, colorant details, CSV rows) of a whole file, parsed in parallel."""
+    batches = list(iter_record_batches(csv_path, with_hashes, workers))
+    formulations, details = combine_batches(batches)
+    return formulations, details, sum(batch.rows for batch in batches)
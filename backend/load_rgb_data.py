@@ -1,116 +1,68 @@
-import csv
 import asyncio
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
-from database import async_session, init_db
+from database import SCHEMA_MANAGEMENT, async_session, check_schema_version, init_db
+from cache import invalidate_caches
+from read_model import refresh_read_model
+from rgb_cleaning import DEFAULT_RGB_CSV_PATH, RGB_FIELDS, CleaningReport, clean_rgb_rows
+from snapshot import export_snapshot
 
-async def load_rgb_values():
+async def load_rgb_values(csv_path: str = DEFAULT_RGB_CSV_PATH):
     print("Initializing database...")
     try:
-        # Initialize the database and create tables
-        await init_db()
-                
+        if SCHEMA_MANAGEMENT == "alembic":
+            # Migrations own the schema: load only into a database at the migration head
+            await check_schema_version()
+        else:
+            await init_db()
+
         async with async_session() as session:
             async with session.begin():
-                # Create color_rgb_values table if it doesn't exist
-                await session.execute(text("""
-                CREATE TABLE IF NOT EXISTS color_rgb_values (
-                    color_code VARCHAR(50),
-                    color_card VARCHAR(50),
-                    red INTEGER NOT NULL,
-                    green INTEGER NOT NULL,
-                    blue INTEGER NOT NULL,
-                    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-                    PRIMARY KEY (color_code, color_card)
-                )
-                """))
-                
                 print("Creating temporary table...")
                 await session.execute(text("""
                 CREATE TEMP TABLE temp_rgb_values (
-                    color_card VARCHAR(50),
                     color_code VARCHAR(50),
+                    color_card VARCHAR(50),
                     red INTEGER,
                     green INTEGER,
                     blue INTEGER
-                )
+                ) ON COMMIT DROP
                 """))
-                
-                print("Reading CSV file...")
-                # Read and process CSV file
-                with open('data/colorOG_deduplicated.csv', 'r') as f:
-                    reader = csv.DictReader(f)
-                    batch_size = 1000
-                    batch = []
-                    row_count = 0
-                    error_count = 0
-                    
-                    for row in reader:
-                        try:
-                            row_count += 1
-                            color_code = row['color_card'].strip()  # Second column becomes color_code
-                            color_card = row['color_code'].strip()  # First column becomes color_card
-                            red = int(row['red'])
-                            green = int(row['green'])
-                            blue = int(row['blue'])
-                            
-                            # Add to batch
-                            batch.append({
-                                'color_card': color_card,
-                                'color_code': color_code,
-                                'red': red,
-                                'green': green,
-                                'blue': blue
-                            })
-                            
-                            # Process batch if it reaches batch_size
-                            if len(batch) >= batch_size:
-                                print(f"Processing batch of {len(batch)} records...")
-                                await session.execute(
-                                    text("""
-                                    INSERT INTO temp_rgb_values (color_card, color_code, red, green, blue)
-                                    VALUES (:color_card, :color_code, :red, :green, :blue)
-                                    """),
-                                    batch
-                                )
-                                batch = []
-                        
-                        except (ValueError, KeyError) as e:
-                            error_count += 1
-                            print(f"Error processing row {row_count}: {row}. Error: {e}")
-                            continue
-                    
-                    # Process any remaining records
-                    if batch:
-                        print(f"Processing final batch of {len(batch)} records...")
-                        await session.execute(
-                            text("""
-                            INSERT INTO temp_rgb_values (color_card, color_code, red, green, blue)
-                            VALUES (:color_card, :color_code, :red, :green, :blue)
-                            """),
-                            batch
-                        )
-                
-                print("Copying data from temporary to permanent table...")
-                # Insert from temporary table to actual table
-                await session.execute(text("""
+
+                # One streaming pass: rows are cleaned and deduplicated as COPY consumes them
+                print(f"Streaming {csv_path} into the temporary table...")
+                report = CleaningReport()
+                connection = await session.connection()
+                raw_connection = await connection.get_raw_connection()
+                await raw_connection.driver_connection.copy_records_to_table(
+                    'temp_rgb_values', records=clean_rgb_rows(csv_path, report), columns=RGB_FIELDS
+                )
+                report.print()
+
+                print("Merging into color_rgb_values...")
+                # The source is deduplicated, so a reload can take its values for existing keys
+                result = await session.execute(text("""
                 INSERT INTO color_rgb_values (color_code, color_card, red, green, blue)
                 SELECT color_code, color_card, red, green, blue
                 FROM temp_rgb_values
-                ON CONFLICT (color_code, color_card) DO NOTHING
+                ON CONFLICT (color_code, color_card) DO UPDATE
+                SET red = EXCLUDED.red, green = EXCLUDED.green, blue = EXCLUDED.blue, updated_at = now()
+                WHERE (color_rgb_values.red, color_rgb_values.green, color_rgb_values.blue)
+                    IS DISTINCT FROM (EXCLUDED.red, EXCLUDED.green, EXCLUDED.blue)
                 """))
-                
-                # Get counts
-                result = await session.execute(text("SELECT COUNT(*) FROM temp_rgb_values"))
-                temp_count = result.scalar()
+                print(f"Inserted or updated {result.rowcount} RGB values")
+
+                # RGB values are inlined in the read model, so rebuild it in the same transaction
+                print("Refreshing formulation read model...")
+                await refresh_read_model(session)
                 
                 result = await session.execute(text("SELECT COUNT(*) FROM color_rgb_values"))
-                final_count = result.scalar()
-                
-                print(f"Processed {temp_count} RGB values")
-                print(f"Failed to process {error_count} rows")
-                print(f"Final table contains {final_count} RGB values")
+                print(f"Final table contains {result.scalar()} RGB values")
+
+            # Committed; workers mapping SNAPSHOT_PATH pick up the new file on their next check
+            await export_snapshot(session)
+
+        invalidate_caches()
     
     except Exception as e:
         print(f"An error occurred: {str(e)}")
@@ -1,14 +1,32 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Query, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from typing import List, Optional
-from pydantic import BaseModel
+from sqlalchemy import select, func, or_, tuple_
+from typing import Dict, List, Optional, Tuple, Union
+from pydantic import BaseModel, Field
 from decimal import Decimal
 from datetime import datetime
+import asyncio
+import os
+import re
+import time
 
-from database import get_session, init_db
-from models import Formulation, ColorantDetail, ColorRgbValue
+from cache import formulation_cache
+from color_codes import normalize_color_code
+from color_index import color_index
+from dataset_version import DATASET_VERSION_POLL_SECONDS, ConditionalGetMiddleware, dataset_version
+from database import (
+    SCHEMA_MANAGEMENT, async_session, check_schema_version, get_pool_status, get_session, init_db, prewarm_pool
+)
+from metrics import MetricsMiddleware, register_gauge_collector, render_metrics
+from models import Colorant, ColorantDetail, Formulation, FormulationReadModel
+from scaling import expanded_page, parse_density, parse_size, scale_formulations, with_scaled_sizes
+from serializers import (
+    FastJSONResponse, decode_key_cursor, decode_page_cursor, dumps, encode_key_cursor, encode_page_cursor,
+    read_model_row_to_dict, rgb_to_dict
+)
+from suggest_index import SUGGEST_DEFAULT_LIMIT, SUGGEST_MAX_LIMIT, suggest_index
 
 # Pydantic models for response
 class ColorantDetailResponse(BaseModel):
@@ -40,10 +58,129 @@ class FormulationResponse(BaseModel):
     packaging_spec: Optional[str] = None
     colorant_details: List[ColorantDetailResponse]
     color_rgb: Optional[RgbValueResponse] = None
+    scaled_from: Optional[str] = None  # Stored packaging_spec a ?size= result was scaled from; None when stored
 
     class Config:
         from_attributes = True
 
+class NearestColorResponse(BaseModel):
+    color_code: str
+    color_card: str
+    color_rgb: RgbValueResponse
+    delta_e: float
+    formulations: List[FormulationResponse]
+
+class SearchResponse(BaseModel):
+    results: List[FormulationResponse]
+    next_cursor: Optional[str] = None
+
+class ColorantUsageResponse(BaseModel):
+    color_code: str
+    colorant_type: str
+    color_series: str
+    color_card: str
+    paint_type: str
+    base_paint: str
+    packaging_spec: str
+    weight_g: Optional[Decimal] = None
+    volume_ml: Optional[Decimal] = None
+
+class ColorantFormulationsResponse(BaseModel):
+    colorant_name: str
+    results: List[ColorantUsageResponse]
+    next_cursor: Optional[str] = None
+
+class ColorantCountResponse(BaseModel):
+    colorant_name: str
+    count: int
+
+# Upper bound on color codes per /api/formulations/batch request
+BATCH_MAX_CODES = int(os.getenv("BATCH_MAX_CODES", "500"))
+
+class BatchFormulationRequest(BaseModel):
+    color_codes: List[str] = Field(..., min_length=1, max_length=BATCH_MAX_CODES)
+    color_card: Optional[str] = None
+    paint_type: Optional[str] = None
+    base_paint: Optional[str] = None
+    packaging_spec: Optional[str] = None
+
+class BatchFormulationResponse(BaseModel):
+    results: Dict[str, List[FormulationResponse]]
+    missing: List[str]
+
+# Page sizes for /api/search; the maximum is enforced server-side regardless of the requested limit
+SEARCH_DEFAULT_PAGE_SIZE = int(os.getenv("SEARCH_DEFAULT_PAGE_SIZE", "50"))
+SEARCH_MAX_PAGE_SIZE = int(os.getenv("SEARCH_MAX_PAGE_SIZE", "200"))
+
+# Page sizes for /api/colorants/{name}/formulations
+COLORANT_USAGE_DEFAULT_PAGE_SIZE = int(os.getenv("COLORANT_USAGE_DEFAULT_PAGE_SIZE", "100"))
+COLORANT_USAGE_MAX_PAGE_SIZE = int(os.getenv("COLORANT_USAGE_MAX_PAGE_SIZE", "500"))
+
+# Endpoints read from the denormalized read model as plain rows (one SELECT, no ORM identity map)
+read_model = FormulationReadModel.__table__
+
+# Keyset pagination walks the composite primary key in order
+FORMULATION_KEY_COLUMNS = (
+    read_model.c.color_code,
+    read_model.c.color_card,
+    read_model.c.paint_type,
+    read_model.c.base_paint,
+    read_model.c.packaging_spec,
+)
+
+def row_key(row) -> List[str]:
+    return [getattr(row, column.key) for column in FORMULATION_KEY_COLUMNS]
+
+def formulation_dicts(row) -> List[dict]:
+    """A read model row as response dicts: its own recipe, then the larger sizes collapsed onto it."""
+    return with_scaled_sizes(read_model_row_to_dict(row), row.scaled_specs)
+
+def formulation_cache_key(color_code: str, size: Optional[str], density: Optional[str]):
+    """
+    (normalized code, fill size, density, formulation_cache key) of a /api/formulation request;
+    raises ValueError for an invalid size or density. Density only matters with a size.
+    """
+    # "0011p", " 0011P" and "11-P" all resolve to the same formulations through one index probe
+    normalized_code = normalize_color_code(color_code)
+    if size is None:
+        return normalized_code, None, None, normalized_code
+    fill_size = parse_size(size)
+    fill_density = parse_density(density) if density is not None else None
+    return normalized_code, fill_size, fill_density, f"{normalized_code}\x00{fill_size.label}\x00{fill_density}"
+
+def decode_cursor(cursor: str) -> Tuple[List[str], int]:
+    try:
+        return decode_page_cursor(cursor, len(FORMULATION_KEY_COLUMNS))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def color_code_contains(column, q: str, dialect_name: str):
+    """
+    Build a case-insensitive substring filter on a color_code column.
+    On PostgreSQL this matches lower(color_code), which is served by the pg_trgm GIN index;
+    other dialects (SQLite test databases) fall back to ILIKE.
+    """
+    escaped = q.strip().lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    pattern = f"%{escaped}%"
+    if dialect_name == "postgresql":
+        return func.lower(column).like(pattern, escape="\\")
+    return column.ilike(pattern, escape="\\")
+
+def search_page_query(condition, limit: int, start: Optional[List[str]] = None):
+    """
+    Read model rows matching `condition` for one /api/search page of `limit` formulations, in
+    key order from the cursor's row `start` on (scaling.expanded_page() cuts the page).
+    """
+    query = (
+        select(read_model)
+        .where(condition)
+        .order_by(*FORMULATION_KEY_COLUMNS)
+        .limit(limit + 2)  # The cursor's own row may be used up; one more tells us whether another page exists
+    )
+    if start is not None:
+        query = query.where(tuple_(*FORMULATION_KEY_COLUMNS) >= tuple_(*start))
+    return query
+
 # FastAPI instance
 app = FastAPI(title="Paint Formulation API")
 
@@ -58,6 +195,71 @@ origins = [
     "*"                        # Allow all origins in development
 ]
 
+# Query parameter values the endpoints' int validation is sure to accept
+UNSIGNED_INT = re.compile(r"[0-9]+")
+
+def known_representation(path: str, query: Dict[str, List[str]]) -> bool:
+    """
+    Whether a GET is known to be answered with a 200 without running its endpoint, from state
+    that is dropped whenever the dataset version changes: a formulation_cache entry, a code in
+    the suggest index (or, for /api/search, a code containing `q`), or a color card in the color
+    index. Parameters are only vouched for in forms the endpoint accepts too; anything else,
+    including every /api/colorants/ request, goes through the endpoint and its query.
+    """
+    if any(len(values) > 1 for values in query.values()):
+        return False
+    params = {name: values[0] for name, values in query.items()}
+
+    if path.startswith("/api/formulation/"):
+        color_code = path[len("/api/formulation/"):]
+        if not color_code or "/" in color_code:
+            return False
+        try:
+            _, fill_size, _, cache_key = formulation_cache_key(color_code, params.get("size"), params.get("density"))
+        except ValueError:
+            return False
+        if formulation_cache.contains(cache_key):
+            return True
+        # Any known code has a 200 as stored; scaling to a fill size can still be a 422
+        return fill_size is None and suggest_index.loaded and suggest_index.has_code(color_code)
+
+    if path == "/api/search":
+        limit = params.get("limit", "1")
+        if "q" not in params or not UNSIGNED_INT.fullmatch(limit) or int(limit) < 1:
+            return False
+        if params.get("cursor"):
+            try:
+                decode_page_cursor(params["cursor"], len(FORMULATION_KEY_COLUMNS))
+            except ValueError:
+                return False
+            return True  # Later pages are a 200 even when empty
+        return suggest_index.loaded and suggest_index.contains(params["q"].strip())
+
+    if path == "/api/colors/nearest":
+        channels = [params.get(name, "") for name in ("r", "g", "b")]
+        k = params.get("k", "5")
+        if not all(UNSIGNED_INT.fullmatch(value) and int(value) <= 255 for value in channels):
+            return False
+        if not UNSIGNED_INT.fullmatch(k) or not 1 <= int(k) <= 50:
+            return False
+        card = params.get("card")
+        # Up to k matches exist whenever the index (or the requested card) has any color
+        return color_index.loaded and len(color_index.codes) > 0 and (card is None or card in color_index.card_ids)
+
+    return False
+
+# Read endpoints get ETag/Last-Modified from the dataset version and 304s on revalidation.
+# Added before CORS so 304s still carry the CORS headers. Suggestions exist for any prefix, so
+# they can be answered without running the endpoint; elsewhere a 404 must stay a 404, so the
+# endpoint runs unless known_representation() proves the 200 from memory.
+app.add_middleware(
+    ConditionalGetMiddleware,
+    state=dataset_version,
+    path_prefixes=("/api/formulation/", "/api/search", "/api/colors/", "/api/colorants/"),
+    early_prefixes=("/api/suggest",),
+    known=known_representation,
+)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -67,10 +269,82 @@ app.add_middleware(
     expose_headers=["*"]
 )
 
+app.add_middleware(MetricsMiddleware)
+
+def pool_gauges() -> dict:
+    status = get_pool_status()
+    gauges = {
+        "db_pool_checkouts": ("Connections handed out by the pool since startup", status["checkouts"]),
+        "db_pool_timeouts": ("Checkouts that hit the pool timeout since startup", status["timeouts"]),
+        "db_pool_wait_ms_max": ("Longest wait for a pooled connection", status["wait_ms_max"]),
+    }
+    if "checked_out" in status:
+        gauges["db_pool_checked_out"] = ("Connections currently checked out", status["checked_out"])
+        gauges["db_pool_overflow"] = ("Current pool overflow", status["overflow"])
+    return gauges
+
+register_gauge_collector(pool_gauges)
+
+# Build the nearest-color index during startup instead of on the first /api/colors/nearest call
+PREWARM_COLOR_INDEX = os.getenv("PREWARM_COLOR_INDEX", "true").strip().lower() in ("1", "true", "yes", "on")
+
+startup_state = {"ready": False, "schema_version": None, "startup_seconds": None}
+dataset_version_poller: Optional[asyncio.Task] = None
+
 # Initialize database on startup
 @app.on_event("startup")
 async def startup_event():
-    await init_db()
+    started = time.perf_counter()
+    if SCHEMA_MANAGEMENT == "alembic":
+        # Migrations run once per deploy; workers must not race each other with DDL
+        startup_state["schema_version"] = await check_schema_version()
+    else:
+        await init_db()
+    await prewarm_pool()
+    async with async_session() as session:
+        await dataset_version.refresh(session)
+        if PREWARM_COLOR_INDEX:
+            await color_index.load(session)
+        await suggest_index.load(session)
+    global dataset_version_poller
+    if DATASET_VERSION_POLL_SECONDS > 0:
+        dataset_version_poller = asyncio.create_task(dataset_version.poll(async_session))
+    startup_state["startup_seconds"] = round(time.perf_counter() - started, 3)
+    startup_state["ready"] = True
+    print(f"Startup finished in {startup_state['startup_seconds']}s (schema management: {SCHEMA_MANAGEMENT}).")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if dataset_version_poller is not None:
+        dataset_version_poller.cancel()
+
+@app.get("/ready")
+async def ready():
+    """Readiness probe: no database round trip, just whether startup has completed in this worker."""
+    if not startup_state["ready"]:
+        return FastJSONResponse({"status": "starting"}, status_code=503)
+    return FastJSONResponse({"status": "ready", "dataset_version": dataset_version.version, **startup_state})
+
+# When set, /internal/* endpoints require a matching X-Internal-Token header
+INTERNAL_API_TOKEN = os.getenv("INTERNAL_API_TOKEN")
+
+def require_internal_token(x_internal_token: Optional[str] = Header(None)):
+    if INTERNAL_API_TOKEN and x_internal_token != INTERNAL_API_TOKEN:
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+@app.get("/internal/pool", dependencies=[Depends(require_internal_token)])
+async def pool_status():
+    """Connection pool and response cache statistics for this worker process."""
+    return {
+        "pid": os.getpid(),
+        "pool": get_pool_status(),
+        "formulation_cache": formulation_cache.stats(),
+    }
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus text exposition; counters are per worker process."""
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 @app.get("/")
 async def read_root():
@@ -79,122 +353,302 @@ async def read_root():
 @app.get("/api/formulation/{color_code}", response_model=List[FormulationResponse])
 async def get_formulation(
     color_code: str,
+    size: Optional[str] = Query(None, description="Fill size to scale the recipes to, e.g. 18L or 2.5KG"),
+    density: Optional[str] = Query(None, description="Base paint density in kg/L, needed to scale between KG and L"),
     db: AsyncSession = Depends(get_session)
 ):
     """
     Get formulation details by color code.
+    Matching ignores case, whitespace, separators and leading zeros (see color_codes.py).
     Returns colorant values and RGB color information if available.
+    With `size`, returns one recipe per card, paint type and base scaled to that fill size.
+    Responses are served from an in-process cache that loaders invalidate on reload, and carry
+    an ETag of the dataset version so unchanged data revalidates with a 304.
     """
-    # Query for formulation with RGB values
-    query = (
-        select(Formulation, ColorRgbValue)
-        .outerjoin(
-            ColorRgbValue,
-            (Formulation.color_code == ColorRgbValue.color_code) &
-            (Formulation.color_card == ColorRgbValue.color_card)
+    try:
+        normalized_code, fill_size, fill_density, cache_key = formulation_cache_key(color_code, size, density)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def load_formulation() -> Optional[bytes]:
+        # Formulations with colorants and RGB values inlined
+        query = (
+            select(read_model)
+            .where(read_model.c.color_code_norm == normalized_code)
+            .order_by(*FORMULATION_KEY_COLUMNS)
         )
-        .where(Formulation.color_code == color_code)
-    )
 
-    result = await db.execute(query)
-    rows = result.all()
+        result = await db.execute(query)
+        rows = result.all()
+
+        if not rows:
+            return None
+
+        # Prepare response
+        if fill_size is None:
+            response_data = [result for row in rows for result in formulation_dicts(row)]
+        else:
+            # Collapsed sizes are stored sizes too: a request for one returns it as loaded, like api.py
+            stored = [result for row in rows for result in formulation_dicts(row)]
+            response_data = scale_formulations(stored, fill_size, fill_density)
+            if not response_data:
+                raise HTTPException(
+                    status_code=422,
+                    detail=f"Cannot scale {color_code} to {fill_size.label}: stored packaging is "
+                           f"{', '.join(sorted({result['packaging_spec'] for result in stored}))}; pass density to convert between mass and volume"
+                )
+
+        # Cache the rendered body so hits skip both the query and serialization
+        return dumps(response_data)
 
-    if not rows:
+    body = await formulation_cache.get_or_load(cache_key, load_formulation)
+
+    if body is None:
         raise HTTPException(
             status_code=404,
             detail=f"No formulation found for color code: {color_code}"
         )
 
-    # Prepare response
-    response_data = []
-    for formulation, rgb in rows:
-        # Convert RGB values if available
-        rgb_value = None
-        if rgb:
-            hex_color = RgbValueResponse.rgb_to_hex(rgb.red, rgb.green, rgb.blue)
-            rgb_value = RgbValueResponse(
-                rgb={"r": rgb.red, "g": rgb.green, "b": rgb.blue},
-                hex=hex_color
-            )
-
-        # Create response object
-        formulation_response = FormulationResponse(
-            color_code=formulation.color_code,
-            colorant_type=formulation.colorant_type,
-            color_series=formulation.color_series,
-            color_card=formulation.color_card,
-            paint_type=formulation.paint_type,
-            base_paint=formulation.base_paint,
-            packaging_spec=formulation.packaging_spec,
-            colorant_details=[
-                ColorantDetailResponse(
-                    colorant_name=detail.colorant_name,
-                    weight_g=detail.weight_g,
-                    volume_ml=detail.volume_ml
-                ) for detail in formulation.colorant_details
-            ],
-            color_rgb=rgb_value
-        )
-        response_data.append(formulation_response)
-
-    return response_data
+    return Response(content=body, media_type="application/json")
 
-@app.get("/api/search", response_model=List[FormulationResponse])
+@app.get("/api/search", response_model=SearchResponse)
 async def search_formulations(
     q: str,
+    limit: int = Query(SEARCH_DEFAULT_PAGE_SIZE, ge=1),
+    cursor: Optional[str] = None,
     db: AsyncSession = Depends(get_session)
 ):
     """
     Search for formulations by color code.
     Supports partial matches and is case-insensitive.
+    Results are paginated by primary key; pass `next_cursor` back as `cursor` to fetch the next page.
     """
-    query = (
-        select(Formulation, ColorRgbValue)
-        .outerjoin(
-            ColorRgbValue,
-            (Formulation.color_code == ColorRgbValue.color_code) &
-            (Formulation.color_card == ColorRgbValue.color_card)
-        )
-        .where(Formulation.color_code.ilike(f"%{q}%"))
-    )
+    limit = min(limit, SEARCH_MAX_PAGE_SIZE)
 
-    result = await db.execute(query)
-    rows = result.all()
+    start, skip = decode_cursor(cursor) if cursor else (None, 0)
+    result = await db.execute(search_page_query(color_code_contains(read_model.c.color_code, q, db.bind.dialect.name), limit, start))
 
-    if not rows:
+    # Prepare response using the same format as get_formulation; collapsed sizes count against the limit
+    response_data, position = expanded_page(result.all(), formulation_dicts, row_key, limit, start, skip)
+    next_cursor = encode_page_cursor(*position) if position else None
+
+    if not response_data and not cursor:
         raise HTTPException(
             status_code=404,
             detail=f"No formulations found matching: {q}"
         )
 
-    # Prepare response using the same format as get_formulation
+    return FastJSONResponse({"results": response_data, "next_cursor": next_cursor})
+
+@app.get("/api/suggest")
+async def suggest_color_codes(
+    prefix: str = Query(..., min_length=1),
+    limit: int = Query(SUGGEST_DEFAULT_LIMIT, ge=1),
+):
+    """
+    Typeahead: distinct color codes (with card and hex swatch) starting with `prefix`, ignoring
+    case and separators. Served from the in-memory suggest index, not the database.
+    """
+    await suggest_index.ensure_loaded(async_session)
+    return FastJSONResponse(suggest_index.suggest(prefix, min(limit, SUGGEST_MAX_LIMIT)))
+
+@app.get("/api/colors/nearest", response_model=List[NearestColorResponse])
+async def nearest_colors(
+    r: int = Query(..., ge=0, le=255),
+    g: int = Query(..., ge=0, le=255),
+    b: int = Query(..., ge=0, le=255),
+    k: int = Query(5, ge=1, le=50),
+    card: Optional[str] = None,
+    db: AsyncSession = Depends(get_session)
+):
+    """
+    Find the k colors closest to a measured RGB sample by CIEDE2000 (ΔE00), optionally within one color card.
+    Each match includes its formulations.
+    """
+    # The index is rebuilt lazily after a loader invalidates it
+    if not color_index.loaded:
+        await color_index.load(db)
+
+    matches = color_index.nearest((r, g, b), k, card)
+    if not matches:
+        raise HTTPException(
+            status_code=404,
+            detail="No colors found" + (f" in color card: {card}" if card else "")
+        )
+
+    keys = [(color_index.codes[i], color_index.cards[i]) for i, _ in matches]
+    query = (
+        select(read_model)
+        .where(tuple_(read_model.c.color_code, read_model.c.color_card).in_(keys))
+        .order_by(*FORMULATION_KEY_COLUMNS)
+    )
+    result = await db.execute(query)
+
+    formulations_by_key = {key: [] for key in keys}
+    for row in result.all():
+        formulations_by_key[(row.color_code, row.color_card)].extend(formulation_dicts(row))
+
     response_data = []
-    for formulation, rgb in rows:
-        rgb_value = None
-        if rgb:
-            hex_color = RgbValueResponse.rgb_to_hex(rgb.red, rgb.green, rgb.blue)
-            rgb_value = RgbValueResponse(
-                rgb={"r": rgb.red, "g": rgb.green, "b": rgb.blue},
-                hex=hex_color
-            )
-
-        formulation_response = FormulationResponse(
-            color_code=formulation.color_code,
-            colorant_type=formulation.colorant_type,
-            color_series=formulation.color_series,
-            color_card=formulation.color_card,
-            paint_type=formulation.paint_type,
-            base_paint=formulation.base_paint,
-            packaging_spec=formulation.packaging_spec,
-            colorant_details=[
-                ColorantDetailResponse(
-                    colorant_name=detail.colorant_name,
-                    weight_g=detail.weight_g,
-                    volume_ml=detail.volume_ml
-                ) for detail in formulation.colorant_details
-            ],
-            color_rgb=rgb_value
+    for i, delta_e in matches:
+        color_code, color_card = color_index.codes[i], color_index.cards[i]
+        red, green, blue = (int(v) for v in color_index.rgb[i])
+        response_data.append({
+            "color_code": color_code,
+            "color_card": color_card,
+            "color_rgb": rgb_to_dict(red, green, blue),
+            "delta_e": round(delta_e, 4),
+            "formulations": formulations_by_key[(color_code, color_card)],
+        })
+
+    return FastJSONResponse(response_data)
+
+colorants = Colorant.__table__
+colorant_details = ColorantDetail.__table__
+formulations = Formulation.__table__
+
+def encode_usage_cursor(weight_g: Optional[Decimal], detail_id: int) -> str:
+    # "" stands for a missing weight, which sorts after every amount
+    return encode_key_cursor(["" if weight_g is None else str(weight_g), str(detail_id)])
+
+def decode_usage_cursor(cursor: str):
+    try:
+        weight_g, detail_id = decode_key_cursor(cursor, 2)
+        return (Decimal(weight_g) if weight_g else None), int(detail_id)
+    except (ValueError, ArithmeticError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@app.get(
+    "/api/colorants/{name}/formulations",
+    response_model=Union[ColorantFormulationsResponse, ColorantCountResponse],
+)
+async def colorant_formulations(
+    name: str,
+    min_weight: Optional[Decimal] = Query(None, ge=0, description="Only formulations using at least this many grams"),
+    max_weight: Optional[Decimal] = Query(None, ge=0, description="Only formulations using at most this many grams"),
+    count_only: bool = Query(False, description="Return just the number of matching formulations"),
+    limit: int = Query(COLORANT_USAGE_DEFAULT_PAGE_SIZE, ge=1),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_session)
+):
+    """
+    Formulations that use a colorant, heaviest use first (then newest detail), e.g. to find every
+    recipe affected by a reformulated or out-of-stock paste. Filters on the weight in grams;
+    details without a weight come last and are left out by either filter.
+    Paginated by (weight, detail id); pass `next_cursor` back as `cursor` to fetch the next page.
+    Both the page and `count_only` walk idx_colorant_details_colorant_weight for this colorant only.
+    """
+    if min_weight is not None and max_weight is not None and min_weight > max_weight:
+        raise HTTPException(status_code=400, detail="min_weight is greater than max_weight")
+    limit = min(limit, COLORANT_USAGE_MAX_PAGE_SIZE)
+
+    # One probe of the unique name index; unknown colorants are a 404 rather than an empty page
+    colorant_id = (await db.execute(select(colorants.c.id).where(colorants.c.name == name.strip()))).scalar()
+    if colorant_id is None:
+        raise HTTPException(status_code=404, detail=f"No colorant found: {name}")
+
+    weight = colorant_details.c.weight_g
+    conditions = [colorant_details.c.colorant_id == colorant_id]
+    if min_weight is not None:
+        conditions.append(weight >= min_weight)
+    if max_weight is not None:
+        conditions.append(weight <= max_weight)
+    filtered = min_weight is not None or max_weight is not None
+
+    if count_only:
+        count = (await db.execute(select(func.count()).select_from(colorant_details).where(*conditions))).scalar()
+        return FastJSONResponse({"colorant_name": name.strip(), "count": count})
+
+    query = (
+        select(
+            formulations.c.color_code, formulations.c.colorant_type, formulations.c.color_series,
+            formulations.c.color_card, formulations.c.paint_type, formulations.c.base_paint,
+            formulations.c.packaging_spec, colorant_details.c.id, weight, colorant_details.c.volume_ml,
         )
-        response_data.append(formulation_response)
+        .join(formulations, formulations.c.id == colorant_details.c.formulation_id)
+        .where(*conditions)
+    )
+
+    # Weighted details and unweighted ones are read as two index ranges, so neither page needs
+    # an OR across them (which would turn the index condition into a filter)
+    after_weight, after_id = decode_usage_cursor(cursor) if cursor else (None, None)
+    rows = []
+    if after_id is None or after_weight is not None:
+        weighted = query.where(weight.is_not(None))
+        if after_id is not None:
+            weighted = weighted.where(tuple_(weight, colorant_details.c.id) < tuple_(after_weight, after_id))
+        result = await db.execute(
+            weighted.order_by(weight.desc().nulls_last(), colorant_details.c.id.desc()).limit(limit + 1)
+        )
+        rows = result.all()
+    if len(rows) <= limit and not filtered:
+        unweighted = query.where(weight.is_(None))
+        if after_id is not None and after_weight is None:
+            unweighted = unweighted.where(colorant_details.c.id < after_id)
+        result = await db.execute(unweighted.order_by(colorant_details.c.id.desc()).limit(limit + 1 - len(rows)))
+        rows += result.all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_usage_cursor(rows[-1].weight_g, rows[-1].id)
+
+    return FastJSONResponse({
+        "colorant_name": name.strip(),
+        "results": [
+            {
+                "color_code": row.color_code,
+                "colorant_type": row.colorant_type,
+                "color_series": row.color_series,
+                "color_card": row.color_card,
+                "paint_type": row.paint_type,
+                "base_paint": row.base_paint,
+                "packaging_spec": row.packaging_spec,
+                # NUMERIC text, as in the other endpoints' colorant_details
+                "weight_g": None if row.weight_g is None else str(row.weight_g),
+                "volume_ml": None if row.volume_ml is None else str(row.volume_ml),
+            }
+            for row in rows
+        ],
+        "next_cursor": next_cursor,
+    })
+
+@app.post("/api/formulations/batch", response_model=BatchFormulationResponse)
+async def get_formulations_batch(
+    request: BatchFormulationRequest,
+    db: AsyncSession = Depends(get_session)
+):
+    """
+    Get formulations for many color codes at once, optionally narrowed by card, paint type, base and packaging.
+    Results are grouped by color code; codes without any formulation are listed in `missing`.
+    """
+    # Keep the caller's order but look each code up once; codes match like /api/formulation
+    color_codes = list(dict.fromkeys(request.color_codes))
+    normalized_codes = {color_code: normalize_color_code(color_code) for color_code in color_codes}
+
+    query = (
+        select(read_model)
+        .where(read_model.c.color_code_norm.in_(set(normalized_codes.values())))
+        .order_by(*FORMULATION_KEY_COLUMNS)
+    )
+    for column in (read_model.c.color_card, read_model.c.paint_type, read_model.c.base_paint):
+        value = getattr(request, column.key)
+        if value is not None:
+            query = query.where(column == value)
+    if request.packaging_spec is not None:
+        # A size collapsed onto a smaller recipe is only listed in that recipe's scaled_specs
+        query = query.where(or_(read_model.c.packaging_spec == request.packaging_spec, read_model.c.scaled_specs.is_not(None)))
+
+    result = await db.execute(query)
+
+    by_normalized_code = {}
+    for row in result.all():
+        matches = by_normalized_code.setdefault(row.color_code_norm, [])
+        for formulation in formulation_dicts(row):
+            if request.packaging_spec is None or formulation["packaging_spec"] == request.packaging_spec:
+                matches.append(formulation)
+    results = {color_code: by_normalized_code.get(normalized_codes[color_code], []) for color_code in color_codes}
 
-    return response_data
\ No newline at end of file
+    return FastJSONResponse({
+        "results": {color_code: rows for color_code, rows in results.items() if rows},
+        "missing": [color_code for color_code, rows in results.items() if not rows],
+    })
@@ -0,0 +1,32 @@
+"""add_trigram_index_on_color_code
+
+Revision ID: 5c2e9b7d41af
+Revises: 36f6c66a9a9a
+Create Date: 2026-10-17 09:12:40.318224
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c2e9b7d41af'
+down_revision = '36f6c66a9a9a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # pg_trgm lets a GIN index answer leading-wildcard LIKE patterns used by /api/search
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index(
+        'idx_formulation_color_code_trgm',
+        'formulations',
+        [sa.text('lower(color_code) gin_trgm_ops')],
+        unique=False,
+        postgresql_using='gin',
+    )
+
+
+def downgrade():
+    op.drop_index('idx_formulation_color_code_trgm', table_name='formulations')
@@ -0,0 +1,49 @@
+"""add_formulation_recipe_hash
+
+Revision ID: a7d3f0c6b218
+Revises: 5c2e9b7d41af
+Create Date: 2026-10-17 11:40:05.552917
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d3f0c6b218'
+down_revision = '5c2e9b7d41af'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('formulations', sa.Column('recipe_hash', sa.String(length=32), nullable=True))
+
+    # Backfill with the same payload as ingest.recipe_hashes() so the first
+    # incremental reload only touches formulations that really changed
+    op.execute("""
+    UPDATE formulations f
+    SET recipe_hash = md5(
+        concat_ws(chr(31),
+            f.color_code, f.color_card, f.paint_type, f.base_paint, f.packaging_spec,
+            f.colorant_type, f.color_series,
+            coalesce((
+                SELECT string_agg(
+                    cd.colorant_name
+                        || chr(30) || coalesce(cd.weight_g::text, '')
+                        || chr(30) || coalesce(cd.volume_ml::text, ''),
+                    chr(29) ORDER BY cd.colorant_name COLLATE "C")
+                FROM colorant_details cd
+                WHERE cd.color_code = f.color_code
+                  AND cd.color_card = f.color_card
+                  AND cd.paint_type = f.paint_type
+                  AND cd.base_paint = f.base_paint
+                  AND cd.packaging_spec = f.packaging_spec
+            ), '')
+        )
+    )
+    """)
+
+
+def downgrade():
+    op.drop_column('formulations', 'recipe_hash')
@@ -0,0 +1,99 @@
+"""integer_formulation_and_colorant_keys
+
+Revision ID: b3f19c27d6e4
+Revises: e41b8c5a9d02
+Create Date: 2026-10-17 16:20:37.418206
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3f19c27d6e4'
+down_revision = 'e41b8c5a9d02'
+branch_labels = None
+depends_on = None
+
+KEY_FIELDS = ['color_code', 'color_card', 'paint_type', 'base_paint', 'packaging_spec']
+
+
+def upgrade():
+    # Serial ids are assigned to the existing formulations right away
+    op.execute("ALTER TABLE formulations ADD COLUMN id SERIAL")
+
+    # colorants: one row per distinct colorant name
+    op.execute("""
+    INSERT INTO colorants (name)
+    SELECT DISTINCT colorant_name FROM colorant_details
+    ON CONFLICT (name) DO NOTHING
+    """)
+
+    # colorant_details: backfill both integer references in one pass, then drop the string columns
+    op.add_column('colorant_details', sa.Column('formulation_id', sa.Integer(), nullable=True))
+    op.add_column('colorant_details', sa.Column('colorant_id', sa.Integer(), nullable=True))
+    op.execute(f"""
+    UPDATE colorant_details cd
+    SET formulation_id = f.id, colorant_id = c.id
+    FROM formulations f, colorants c
+    WHERE {" AND ".join(f"f.{field} = cd.{field}" for field in KEY_FIELDS)}
+      AND c.name = cd.colorant_name
+    """)
+    op.alter_column('colorant_details', 'formulation_id', nullable=False)
+    op.alter_column('colorant_details', 'colorant_id', nullable=False)
+
+    op.drop_index('idx_colorant_formulation', table_name='colorant_details')
+    op.drop_constraint('colorant_details_color_code_color_card_paint_type_base_pai_fkey', 'colorant_details', type_='foreignkey')
+    for column in KEY_FIELDS + ['colorant_name']:
+        op.drop_column('colorant_details', column)
+
+    # formulations: id becomes the primary key, the composite key stays unique for upserts
+    op.drop_constraint('formulations_pkey', 'formulations', type_='primary')
+    op.create_primary_key('formulations_pkey', 'formulations', ['id'])
+    op.create_unique_constraint('uq_formulation_key', 'formulations', KEY_FIELDS)
+
+    op.create_foreign_key(
+        'colorant_details_formulation_id_fkey', 'colorant_details', 'formulations',
+        ['formulation_id'], ['id'], ondelete='CASCADE',
+    )
+    op.create_foreign_key(
+        'colorant_details_colorant_id_fkey', 'colorant_details', 'colorants', ['colorant_id'], ['id'],
+    )
+    op.create_index('idx_colorant_details_formulation_id', 'colorant_details', ['formulation_id'], unique=False)
+    op.create_index('idx_colorant_details_colorant_id', 'colorant_details', ['colorant_id'], unique=False)
+
+    # Dropped columns keep their space until the rows are rewritten; VACUUM can't run in a transaction
+    with op.get_context().autocommit_block():
+        op.execute("VACUUM FULL ANALYZE colorant_details")
+        op.execute("VACUUM FULL ANALYZE formulations")
+
+
+def downgrade():
+    for column, length in zip(KEY_FIELDS + ['colorant_name'], [50, 100, 100, 100, 100, 100]):
+        op.add_column('colorant_details', sa.Column(column, sa.String(length=length), nullable=True))
+    op.execute(f"""
+    UPDATE colorant_details cd
+    SET {", ".join(f"{field} = f.{field}" for field in KEY_FIELDS)}, colorant_name = c.name
+    FROM formulations f, colorants c
+    WHERE f.id = cd.formulation_id AND c.id = cd.colorant_id
+    """)
+    for column in KEY_FIELDS + ['colorant_name']:
+        op.alter_column('colorant_details', column, nullable=False)
+
+    op.drop_index('idx_colorant_details_colorant_id', table_name='colorant_details')
+    op.drop_index('idx_colorant_details_formulation_id', table_name='colorant_details')
+    op.drop_constraint('colorant_details_colorant_id_fkey', 'colorant_details', type_='foreignkey')
+    op.drop_constraint('colorant_details_formulation_id_fkey', 'colorant_details', type_='foreignkey')
+    op.drop_column('colorant_details', 'colorant_id')
+    op.drop_column('colorant_details', 'formulation_id')
+
+    op.drop_constraint('uq_formulation_key', 'formulations', type_='unique')
+    op.drop_constraint('formulations_pkey', 'formulations', type_='primary')
+    op.create_primary_key('formulations_pkey', 'formulations', KEY_FIELDS)
+    op.drop_column('formulations', 'id')
+
+    op.create_foreign_key(
+        'colorant_details_color_code_color_card_paint_type_base_pai_fkey', 'colorant_details', 'formulations',
+        KEY_FIELDS, KEY_FIELDS, ondelete='CASCADE',
+    )
+    op.create_index('idx_colorant_formulation', 'colorant_details', KEY_FIELDS, unique=False)
@@ -0,0 +1,28 @@
+"""add_formulation_scaled_specs
+
+Revision ID: b8e2d4f0a631
+Revises: f3c9b2e6a715
+Create Date: 2026-10-17 23:12:08.441935
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e2d4f0a631'
+down_revision = 'f3c9b2e6a715'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Packaging specs collapsed onto a smaller canonical recipe by bulk_loader.collapse_scaled_sizes.
+    # Sizes already collapsed by earlier loads cannot be recovered here; the next load fills them in.
+    op.add_column('formulations', sa.Column('scaled_specs', sa.String(length=200), nullable=True))
+    op.add_column('formulation_read_model', sa.Column('scaled_specs', sa.String(length=200), nullable=True))
+
+
+def downgrade():
+    op.drop_column('formulation_read_model', 'scaled_specs')
+    op.drop_column('formulations', 'scaled_specs')
@@ -0,0 +1,33 @@
+"""drop_formulation_color_code_trgm_index
+
+Revision ID: c7a3e1f5b924
+Revises: b8e2d4f0a631
+Create Date: 2026-10-17 23:58:02.117340
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7a3e1f5b924'
+down_revision = 'b8e2d4f0a631'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # /api/search reads formulation_read_model through idx_read_model_color_code_trgm; nothing
+    # queries formulations by substring any more, so this index only slows every load down.
+    # pg_trgm stays installed for the read model index.
+    op.drop_index('idx_formulation_color_code_trgm', table_name='formulations')
+
+
+def downgrade():
+    op.create_index(
+        'idx_formulation_color_code_trgm',
+        'formulations',
+        [sa.text('lower(color_code) gin_trgm_ops')],
+        unique=False,
+        postgresql_using='gin',
+    )
@@ -0,0 +1,37 @@
+"""add_read_model_color_code_norm
+
+Revision ID: c8e2a5d17f03
+Revises: b3f19c27d6e4
+Create Date: 2026-10-17 17:02:14.630588
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8e2a5d17f03'
+down_revision = 'b3f19c27d6e4'
+branch_labels = None
+depends_on = None
+
+# color_codes.normalize_color_code_sql('color_code') at the time of this migration
+NORMALIZED_COLOR_CODE = r"""
+regexp_replace(
+    regexp_replace(
+        translate(color_code, 'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'),
+        '[\s\-_./'']+', '', 'g'),
+    '(^|[^0-9])0+(?=[0-9])', '\1', 'g')
+"""
+
+
+def upgrade():
+    op.add_column('formulation_read_model', sa.Column('color_code_norm', sa.String(length=50), nullable=True))
+    op.execute(f"UPDATE formulation_read_model SET color_code_norm = {NORMALIZED_COLOR_CODE}")
+    op.alter_column('formulation_read_model', 'color_code_norm', nullable=False)
+    op.create_index('idx_read_model_color_code_norm', 'formulation_read_model', ['color_code_norm'], unique=False)
+
+
+def downgrade():
+    op.drop_index('idx_read_model_color_code_norm', table_name='formulation_read_model')
+    op.drop_column('formulation_read_model', 'color_code_norm')
@@ -0,0 +1,35 @@
+"""add_dataset_version
+
+Revision ID: d5a1e7f94c20
+Revises: c8e2a5d17f03
+Create Date: 2026-10-17 18:11:52.207734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5a1e7f94c20'
+down_revision = 'c8e2a5d17f03'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'dataset_version',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.BigInteger(), nullable=False),
+        sa.Column('updated_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    # The existing data counts as version 1, last modified when the read model was last rebuilt
+    op.execute("""
+    INSERT INTO dataset_version (id, version, updated_at)
+    SELECT 1, 1, coalesce(max(updated_at), now()) FROM formulation_read_model
+    """)
+
+
+def downgrade():
+    op.drop_table('dataset_version')
@@ -0,0 +1,75 @@
+"""add_formulation_read_model
+
+Revision ID: e41b8c5a9d02
+Revises: a7d3f0c6b218
+Create Date: 2026-10-17 14:05:51.904663
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'e41b8c5a9d02'
+down_revision = 'a7d3f0c6b218'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('formulation_read_model',
+    sa.Column('color_code', sa.String(length=50), nullable=False),
+    sa.Column('color_card', sa.String(length=100), nullable=False),
+    sa.Column('paint_type', sa.String(length=100), nullable=False),
+    sa.Column('base_paint', sa.String(length=100), nullable=False),
+    sa.Column('packaging_spec', sa.String(length=100), nullable=False),
+    sa.Column('colorant_type', sa.String(length=100), nullable=False),
+    sa.Column('color_series', sa.String(length=100), nullable=False),
+    sa.Column('colorants', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('red', sa.Integer(), nullable=True),
+    sa.Column('green', sa.Integer(), nullable=True),
+    sa.Column('blue', sa.Integer(), nullable=True),
+    sa.Column('hex', sa.String(length=7), nullable=True),
+    sa.Column('updated_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('color_code', 'color_card', 'paint_type', 'base_paint', 'packaging_spec')
+    )
+    op.create_index(
+        'idx_read_model_color_code_trgm',
+        'formulation_read_model',
+        [sa.text('lower(color_code) gin_trgm_ops')],
+        unique=False,
+        postgresql_using='gin',
+    )
+
+    # Initial fill; afterwards the loaders keep it current via read_model.refresh_read_model()
+    op.execute("""
+    INSERT INTO formulation_read_model (
+        color_code, color_card, paint_type, base_paint, packaging_spec,
+        colorant_type, color_series, colorants, red, green, blue, hex
+    )
+    SELECT
+        f.color_code, f.color_card, f.paint_type, f.base_paint, f.packaging_spec,
+        f.colorant_type, f.color_series,
+        coalesce((
+            SELECT jsonb_agg(jsonb_build_array(cd.colorant_name, cd.weight_g::text, cd.volume_ml::text) ORDER BY cd.id)
+            FROM colorant_details cd
+            WHERE cd.color_code = f.color_code
+              AND cd.color_card = f.color_card
+              AND cd.paint_type = f.paint_type
+              AND cd.base_paint = f.base_paint
+              AND cd.packaging_spec = f.packaging_spec
+        ), '[]'::jsonb),
+        rgb.red, rgb.green, rgb.blue,
+        CASE WHEN rgb.red IS NULL THEN NULL
+             ELSE '#' || lpad(to_hex(rgb.red), 2, '0') || lpad(to_hex(rgb.green), 2, '0') || lpad(to_hex(rgb.blue), 2, '0')
+        END
+    FROM formulations f
+    LEFT JOIN color_rgb_values rgb
+        ON rgb.color_code = f.color_code AND rgb.color_card = f.color_card
+    """)
+
+
+def downgrade():
+    op.drop_index('idx_read_model_color_code_trgm', table_name='formulation_read_model')
+    op.drop_table('formulation_read_model')
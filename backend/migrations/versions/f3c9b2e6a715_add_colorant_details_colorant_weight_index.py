@@ -0,0 +1,32 @@
+"""add_colorant_details_colorant_weight_index
+
+Revision ID: f3c9b2e6a715
+Revises: d5a1e7f94c20
+Create Date: 2026-10-17 21:48:36.204117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3c9b2e6a715'
+down_revision = 'd5a1e7f94c20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Replaces the plain colorant_id index: same leading column, plus the weight order and the
+    # columns /api/colorants/{name}/formulations reads, so it can page with an index-only scan
+    op.create_index(
+        'idx_colorant_details_colorant_weight', 'colorant_details',
+        ['colorant_id', sa.text('weight_g DESC NULLS LAST'), sa.text('id DESC')],
+        unique=False, postgresql_include=['formulation_id', 'volume_ml'],
+    )
+    op.drop_index('idx_colorant_details_colorant_id', table_name='colorant_details')
+
+
+def downgrade():
+    op.create_index('idx_colorant_details_colorant_id', 'colorant_details', ['colorant_id'], unique=False)
+    op.drop_index('idx_colorant_details_colorant_weight', table_name='colorant_details')
@@ -1,7 +1,9 @@
 from sqlalchemy import (
-    Column, String, Float, Integer, ForeignKey, Index, UniqueConstraint, 
-    TIMESTAMP, Numeric, ForeignKeyConstraint
+    Column, String, Float, Integer, BigInteger, ForeignKey, Index, UniqueConstraint, 
+    TIMESTAMP, Numeric, JSON
 )
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base  # Import Base from our database module
@@ -18,26 +20,35 @@ class Colorant(Base):
 class Formulation(Base):
     __tablename__ = "formulations"
 
-    # Instead of a single primary key, we'll use a composite primary key
-    color_code = Column(String(50), nullable=False, primary_key=True)      # H
-    color_card = Column(String(100), nullable=False, primary_key=True)     # C
-    paint_type = Column(String(100), nullable=False, primary_key=True)     # D
-    base_paint = Column(String(100), nullable=False, primary_key=True)     # E
-    packaging_spec = Column(String(100), nullable=False, primary_key=True) # G
+    # Integer surrogate key; colorant_details reference formulations through it
+    id = Column(Integer, primary_key=True)
+
+    # Natural key (unique); loaders upsert on it
+    color_code = Column(String(50), nullable=False)      # H
+    color_card = Column(String(100), nullable=False)     # C
+    paint_type = Column(String(100), nullable=False)     # D
+    base_paint = Column(String(100), nullable=False)     # E
+    packaging_spec = Column(String(100), nullable=False) # G
 
     # Other non-key columns
     colorant_type = Column(String(100), nullable=False)      # A
     color_series = Column(String(100), nullable=False)       # B
+    # MD5 of key, attributes and colorant recipe; lets reloads apply only changed formulations
+    recipe_hash = Column(String(32), nullable=True)
+    # Larger packaging specs whose recipes only scale this one (comma-separated); see bulk_loader.collapse_scaled_sizes
+    scaled_specs = Column(String(200), nullable=True)
     created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
     updated_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now())
 
     colorant_details = relationship("ColorantDetail",
                                     back_populates="formulation",
                                     cascade="all, delete-orphan",
+                                    order_by="ColorantDetail.id",
                                     lazy="selectin")  # Efficient loading strategy
 
     # Create indexes for better query performance
     __table_args__ = (
+        UniqueConstraint(color_code, color_card, paint_type, base_paint, packaging_spec, name='uq_formulation_key'),
         Index('idx_formulation_search', color_code, paint_type, base_paint),
         Index('idx_color_card', color_card),
     )
@@ -49,34 +60,33 @@ class ColorantDetail(Base):
     __tablename__ = "colorant_details"
 
     id = Column(Integer, primary_key=True)
-    # Reference to the parent formulation using composite foreign key
-    color_code = Column(String(50), nullable=False)
-    color_card = Column(String(100), nullable=False)
-    paint_type = Column(String(100), nullable=False)
-    base_paint = Column(String(100), nullable=False)
-    packaging_spec = Column(String(100), nullable=False)
-    
-    colorant_name = Column(String(100), nullable=False)
+    formulation_id = Column(Integer, ForeignKey("formulations.id", ondelete="CASCADE"), nullable=False)
+    colorant_id = Column(Integer, ForeignKey("colorants.id"), nullable=False)
+
     weight_g = Column(Numeric(12, 7), nullable=True)
     volume_ml = Column(Numeric(12, 7), nullable=True)
 
     formulation = relationship("Formulation", back_populates="colorant_details")
+    colorant = relationship("Colorant", lazy="joined")
+    # Read (and, for new objects, set) the colorant by name
+    colorant_name = association_proxy("colorant", "name", creator=lambda name: Colorant(name=name))
 
     __table_args__ = (
-        ForeignKeyConstraint(
-            ['color_code', 'color_card', 'paint_type', 'base_paint', 'packaging_spec'],
-            ['formulations.color_code', 'formulations.color_card', 
-             'formulations.paint_type', 'formulations.base_paint',
-             'formulations.packaging_spec'],
-            ondelete="CASCADE"
-        ),
-        Index('idx_colorant_formulation', color_code, color_card, paint_type, base_paint, packaging_spec),
+        Index('idx_colorant_details_formulation_id', formulation_id),
+        # Reverse lookup by colorant, heaviest use first (/api/colorants/{name}/formulations):
+        # equality on the colorant, range and order on the weight, index-only with the included columns.
+        # Also covers the colorant_id foreign key. The directions are PostgreSQL-only (SQLite rejects
+        # NULLS LAST in an index); elsewhere the ascending index is scanned backwards for the same order.
+        Index('idx_colorant_details_colorant_weight',
+              colorant_id, weight_g, id,
+              postgresql_ops={'weight_g': 'DESC NULLS LAST', 'id': 'DESC'},
+              postgresql_include=['formulation_id', 'volume_ml']),
     )
     created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
     updated_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now())
 
     def __repr__(self):
-        return f"<ColorantDetail(color_code='{self.color_code}', colorant_name='{self.colorant_name}', weight={self.weight_g}g)>"
+        return f"<ColorantDetail(formulation_id={self.formulation_id}, colorant_id={self.colorant_id}, weight={self.weight_g}g)>"
 
 class ColorRgbValue(Base):
     __tablename__ = "color_rgb_values"
@@ -94,4 +104,55 @@ class ColorRgbValue(Base):
     )
 
     def __repr__(self):
-        return f"<ColorRgbValue(id={self.id}, color_code='{self.color_code}', color_card='{self.color_card}', rgb=({self.red},{self.green},{self.blue}))>"
\ No newline at end of file
+        return f"<ColorRgbValue(id={self.id}, color_code='{self.color_code}', color_card='{self.color_card}', rgb=({self.red},{self.green},{self.blue}))>"
+
+class FormulationReadModel(Base):
+    """
+    Denormalized, read-only copy of formulations with their colorants and RGB values inlined,
+    so the API can answer with one indexed SELECT. Rebuilt by read_model.refresh_read_model().
+    """
+    __tablename__ = "formulation_read_model"
+
+    color_code = Column(String(50), primary_key=True)
+    color_card = Column(String(100), primary_key=True)
+    paint_type = Column(String(100), primary_key=True)
+    base_paint = Column(String(100), primary_key=True)
+    packaging_spec = Column(String(100), primary_key=True)
+
+    colorant_type = Column(String(100), nullable=False)
+    color_series = Column(String(100), nullable=False)
+    scaled_specs = Column(String(200), nullable=True)  # copied from formulations
+    # color_codes.normalize_color_code(color_code); exact lookups probe this instead of color_code
+    color_code_norm = Column(String(50), nullable=False)
+    # [[colorant_name, weight_g, volume_ml], ...] in detail order; amounts are the NUMERIC text
+    colorants = Column(JSON().with_variant(JSONB(), 'postgresql'), nullable=False)
+    red = Column(Integer, nullable=True)
+    green = Column(Integer, nullable=True)
+    blue = Column(Integer, nullable=True)
+    hex = Column(String(7), nullable=True)
+    updated_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index('idx_read_model_color_code_norm', color_code_norm),
+        Index('idx_read_model_color_code_trgm',
+              func.lower(color_code).label('color_code_lower'),
+              postgresql_using='gin',
+              postgresql_ops={'color_code_lower': 'gin_trgm_ops'}),
+    )
+
+    def __repr__(self):
+        return f"<FormulationReadModel(color_code='{self.color_code}', paint_type='{self.paint_type}', base_paint='{self.base_paint}')>"
+
+class DatasetVersion(Base):
+    """
+    Single row (id 1) counting reloads of the formulation data; refresh_read_model() bumps it in
+    the loader's transaction. The API derives HTTP ETag/Last-Modified from it (dataset_version.py).
+    """
+    __tablename__ = "dataset_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False)
+    updated_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
+
+    def __repr__(self):
+        return f"<DatasetVersion(version={self.version}, updated_at={self.updated_at})>"
@@ -0,0 +1,64 @@
+from typing import Iterable, Optional
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from color_codes import normalize_color_code_sql
+from dataset_version import bump_dataset_version
+
+KEY_FIELDS = ['color_code', 'color_card', 'paint_type', 'base_paint', 'packaging_spec']
+
+# One row per formulation: colorants pre-aggregated in detail order, RGB and hex inlined
+READ_MODEL_SELECT = f"""
+SELECT
+    {", ".join(f"f.{field}" for field in KEY_FIELDS)},
+    f.colorant_type,
+    f.color_series,
+    f.scaled_specs,
+    {normalize_color_code_sql("f.color_code")} AS color_code_norm,
+    coalesce((
+        SELECT jsonb_agg(jsonb_build_array(c.name, cd.weight_g::text, cd.volume_ml::text) ORDER BY cd.id)
+        FROM colorant_details cd
+        JOIN colorants c ON c.id = cd.colorant_id
+        WHERE cd.formulation_id = f.id
+    ), '[]'::jsonb) AS colorants,
+    rgb.red,
+    rgb.green,
+    rgb.blue,
+    CASE WHEN rgb.red IS NULL THEN NULL
+         ELSE '#' || lpad(to_hex(rgb.red), 2, '0') || lpad(to_hex(rgb.green), 2, '0') || lpad(to_hex(rgb.blue), 2, '0')
+    END AS hex
+FROM formulations f
+LEFT JOIN color_rgb_values rgb
+    ON rgb.color_code = f.color_code AND rgb.color_card = f.color_card
+"""
+
+READ_MODEL_COLUMNS = KEY_FIELDS + ['colorant_type', 'color_series', 'scaled_specs', 'color_code_norm', 'colorants', 'red', 'green', 'blue', 'hex']
+
+async def refresh_read_model(session: AsyncSession, key_tables: Optional[Iterable[str]] = None) -> None:
+    """
+    Rebuild formulation_read_model inside the caller's transaction (PostgreSQL only).
+
+    With `key_tables`, only formulations whose keys appear in those (staging) tables are
+    rebuilt; otherwise the whole table is replaced. Readers keep seeing the old rows until commit.
+    Also bumps the dataset version, so API validators (ETags) change with the same commit.
+    """
+    await bump_dataset_version(session)
+    columns = ", ".join(READ_MODEL_COLUMNS)
+    if key_tables is None:
+        await session.execute(text("DELETE FROM formulation_read_model"))
+        await session.execute(text(f"INSERT INTO formulation_read_model ({columns}) {READ_MODEL_SELECT}"))
+        return
+
+    for table in key_tables:
+        key_match = " AND ".join(f"t.{field} = k.{field}" for field in KEY_FIELDS)
+        await session.execute(text(f"""
+        DELETE FROM formulation_read_model t
+        USING {table} k
+        WHERE {key_match}
+        """))
+        key_filter = " AND ".join(f"k.{field} = f.{field}" for field in KEY_FIELDS)
+        await session.execute(text(f"""
+        INSERT INTO formulation_read_model ({columns})
+        {READ_MODEL_SELECT}
+        WHERE EXISTS (SELECT 1 FROM {table} k WHERE {key_filter})
+        """))
@@ -0,0 +1,248 @@
+"""
+Cleaning stage for color RGB CSVs (colorOG.csv and files like it).
+
+The raw export cannot be trusted on three counts, which used to be fixed by hand into
+colorOG_cleaned.csv and colorOG_deduplicated.csv:
+
+- headers: colorOG.csv labels the card column "color_code" and the code column "color_card".
+  Column roles are therefore detected from the data: of the two text columns the card is the
+  one with fewer distinct values in the first RGB_ROLE_SAMPLE_ROWS rows. red/green/blue are
+  taken by header name, falling back to the numeric columns in file order.
+- values: some RGB components are fractional ("241.119"). They are truncated to integers,
+  which is what the hand-cleaned files (and so the loaded data) always did.
+- duplicates: a (color_code, color_card) key may appear more than once. Rows are deduplicated
+  in the same pass through a dict keyed on the key; the first occurrence wins and a repeat
+  with different RGB values is recorded as a conflict in the report.
+
+clean_rgb_rows() streams cleaned rows from a file so loaders never need an intermediate file;
+`python rgb_cleaning.py data/colorOG.csv -o colorOG_clean.csv` writes one for inspection.
+"""
+import argparse
+import csv
+import os
+import sys
+from itertools import chain, islice
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+DEFAULT_RGB_CSV_PATH = os.path.join(os.path.dirname(__file__), 'data', 'colorOG.csv')
+RGB_FIELDS = ['color_code', 'color_card', 'red', 'green', 'blue']
+# Leading rows buffered to detect column roles before streaming the rest
+RGB_ROLE_SAMPLE_ROWS = int(os.getenv("RGB_ROLE_SAMPLE_ROWS", "1000"))
+CARD_WORDS = ('card', 'chart', 'fan', 'deck')
+CHANNEL_NAMES = {
+    'red': ('red', 'r'),
+    'green': ('green', 'g'),
+    'blue': ('blue', 'b'),
+}
+
+
+class RgbRow(NamedTuple):
+    color_code: str
+    color_card: str
+    red: int
+    green: int
+    blue: int
+
+
+class ColumnRoles(NamedTuple):
+    """Column index of each field in the source file."""
+    color_code: int
+    color_card: int
+    red: int
+    green: int
+    blue: int
+
+
+class RgbConflict(NamedTuple):
+    color_code: str
+    color_card: str
+    kept: Tuple[int, int, int]
+    kept_line: int
+    dropped: Tuple[int, int, int]
+    dropped_line: int
+
+
+class CleaningReport:
+    """What a cleaning pass did; filled in while clean_rgb_rows() is consumed."""
+
+    def __init__(self):
+        self.roles: Optional[ColumnRoles] = None
+        self.rows_read = 0
+        self.rows_written = 0
+        self.duplicates = 0  # repeats with the same RGB values
+        self.conflicts: List[RgbConflict] = []  # repeats with different RGB values
+        self.invalid: List[Tuple[int, str]] = []  # (line number, reason)
+        self.truncated = 0  # rows with fractional RGB components
+
+    def summary(self) -> str:
+        return (
+            f"{self.rows_read} rows read, {self.rows_written} written, {self.duplicates} duplicates, "
+            f"{len(self.conflicts)} conflicts, {len(self.invalid)} invalid, "
+            f"{self.truncated} with fractional RGB truncated"
+        )
+
+    def print(self) -> None:
+        print(f"RGB cleaning: {self.summary()}")
+        for conflict in self.conflicts:
+            print(
+                f"  conflict for {conflict.color_card} / {conflict.color_code}: kept {conflict.kept} "
+                f"(line {conflict.kept_line}), dropped {conflict.dropped} (line {conflict.dropped_line})"
+            )
+        for line, reason in self.invalid:
+            print(f"  invalid line {line}: {reason}")
+
+
+def _is_number(value: str) -> bool:
+    try:
+        float(value)
+    except ValueError:
+        return False
+    return True
+
+
+def detect_roles(header: Sequence[str], sample: Sequence[Sequence[str]]) -> ColumnRoles:
+    """Map header + leading rows to column roles; raises ValueError when they cannot be told apart."""
+    names = [name.strip().lower() for name in header]
+    numeric = [
+        index for index in range(len(names))
+        if sample and all(_is_number(row[index].strip()) for row in sample if len(row) > index)
+    ]
+
+    channels = {}
+    for channel, aliases in CHANNEL_NAMES.items():
+        matches = [index for index, name in enumerate(names) if name in aliases]
+        if len(matches) == 1:
+            channels[channel] = matches[0]
+    if len(channels) < 3:
+        if len(numeric) < 3:
+            raise ValueError(f"Cannot find red/green/blue columns in {header}")
+        channels = dict(zip(CHANNEL_NAMES, numeric[-3:]))
+
+    # Codes may look numeric ("11"), so only the RGB columns are excluded here
+    text_columns = [index for index in range(len(names)) if index not in channels.values()]
+    if len(text_columns) != 2:
+        raise ValueError(f"Expected two text columns (code and card) besides RGB, found {len(text_columns)} in {header}")
+
+    def distinct(index):
+        return len({row[index].strip() for row in sample if len(row) > index})
+
+    def card_words(index):
+        return sum(any(word in row[index].lower() for word in CARD_WORDS) for row in sample if len(row) > index)
+
+    first, second = text_columns
+    if distinct(first) != distinct(second):
+        card = first if distinct(first) < distinct(second) else second
+    elif card_words(first) != card_words(second):
+        card = first if card_words(first) > card_words(second) else second
+    elif 'card' in names[first] or 'card' in names[second]:
+        # Too few rows to tell from the data: trust the header
+        card = first if 'card' in names[first] else second
+    else:
+        raise ValueError(f"Cannot tell the color code column from the card column in {header}")
+    code = second if card == first else first
+    return ColumnRoles(code, card, channels['red'], channels['green'], channels['blue'])
+
+
+def _component(value: str) -> Tuple[int, bool]:
+    """Integer RGB component and whether it had to be truncated."""
+    number = float(value)
+    if not 0 <= number < 256:
+        raise ValueError(f"{value!r} is out of range")
+    return int(number), not number.is_integer()
+
+
+def _clean(
+    header: Sequence[str], rows: Iterator[Sequence[str]], report: CleaningReport, first_line: int
+) -> Iterator[RgbRow]:
+    sample = list(islice(rows, RGB_ROLE_SAMPLE_ROWS))
+    roles = report.roles = detect_roles(header, sample)
+    seen: Dict[Tuple[str, str], Tuple[Tuple[int, int, int], int]] = {}
+
+    for line, row in enumerate(chain(sample, rows), first_line):
+        if not any(field.strip() for field in row):
+            continue
+        report.rows_read += 1
+        try:
+            code = row[roles.color_code].strip()
+            card = row[roles.color_card].strip()
+            if not code or not card:
+                raise ValueError("blank color code or card")
+            (red, t_red), (green, t_green), (blue, t_blue) = (
+                _component(row[index].strip()) for index in (roles.red, roles.green, roles.blue)
+            )
+        except (IndexError, ValueError) as e:
+            report.invalid.append((line, str(e)))
+            continue
+
+        rgb = (red, green, blue)
+        key = (code, card)
+        previous = seen.get(key)
+        if previous is not None:
+            kept, kept_line = previous
+            if kept == rgb:
+                report.duplicates += 1
+            else:
+                report.conflicts.append(RgbConflict(code, card, kept, kept_line, rgb, line))
+            continue
+        seen[key] = (rgb, line)
+
+        report.truncated += t_red or t_green or t_blue
+        report.rows_written += 1
+        yield RgbRow(code, card, red, green, blue)
+
+
+def clean_rgb_rows(csv_path: str = DEFAULT_RGB_CSV_PATH, report: Optional[CleaningReport] = None) -> Iterator[RgbRow]:
+    """Stream deduplicated, integer RGB rows from `csv_path` with roles detected from its contents."""
+    report = report if report is not None else CleaningReport()
+    with open(csv_path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        yield from _clean(header, reader, report, first_line=2)
+
+
+def write_cleaned(rows: Iterable[RgbRow], path: str) -> None:
+    """Write cleaned rows as a compact CSV with correctly labelled columns."""
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(RGB_FIELDS)
+        writer.writerows(rows)
+
+
+def write_conflicts(conflicts: Iterable[RgbConflict], path: str) -> None:
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['color_code', 'color_card', 'kept_rgb', 'kept_line', 'dropped_rgb', 'dropped_line'])
+        for conflict in conflicts:
+            writer.writerow([
+                conflict.color_code, conflict.color_card,
+                ' '.join(map(str, conflict.kept)), conflict.kept_line,
+                ' '.join(map(str, conflict.dropped)), conflict.dropped_line,
+            ])
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Clean and deduplicate a color RGB CSV")
+    parser.add_argument("csv", nargs="?", default=DEFAULT_RGB_CSV_PATH)
+    parser.add_argument("-o", "--output", help="write the cleaned CSV here (default: report only)")
+    parser.add_argument("--conflicts", help="write keys with conflicting RGB values to this CSV")
+    parser.add_argument("--strict", action="store_true", help="exit with status 1 on conflicts or invalid rows")
+    args = parser.parse_args(argv)
+
+    report = CleaningReport()
+    rows = clean_rgb_rows(args.csv, report)
+    if args.output:
+        write_cleaned(rows, args.output)
+    else:
+        for _ in rows:
+            pass
+    report.print()
+    print(f"Detected columns: {report.roles}")
+    if args.conflicts:
+        write_conflicts(report.conflicts, args.conflicts)
+    return 1 if args.strict and (report.conflicts or report.invalid) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
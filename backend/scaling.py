@@ -0,0 +1,239 @@
+"""
+Recipe scaling for arbitrary fill sizes.
+
+A stored recipe is the colorant dose for its packaging_spec (e.g. "1KG"); the dose for any
+other fill size is that recipe times target size / stored size. Amounts are scaled as
+fixed-point integers (NUMERIC(12, 7) units, like the snapshot) with numpy, then rounded
+half-up to the dispenser resolution, so the same request always dispenses the same amounts
+regardless of float error.
+
+Sizes are parsed into milligrams or microlitres. Converting between mass and volume
+packaging (a 1KG recipe for an 18L can) needs the base paint density in kg/L.
+"""
+import os
+import re
+from decimal import Decimal, InvalidOperation
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from snapshot import AMOUNT_SCALE, format_amount
+
+# Smallest step the tinting machines dispense; scaled amounts are rounded half-up to these
+WEIGHT_RESOLUTION_G = Decimal(os.getenv("SCALE_WEIGHT_RESOLUTION_G", "0.001"))
+VOLUME_RESOLUTION_ML = Decimal(os.getenv("SCALE_VOLUME_RESOLUTION_ML", "0.001"))
+
+MASS = "mass"
+VOLUME = "volume"
+# unit -> (dimension, milligrams or microlitres per unit)
+UNITS = {
+    "MG": (MASS, 1),
+    "G": (MASS, 1000),
+    "KG": (MASS, 1000 ** 2),
+    "UL": (VOLUME, 1),
+    "ML": (VOLUME, 1000),
+    "L": (VOLUME, 1000 ** 2),
+    "LT": (VOLUME, 1000 ** 2),
+    "LTR": (VOLUME, 1000 ** 2),
+}
+SIZE_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([A-Za-z]+)\s*$")
+DENSITY_SCALE = 10 ** 6  # density in kg/L (= g/ml) as fixed-point micro units
+
+
+class Size(NamedTuple):
+    label: str  # canonical spelling, e.g. "18L", "2.5KG"
+    dimension: str
+    units: int  # milligrams or microlitres
+
+
+def parse_size(spec: str) -> Size:
+    """Parse a fill size like "18L", "1KG", "500 ml"; raises ValueError for anything else."""
+    match = SIZE_PATTERN.match(spec or "")
+    unit = match and match.group(2).upper()
+    if not match or unit not in UNITS:
+        raise ValueError(f"Invalid size: {spec!r} (expected a number followed by one of {', '.join(UNITS)})")
+    dimension, factor = UNITS[unit]
+    quantity = Decimal(match.group(1))
+    units = quantity * factor
+    if units <= 0 or units != units.to_integral_value():
+        raise ValueError(f"Invalid size: {spec!r}")
+    unit = "L" if unit in ("LT", "LTR") else unit
+    return Size(f"{quantity.normalize():f}{unit}", dimension, int(units))
+
+
+def size_or_none(spec: str) -> Optional[Size]:
+    try:
+        return parse_size(spec)
+    except ValueError:
+        return None
+
+
+def parse_density(text: str) -> int:
+    """Base paint density in kg/L as fixed-point micro units; raises ValueError unless positive."""
+    try:
+        density = Decimal(text)
+    except InvalidOperation:
+        raise ValueError(f"Invalid density: {text!r}")
+    micro = density * DENSITY_SCALE
+    if not density.is_finite() or micro < 1:
+        raise ValueError(f"Invalid density: {text!r}")
+    return int(micro)
+
+
+def scale_ratio(source: Size, target: Size, density: Optional[int]) -> Optional[Tuple[int, int]]:
+    """(numerator, denominator) taking `source` amounts to `target`, or None without a needed density."""
+    if source.dimension == target.dimension:
+        return target.units, source.units
+    if density is None:
+        return None
+    if source.dimension == MASS:  # target volume -> mass: ul * (g/ml) = mg
+        return target.units * density, source.units * DENSITY_SCALE
+    return target.units * DENSITY_SCALE, source.units * density  # target mass -> volume
+
+
+def _fixed(amount: Optional[str]) -> Optional[int]:
+    # Stored amounts are NUMERIC(12, 7) text, e.g. "0.5628000"
+    if amount is None:
+        return None
+    whole, _, fraction = amount.partition(".")
+    return int(whole + fraction.ljust(7, "0")[:7])
+
+
+def scale_amounts(amounts: np.ndarray, numerators: np.ndarray, denominators: np.ndarray, step: int) -> np.ndarray:
+    """
+    amounts * numerators / denominators rounded half-up (away from zero) to a multiple of `step`,
+    all in fixed-point integers. Falls back to Python integers if int64 could overflow.
+    """
+    numerators, denominators = np.asarray(numerators), np.asarray(denominators) * step
+    magnitudes = np.abs(amounts)
+    limit = 2 ** 62
+    if magnitudes.size and (
+        int(magnitudes.max()) * int(numerators.max()) >= limit or int(denominators.max()) >= limit
+    ):
+        magnitudes, numerators, denominators = (a.astype(object) for a in (magnitudes, numerators, denominators))
+    rounded = (2 * magnitudes * numerators + denominators) // (2 * denominators)
+    return np.where(amounts < 0, -rounded, rounded) * step
+
+
+def scale_formulations(formulations: List[dict], size: Size, density: Optional[int] = None) -> List[dict]:
+    """
+    One formulation per (color card, paint type, base) scaled to `size`, in response dict form.
+    A stored formulation of exactly that size is returned unscaled; otherwise the largest stored
+    size of the same dimension is scaled (or of the other dimension when a density is given).
+    Groups with no usable source are left out. Each result carries `scaled_from`, the stored
+    packaging_spec it was computed from (None when unscaled).
+    """
+    sources: Dict[tuple, Tuple[tuple, dict, Size]] = {}
+    for formulation in formulations:
+        stored = size_or_none(formulation["packaging_spec"])
+        if stored is None:
+            continue
+        if (stored.dimension, stored.units) == (size.dimension, size.units):
+            rank = (2, 0)
+        elif stored.dimension == size.dimension:
+            rank = (1, stored.units)
+        elif density is not None:
+            rank = (0, stored.units)
+        else:
+            continue
+        group = (formulation["color_card"], formulation["paint_type"], formulation["base_paint"])
+        if group not in sources or rank > sources[group][0]:
+            sources[group] = (rank, formulation, stored)
+
+    weight_step = int(WEIGHT_RESOLUTION_G * AMOUNT_SCALE)
+    volume_step = int(VOLUME_RESOLUTION_ML * AMOUNT_SCALE)
+    results, weights, volumes, numerators, denominators = [], [], [], [], []
+    for rank, formulation, stored in sources.values():
+        if rank[0] == 2:
+            results.append({**formulation, "scaled_from": None})
+            continue
+        numerator, denominator = scale_ratio(stored, size, density)
+        details = formulation["colorant_details"]
+        weights.extend(_fixed(detail["weight_g"]) for detail in details)
+        volumes.extend(_fixed(detail["volume_ml"]) for detail in details)
+        numerators.extend([numerator] * len(details))
+        denominators.extend([denominator] * len(details))
+        results.append({**formulation, "packaging_spec": size.label, "scaled_from": formulation["packaging_spec"]})
+
+    if weights:
+        # All scaled amounts of the response in one vectorized pass; blanks stay blank
+        blank_weights = np.array([value is None for value in weights])
+        blank_volumes = np.array([value is None for value in volumes])
+        scaled_weights = scale_amounts(
+            np.array([value or 0 for value in weights], dtype=np.int64), numerators, denominators, weight_step
+        ).tolist()
+        scaled_volumes = scale_amounts(
+            np.array([value or 0 for value in volumes], dtype=np.int64), numerators, denominators, volume_step
+        ).tolist()
+        position = 0
+        for result in results:
+            if result["scaled_from"] is None:
+                continue
+            details = []
+            for detail in result["colorant_details"]:
+                details.append({
+                    "colorant_name": detail["colorant_name"],
+                    "weight_g": None if blank_weights[position] else format_amount(int(scaled_weights[position])),
+                    "volume_ml": None if blank_volumes[position] else format_amount(int(scaled_volumes[position])),
+                })
+                position += 1
+            result["colorant_details"] = details
+    return results
+
+
+def with_scaled_sizes(formulation: dict, scaled_specs: Optional[str]) -> List[dict]:
+    """
+    `formulation` followed by the larger packaging sizes collapsed onto it by the bulk loader
+    (its comma-separated `scaled_specs`, see bulk_loader.collapse_scaled_sizes). A size is only
+    collapsed when each of its amounts is exactly the stored amount times the size ratio, so
+    multiplying back without dispenser rounding reproduces the recipe as stored before collapsing.
+    """
+    stored = size_or_none(formulation["packaging_spec"])
+    results = [formulation]
+    for spec in (scaled_specs or "").split(","):
+        size = size_or_none(spec)
+        if stored is None or size is None:
+            continue
+
+        def scaled(amount: Optional[str]) -> Optional[str]:
+            return None if amount is None else format_amount(_fixed(amount) * size.units // stored.units)
+
+        results.append({
+            **formulation,
+            "packaging_spec": spec,
+            "colorant_details": [
+                {"colorant_name": detail["colorant_name"], "weight_g": scaled(detail["weight_g"]),
+                 "volume_ml": scaled(detail["volume_ml"])}
+                for detail in formulation["colorant_details"]
+            ],
+        })
+    return results
+
+
+def expanded_page(
+    rows: Sequence[Any],
+    expand: Callable[[Any], List[dict]],
+    key: Callable[[Any], List[str]],
+    limit: int,
+    start: Optional[List[str]] = None,
+    skip: int = 0,
+) -> Tuple[List[dict], Optional[Tuple[List[str], int]]]:
+    """
+    One search page of at most `limit` formulations from stored `rows` in key order, each
+    expanded by `expand` (with_scaled_sizes), so collapsed sizes count against the page size.
+
+    `rows` start at the cursor's row `start` (inclusive), of which the first `skip`
+    formulations were on earlier pages; pass limit + 2 rows so that a full page always tells
+    whether more exist. Returns (formulations, (key, returned) of the last row taken or None
+    on the last page), the cursor position for serializers.encode_page_cursor().
+    """
+    results: List[dict] = []
+    for row in rows:
+        row_key = key(row)
+        formulations = expand(row)
+        for returned in range(skip if row_key == start else 0, len(formulations)):
+            if len(results) == limit:
+                return results, (last_key, last_returned)
+            results.append(formulations[returned])
+            last_key, last_returned = row_key, returned + 1
+    return results, None
@@ -0,0 +1,80 @@
+import base64
+import binascii
+import json
+from typing import Any, List, Tuple
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library encoder with the same output format
+    orjson = None
+
+def dumps(content: Any) -> bytes:
+    """Encode plain Python data (dict/list/str/int/float/None) as compact UTF-8 JSON."""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+class FastJSONResponse(Response):
+    """JSON response for content that is already plain data; skips FastAPI's generic encoder."""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+def encode_key_cursor(key: List[str]) -> str:
+    """Opaque keyset-pagination cursor: the last row's key as unpadded base64url JSON."""
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip("=")
+
+def decode_key_cursor(cursor: str, width: int) -> List[str]:
+    """Inverse of encode_key_cursor(); raises ValueError for anything that isn't a key of `width` strings."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(key, list) or len(key) != width or not all(isinstance(v, str) for v in key):
+        raise ValueError("Invalid cursor")
+    return key
+
+def encode_page_cursor(key: List[str], returned: int) -> str:
+    """Cursor for a page that ended inside a stored row: its key plus how many of its formulations were returned."""
+    return encode_key_cursor([*key, str(returned)])
+
+def decode_page_cursor(cursor: str, width: int) -> Tuple[List[str], int]:
+    """Inverse of encode_page_cursor() for a key of `width` strings; raises ValueError like decode_key_cursor()."""
+    *key, returned = decode_key_cursor(cursor, width + 1)
+    if not returned.isdigit():
+        raise ValueError("Invalid cursor")
+    return key, int(returned)
+
+def rgb_to_dict(red: int, green: int, blue: int) -> dict:
+    return {
+        "rgb": {"r": red, "g": green, "b": blue},
+        "hex": f"#{red:02x}{green:02x}{blue:02x}",
+    }
+
+def read_model_row_to_dict(row) -> dict:
+    """
+    Same shape and field order as main.FormulationResponse, built straight from a
+    formulation_read_model row without Pydantic.
+    """
+    return {
+        "color_code": row.color_code,
+        "colorant_type": row.colorant_type,
+        "color_series": row.color_series,
+        "color_card": row.color_card,
+        "paint_type": row.paint_type,
+        "base_paint": row.base_paint,
+        "packaging_spec": row.packaging_spec,
+        "colorant_details": [
+            {"colorant_name": name, "weight_g": weight_g, "volume_ml": volume_ml}
+            for name, weight_g, volume_ml in row.colorants
+        ],
+        "color_rgb": {
+            "rgb": {"r": row.red, "g": row.green, "b": row.blue},
+            "hex": row.hex,
+        } if row.red is not None else None,
+        "scaled_from": None,
+    }
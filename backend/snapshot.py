@@ -0,0 +1,559 @@
+"""
+Database-free formulation snapshot.
+
+Holds the same data as formulation_read_model in flat, array-backed structures so a process
+can answer formulation lookups and color code searches without a database:
+
+- every distinct string (codes, cards, paint types, colorant names...) is stored once in
+  `strings` and referenced by integer id;
+- formulations are sorted by their key and stored as rows of string ids in one array;
+- colorant amounts are fixed-point integers (NUMERIC(12, 7) scaled by 10^7), so they format
+  back to exactly the text the database returns ("0.5628000");
+- a dict maps the normalized color code to its formulation range, and a newline-joined
+  string of lowercased codes serves substring search at str.find speed.
+
+Snapshot.write() stores the same arrays in a binary file; MappedSnapshot maps that file
+read-only and reads the arrays in place, so every worker process shares one copy through
+the page cache. File layout (little-endian, sections 8-byte aligned):
+
+    header   magic "TINTSNAP", format version, section count, (offset, length) per section
+    records  fields (7 string ids per formulation), detail_offsets, rgb,
+             colorant_names, weights, volumes
+    strings  string_offsets + UTF-8 string_blob
+    index    code_ids/code_starts (distinct codes in key order), code_offsets + search_text,
+             norm_ids/norm_offsets/norm_positions (normalized codes, sorted, -> code positions)
+"""
+import argparse
+import asyncio
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from color_codes import normalize_color_code
+
+AMOUNT_SCALE = 10 ** 7  # NUMERIC(12, 7)
+NULL_AMOUNT = -(2 ** 63)
+NO_RGB = -1
+
+# String ids stored per formulation, in this order
+# (scaled_specs is "" when no larger size was collapsed onto the recipe, see bulk_loader.collapse_scaled_sizes)
+FIELDS = ('color_code', 'color_card', 'paint_type', 'base_paint', 'packaging_spec', 'colorant_type', 'color_series',
+          'scaled_specs')
+KEY_WIDTH = 5
+WIDTH = len(FIELDS)
+
+# (color_code, color_card, paint_type, base_paint, packaging_spec, colorant_type, color_series, scaled_specs,
+#  [(colorant_name, weight, volume), ...], (r, g, b) or None); amounts as decimal text, floats or None
+Record = Tuple[str, str, str, str, str, str, str, str, Sequence[Tuple[str, Optional[str], Optional[str]]], Optional[Tuple[int, int, int]]]
+
+# Where loaders write the snapshot file and api.py maps it from; unset disables the file
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH")
+# How often a worker checks whether the snapshot file was replaced
+SNAPSHOT_CHECK_SECONDS = float(os.getenv("SNAPSHOT_CHECK_SECONDS", "2"))
+
+MAGIC = b"TINTSNAP"
+FORMAT_VERSION = 3  # 2: lookup index uses color_codes.normalize_color_code(); 3: scaled_specs field
+SECTIONS = (
+    ("fields", "I"),
+    ("detail_offsets", "I"),
+    ("rgb", "i"),
+    ("colorant_names", "I"),
+    ("weights", "q"),
+    ("volumes", "q"),
+    ("string_offsets", "I"),
+    ("string_blob", "B"),
+    ("code_ids", "I"),
+    ("code_starts", "I"),
+    ("code_offsets", "I"),
+    ("search_text", "B"),
+    ("norm_ids", "I"),
+    ("norm_offsets", "I"),
+    ("norm_positions", "I"),
+)
+HEADER = struct.Struct("<8sII" + "QQ" * len(SECTIONS))
+ALIGNMENT = 8
+
+
+def parse_amount(value) -> int:
+    """Decimal text (or number) -> fixed-point integer, rounded half-up like PostgreSQL NUMERIC input."""
+    if value is None:
+        return NULL_AMOUNT
+    if isinstance(value, float):
+        # Float error is far below 1e-6 of a unit here, so only near-ties need exact decimal rounding
+        scaled = value * AMOUNT_SCALE
+        if abs(abs(scaled) % 1 - 0.5) > 1e-6:
+            return round(scaled)
+    return int((Decimal(str(value)) * AMOUNT_SCALE).to_integral_value(rounding=ROUND_HALF_UP))
+
+
+def format_amount(value: int) -> Optional[str]:
+    if value == NULL_AMOUNT:
+        return None
+    sign = "-" if value < 0 else ""
+    whole, fraction = divmod(abs(value), AMOUNT_SCALE)
+    return f"{sign}{whole}.{fraction:07d}"
+
+
+class Snapshot:
+    def __init__(self, records: Iterable[Record]):
+        strings: List[str] = []
+        string_ids: Dict[str, int] = {}
+
+        def intern(value: str) -> int:
+            string_id = string_ids.get(value)
+            if string_id is None:
+                string_id = string_ids[value] = len(strings)
+                strings.append(sys.intern(value))
+            return string_id
+
+        self.fields = array('I')
+        self.detail_offsets = array('I', [0])
+        self.rgb = array('i')
+        self.colorant_names = array('I')
+        self.weights = array('q')
+        self.volumes = array('q')
+
+        for record in sorted(records, key=lambda record: record[:KEY_WIDTH]):
+            self.fields.extend(intern(value) for value in record[:WIDTH])
+            for name, weight, volume in record[WIDTH]:
+                self.colorant_names.append(intern(name))
+                self.weights.append(parse_amount(weight))
+                self.volumes.append(parse_amount(volume))
+            self.detail_offsets.append(len(self.colorant_names))
+            rgb = record[WIDTH + 1]
+            self.rgb.append(NO_RGB if rgb is None else (rgb[0] << 16) | (rgb[1] << 8) | rgb[2])
+
+        self.strings = strings
+        self.count = len(self.detail_offsets) - 1
+        self._build_indexes()
+
+    def _build_indexes(self) -> None:
+        # Formulations are sorted by key, so each raw color code is one contiguous range
+        self.codes: List[str] = []  # distinct raw codes, sorted
+        self.code_starts = array('I')  # first formulation of each code, plus a final end marker
+        self.by_code: Dict[str, Tuple[int, ...]] = {}  # normalized code -> positions in self.codes
+        previous = None
+        for index in range(self.count):
+            code_id = self.fields[index * WIDTH]
+            if code_id != previous:
+                self.codes.append(self.strings[code_id])
+                self.code_starts.append(index)
+                previous = code_id
+        self.code_starts.append(self.count)
+
+        for position, code in enumerate(self.codes):
+            key = normalize_color_code(code)
+            self.by_code[key] = self.by_code.get(key, ()) + (position,)
+
+        # "\n" never occurs in a stripped code, so a match can't span two codes
+        lowered = [code.lower() for code in self.codes]
+        self.code_offsets = array('I')
+        offset = 0
+        for code in lowered:
+            self.code_offsets.append(offset)
+            offset += len(code) + 1
+        self.search_text = "\n".join(lowered)
+        self.search_base = 0
+        self.search_end = len(self.search_text)
+
+    def _code_positions(self, normalized: str) -> Sequence[int]:
+        return self.by_code.get(normalized, ())
+
+    def _needle(self, q: str):
+        return q.strip().lower()
+
+    def key(self, index: int) -> List[str]:
+        base = index * WIDTH
+        return [self.strings[string_id] for string_id in self.fields[base:base + KEY_WIDTH]]
+
+    def to_dict(self, index: int) -> dict:
+        """Same shape and field order as serializers.read_model_row_to_dict()."""
+        strings = self.strings
+        base = index * WIDTH
+        code, card, paint, base_paint, packaging, colorant_type, series, _ = (
+            strings[string_id] for string_id in self.fields[base:base + WIDTH]
+        )
+        start, stop = self.detail_offsets[index], self.detail_offsets[index + 1]
+        rgb = self.rgb[index]
+        return {
+            "color_code": code,
+            "colorant_type": colorant_type,
+            "color_series": series,
+            "color_card": card,
+            "paint_type": paint,
+            "base_paint": base_paint,
+            "packaging_spec": packaging,
+            "colorant_details": [
+                {
+                    "colorant_name": strings[self.colorant_names[detail]],
+                    "weight_g": format_amount(self.weights[detail]),
+                    "volume_ml": format_amount(self.volumes[detail]),
+                }
+                for detail in range(start, stop)
+            ],
+            "color_rgb": None if rgb == NO_RGB else {
+                "rgb": {"r": rgb >> 16, "g": (rgb >> 8) & 0xFF, "b": rgb & 0xFF},
+                "hex": f"#{rgb:06x}",
+            },
+            "scaled_from": None,
+        }
+
+    def formulations(self, index: int) -> List[dict]:
+        """to_dict() followed by the larger sizes collapsed onto this recipe (scaling.with_scaled_sizes)."""
+        from scaling import with_scaled_sizes
+
+        return with_scaled_sizes(self.to_dict(index), self.strings[self.fields[index * WIDTH + WIDTH - 1]])
+
+    def lookup(self, color_code: str) -> List[dict]:
+        """All formulations whose color code matches after normalization (color_codes.normalize_color_code)."""
+        return [
+            formulation
+            for position in self._code_positions(normalize_color_code(color_code))
+            for index in range(self.code_starts[position], self.code_starts[position + 1])
+            for formulation in self.formulations(index)
+        ]
+
+    def search(self, q: str, limit: int, start: Optional[Sequence[str]] = None) -> List[int]:
+        """
+        Up to `limit` formulation indexes whose color code contains `q` (case-insensitive), in
+        key order from the key `start` on (inclusive, like main.search_page_query).
+        """
+        needle = self._needle(q)
+        matches: List[int] = []
+        start = list(start) if start is not None else None
+        position = bisect_left(self.codes, start[0]) if start else 0
+        if position >= len(self.codes):
+            return []
+
+        text, base, end = self.search_text, self.search_base, self.search_end
+        offset = self.code_offsets[position]
+        while len(matches) < limit:
+            found = text.find(needle, base + offset, end)
+            if found < 0:
+                break
+            position = bisect_right(self.code_offsets, found - base) - 1
+            for index in range(self.code_starts[position], self.code_starts[position + 1]):
+                if start is None or self.key(index) >= start:
+                    matches.append(index)
+                    if len(matches) >= limit:
+                        break
+            if position + 1 >= len(self.codes):
+                break
+            offset = self.code_offsets[position + 1]
+
+        return matches
+
+    def code_cards(self) -> List[Tuple[str, str, Optional[str]]]:
+        """Distinct (color_code, color_card, hex or None) in key order, for the suggest index."""
+        pairs = []
+        previous = None
+        for index in range(self.count):
+            base = index * WIDTH
+            pair = (self.fields[base], self.fields[base + 1])
+            if pair != previous:
+                rgb = self.rgb[index]
+                pairs.append((self.strings[pair[0]], self.strings[pair[1]], None if rgb == NO_RGB else f"#{rgb:06x}"))
+                previous = pair
+        return pairs
+
+    def stats(self) -> dict:
+        arrays = (self.fields, self.detail_offsets, self.rgb, self.colorant_names, self.weights, self.volumes,
+                  self.code_starts, self.code_offsets)
+        return {
+            "formulations": self.count,
+            "colorant_details": len(self.colorant_names),
+            "strings": len(self.strings),
+            "color_codes": len(self.codes),
+            "array_bytes": sum(a.itemsize * len(a) for a in arrays),
+        }
+
+    def write(self, path: str) -> int:
+        """
+        Write the binary snapshot file. The file is written next to `path` and renamed over it,
+        so mapped readers keep their old copy and never see a partial file. Returns its size.
+        """
+        strings = list(self.strings)
+        string_ids = {value: string_id for string_id, value in enumerate(strings)}
+
+        def intern(value: str) -> int:
+            string_id = string_ids.get(value)
+            if string_id is None:
+                string_id = string_ids[value] = len(strings)
+                strings.append(value)
+            return string_id
+
+        code_ids = array('I', (self.fields[start * WIDTH] for start in self.code_starts[:-1]))
+
+        # Byte offsets this time: the mapped reader searches the UTF-8 bytes
+        search_text = bytearray()
+        code_offsets = array('I')
+        for code in self.codes:
+            code_offsets.append(len(search_text))
+            search_text += code.lower().encode("utf-8") + b"\n"
+
+        normalized: Dict[str, List[int]] = {}
+        for position, code in enumerate(self.codes):
+            normalized.setdefault(normalize_color_code(code), []).append(position)
+        norm_ids, norm_offsets, norm_positions = array('I'), array('I', [0]), array('I')
+        for key in sorted(normalized):
+            norm_ids.append(intern(key))
+            norm_positions.extend(normalized[key])
+            norm_offsets.append(len(norm_positions))
+
+        encoded = [value.encode("utf-8") for value in strings]
+        string_offsets = array('I', [0])
+        for value in encoded:
+            string_offsets.append(string_offsets[-1] + len(value))
+
+        sections = {
+            "fields": self.fields,
+            "detail_offsets": self.detail_offsets,
+            "rgb": self.rgb,
+            "colorant_names": self.colorant_names,
+            "weights": self.weights,
+            "volumes": self.volumes,
+            "string_offsets": string_offsets,
+            "string_blob": b"".join(encoded),
+            "code_ids": code_ids,
+            "code_starts": self.code_starts,
+            "code_offsets": code_offsets,
+            "search_text": bytes(search_text[:-1]),
+            "norm_ids": norm_ids,
+            "norm_offsets": norm_offsets,
+            "norm_positions": norm_positions,
+        }
+        if sys.byteorder != "little":
+            for name, typecode in SECTIONS:
+                if typecode != "B":
+                    sections[name] = array(typecode, sections[name])
+                    sections[name].byteswap()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        temporary = os.path.join(directory, f".{os.path.basename(path)}.{os.getpid()}.tmp")
+        try:
+            with open(temporary, "wb") as f:
+                f.write(b"\0" * HEADER.size)
+                layout = []
+                for name, _ in SECTIONS:
+                    f.write(b"\0" * (-f.tell() % ALIGNMENT))
+                    data = memoryview(sections[name]).cast("B")
+                    layout.extend((f.tell(), data.nbytes))
+                    f.write(data)
+                size = f.tell()
+                f.seek(0)
+                f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(SECTIONS), *layout))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporary, path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        return size
+
+    @classmethod
+    def from_csv(cls, formulations_csv: str, rgb_csv: str) -> "Snapshot":
+        """Build from sekabiaoOG.csv and colorOG.csv with the bulk and RGB loaders' parsing rules."""
+        from bulk_loader import KEY_FIELDS, ATTRIBUTE_FIELDS, load_records
+        from rgb_cleaning import clean_rgb_rows
+
+        formulations, details, _ = load_records(formulations_csv, with_hashes=False)
+        rgb_by_color = {(code, card): (red, green, blue) for code, card, red, green, blue in clean_rgb_rows(rgb_csv)}
+
+        recipes: Dict[tuple, list] = {}
+        detail_columns = [details[field].tolist() for field in KEY_FIELDS]
+        for key, name, weight, volume in zip(
+            zip(*detail_columns), details['colorant_name'].tolist(),
+            details['weight_g'].tolist(), details['volume_ml'].tolist(),
+        ):
+            # NaN != NaN marks a blank amount
+            recipes.setdefault(key, []).append(
+                (name, weight if weight == weight else None, volume if volume == volume else None)
+            )
+
+        rows = zip(*(formulations[field].tolist() for field in KEY_FIELDS + ATTRIBUTE_FIELDS), formulations['scaled_specs'].tolist())
+        records = (
+            (*row[:-1], row[-1] or '', recipes.get(row[:KEY_WIDTH], []), rgb_by_color.get((row[0], row[1])))
+            for row in rows
+        )
+        return cls(records)
+
+    @classmethod
+    async def from_read_model(cls, session) -> "Snapshot":
+        """Build from the database's formulation_read_model (an export of what the API serves)."""
+        from sqlalchemy import text
+
+        result = await session.execute(text("""
+        SELECT color_code, color_card, paint_type, base_paint, packaging_spec,
+               colorant_type, color_series, coalesce(scaled_specs, '') AS scaled_specs, colorants, red, green, blue
+        FROM formulation_read_model
+        """))
+        return cls(
+            (*row[:WIDTH], row.colorants, None if row.red is None else (row.red, row.green, row.blue))
+            for row in result
+        )
+
+
+class _StringTable:
+    """Read-only sequence of the strings in a mapped file, decoded on access."""
+
+    def __init__(self, buffer: mmap.mmap, offsets: memoryview, blob_start: int):
+        self._buffer = buffer
+        self._offsets = offsets
+        self._blob_start = blob_start
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, string_id: int) -> str:
+        start = self._blob_start + self._offsets[string_id]
+        return self._buffer[start:self._blob_start + self._offsets[string_id + 1]].decode("utf-8")
+
+
+class _CodeList:
+    """Distinct raw color codes in key order (for bisect), resolved through the string table."""
+
+    def __init__(self, strings: _StringTable, code_ids: memoryview):
+        self._strings = strings
+        self._code_ids = code_ids
+
+    def __len__(self) -> int:
+        return len(self._code_ids)
+
+    def __getitem__(self, position: int) -> str:
+        return self._strings[self._code_ids[position]]
+
+
+class MappedSnapshot(Snapshot):
+    """
+    A snapshot file mapped read-only. The arrays are memoryviews into the mapping, so nothing
+    is copied into the process: pages are shared by every worker that maps the same file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, section_count, *layout = HEADER.unpack_from(self._buffer, 0)
+        if magic != MAGIC or version != FORMAT_VERSION or section_count != len(SECTIONS):
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} formulation snapshot")
+        if sys.byteorder != "little":
+            raise ValueError("Mapped snapshots are little-endian; build an in-memory Snapshot on this platform")
+
+        view = memoryview(self._buffer)
+        bounds = {}
+        for (name, typecode), start, length in zip(SECTIONS, layout[::2], layout[1::2]):
+            bounds[name] = (start, length)
+            if typecode != "B":
+                setattr(self, name, view[start:start + length].cast(typecode))
+
+        self.strings = _StringTable(self._buffer, self.string_offsets, bounds["string_blob"][0])
+        self.codes = _CodeList(self.strings, self.code_ids)
+        self.count = len(self.detail_offsets) - 1
+        self.search_text = self._buffer
+        self.search_base, search_length = bounds["search_text"]
+        self.search_end = self.search_base + search_length
+        self.file_bytes = len(self._buffer)
+
+    def _code_positions(self, normalized: str) -> Sequence[int]:
+        low, high = 0, len(self.norm_ids)
+        while low < high:
+            middle = (low + high) // 2
+            if self.strings[self.norm_ids[middle]] < normalized:
+                low = middle + 1
+            else:
+                high = middle
+        if low == len(self.norm_ids) or self.strings[self.norm_ids[low]] != normalized:
+            return ()
+        return self.norm_positions[self.norm_offsets[low]:self.norm_offsets[low + 1]]
+
+    def _needle(self, q: str):
+        return q.strip().lower().encode("utf-8")
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats["file_bytes"] = self.file_bytes
+        return stats
+
+
+class SnapshotFile:
+    """
+    Serves the current mapping of a snapshot file. Loaders replace the file atomically; at most
+    every `check_seconds` the inode is compared and a replaced file is mapped afresh. Requests
+    that still hold the previous MappedSnapshot keep reading the old, unlinked copy.
+    """
+
+    def __init__(self, path: str, check_seconds: float = SNAPSHOT_CHECK_SECONDS):
+        self.path = path
+        self.check_seconds = check_seconds
+        self._snapshot: Optional[MappedSnapshot] = None
+        self._identity = None
+        self._checked_at = 0.0
+        self.reloads = 0
+        self.get()
+
+    def get(self) -> MappedSnapshot:
+        now = time.monotonic()
+        if self._snapshot is None or now - self._checked_at >= self.check_seconds:
+            self._checked_at = now
+            stat = os.stat(self.path)
+            identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            if identity != self._identity:
+                self._snapshot = MappedSnapshot(self.path)
+                self._identity = identity
+                self.reloads += 1
+        return self._snapshot
+
+
+async def export_snapshot(session, path: Optional[str] = None) -> Optional[int]:
+    """Write the snapshot file from formulation_read_model; no-op unless a path or SNAPSHOT_PATH is set."""
+    path = path or SNAPSHOT_PATH
+    if not path:
+        return None
+    started = time.perf_counter()
+    snapshot = await Snapshot.from_read_model(session)
+    size = snapshot.write(path)
+    print(f"Snapshot written to {path}: {snapshot.count} formulations, {size} bytes "
+          f"in {time.perf_counter() - started:.2f}s")
+    return size
+
+
+async def _export_from_database(path: str) -> None:
+    from database import async_session
+
+    async with async_session() as session:
+        await export_snapshot(session, path)
+
+
+def main():
+    data_dir = os.path.join(os.path.dirname(__file__), 'data')
+    parser = argparse.ArgumentParser(description="Build or inspect a binary formulation snapshot file")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    build = subcommands.add_parser("build", help="Write a snapshot file")
+    build.add_argument("path", nargs="?", default=SNAPSHOT_PATH)
+    build.add_argument("--from-db", action="store_true", help="Export formulation_read_model instead of reading CSVs")
+    build.add_argument("--csv", default=os.path.join(data_dir, 'sekabiaoOG.csv'))
+    build.add_argument("--rgb-csv", default=os.path.join(data_dir, 'colorOG.csv'))
+    info = subcommands.add_parser("info", help="Print the stats of a snapshot file")
+    info.add_argument("path", nargs="?", default=SNAPSHOT_PATH)
+    args = parser.parse_args()
+
+    if not args.path:
+        parser.error("Pass a snapshot path or set SNAPSHOT_PATH")
+    if args.command == "info":
+        print(MappedSnapshot(args.path).stats())
+    elif args.from_db:
+        asyncio.run(_export_from_database(args.path))
+    else:
+        size = Snapshot.from_csv(args.csv, args.rgb_csv).write(args.path)
+        print(f"Snapshot written to {args.path}: {size} bytes")
+
+
+if __name__ == "__main__":
+    main()
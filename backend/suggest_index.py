@@ -0,0 +1,109 @@
+import asyncio
+import os
+import re
+from bisect import bisect_left
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from cache import register_invalidation_hook
+from color_codes import ASCII_LOWER, normalize_color_code
+
+SUGGEST_DEFAULT_LIMIT = int(os.getenv("SUGGEST_DEFAULT_LIMIT", "10"))
+SUGGEST_MAX_LIMIT = int(os.getenv("SUGGEST_MAX_LIMIT", "50"))
+
+# Closes every digit run in an index key, sorting below any character, so a code whose number
+# ends where the prefix does comes first: prefix "11" lists 0011P ("11p") before 1101P
+RUN_END = "\x00"
+DIGIT_RUN_END = re.compile(r"(?<=[0-9])(?![0-9])")
+# A prefix ending in a run of only zeros ("0", "p0") may be the leading zeros of a longer number
+TRAILING_ZERO_RUN = re.compile(r"(?<![0-9])0$")
+
+def suggest_key(color_code: str) -> str:
+    return DIGIT_RUN_END.sub(RUN_END, normalize_color_code(color_code))
+
+def prefix_range(prefix: str) -> Tuple[str, str]:
+    """
+    [low, high) range of index keys (suggest_key()) that a typed prefix can complete to, so a
+    prefix finds what /api/formulation resolves its completion to: "0011" and "11" both reach
+    0011P. The prefix's last digit run is left open, and a trailing run of zeros, which
+    normalization drops once more digits follow, matches any digit run in its place.
+    """
+    normalized = normalize_color_code(prefix)
+    if TRAILING_ZERO_RUN.search(normalized):
+        stem = suggest_key(normalized[:-1])
+        return stem + "0", stem + ":"  # ":" sorts right after "9"
+    if not normalized:
+        return "", ""
+    key = suggest_key(normalized).rstrip(RUN_END)
+    return key, key[:-1] + chr(ord(key[-1]) + 1)
+
+class SuggestIndex:
+    """
+    Sorted in-memory array of distinct (color code, card) pairs for typeahead.
+    A prefix query is two bisects into the normalized codes plus a slice, so suggestions never
+    touch the database; the index is rebuilt after loaders invalidate it.
+    """
+
+    def __init__(self):
+        self.keys: List[str] = []  # suggest_key(color_code), sorted
+        self.entries: List[dict] = []  # {"color_code", "color_card", "hex"} in key order
+        self.search_text = ""  # ASCII-lowercased codes, one per line, for contains()
+        self.loaded = False
+        self._lock = asyncio.Lock()
+
+    def build(self, rows: Iterable[Tuple[str, str, Optional[str]]]) -> None:
+        """Rows of (color_code, color_card, hex or None); duplicates are dropped."""
+        ordered = sorted({(suggest_key(code), code, card): hex_value for code, card, hex_value in rows}.items())
+        self.keys = [key for (key, _, _), _ in ordered]
+        self.entries = [
+            {"color_code": code, "color_card": card, "hex": hex_value}
+            for (_, code, card), hex_value in ordered
+        ]
+        self.search_text = "\n".join(sorted({code.translate(ASCII_LOWER) for (_, code, _), _ in ordered}))
+        self.loaded = True
+
+    async def load(self, session: AsyncSession) -> None:
+        result = await session.execute(text("SELECT DISTINCT color_code, color_card, hex FROM formulation_read_model"))
+        self.build(result.all())
+        print(f"Suggest index built with {len(self.entries)} color codes.")
+
+    async def ensure_loaded(self, session_factory) -> None:
+        """Reload after an invalidation; concurrent requests wait for a single rebuild."""
+        if self.loaded:
+            return
+        async with self._lock:
+            if not self.loaded:
+                async with session_factory() as session:
+                    await self.load(session)
+
+    def invalidate(self) -> None:
+        self.loaded = False
+
+    def has_code(self, color_code: str) -> bool:
+        """Whether some code normalizes like `color_code`, i.e. /api/formulation finds it."""
+        key = suggest_key(color_code)
+        position = bisect_left(self.keys, key)
+        return position < len(self.keys) and self.keys[position] == key
+
+    def contains(self, needle: str) -> bool:
+        """
+        Whether some code contains the ASCII text `needle`, ignoring ASCII case like /api/search's
+        lower(color_code) LIKE filter. Non-ASCII needles are not decided here and return False.
+        """
+        if not self.entries or not needle.isascii() or "\n" in needle:
+            return False
+        return needle.translate(ASCII_LOWER) in self.search_text
+
+    def suggest(self, prefix: str, limit: int) -> List[dict]:
+        """Up to `limit` entries whose normalized code can complete `prefix` (prefix_range()), in key order."""
+        low, high = prefix_range(prefix)
+        if not low:
+            return []
+        start = bisect_left(self.keys, low)
+        stop = bisect_left(self.keys, high, lo=start)
+        return self.entries[start:min(stop, start + limit)]
+
+suggest_index = SuggestIndex()
+register_invalidation_hook(suggest_index.invalidate)
@@ -4,7 +4,7 @@ import sys
 def test_rgb_endpoint(color_code: str):
     """Test if the API endpoint returns RGB values correctly for a color code"""
     base_url = "http://localhost:8000"
-    url = f"{base_url}/api/formulations/{color_code}"
+    url = f"{base_url}/api/formulation/{color_code}"
     
     print(f"\nTesting endpoint: {url}")
     try: